@@ -0,0 +1,167 @@
+import argparse
+import atexit
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from streamlit.web import cli as stcli
+
+import consultas
+import filtros
+import memoria_sessao
+import tempos_execucao
+from data_loader import (CONJUNTOS_POR_ABA, dados_da_aba, diretorio_processado, obter_dataset, obter_geojson,
+                         obter_indice, obter_localidades, obter_tabela_sql)
+from versoes import versao_atual
+
+# --- AQUECIMENTO DO PAINEL ---
+# Depois de cada implantação, o primeiro acesso pagaria a leitura dos
+# Parquet, a construção dos índices dos filtros, a filtragem do estado
+# padrão e as agregações e figuras da aba inicial. Este script faz esse
+# trabalho antes de abrir o servidor, no mesmo processo: os caches do
+# processo (st.cache_resource e st.cache_data) e os módulos importados já
+# estão prontos quando o primeiro usuário chega.
+#
+# Ao terminar, grava static/pronto.json, servido pelo Streamlit em
+# /app/static/pronto.json (server.enableStaticServing em
+# .streamlit/config.toml). O proxy reverso só deve mandar acessos ao
+# servidor quando esse endereço responder. O arquivo é apagado ao iniciar e
+# ao encerrar o processo.
+#
+# Com --sem-servidor, só aquece e mostra os tempos de cada etapa (útil como
+# etapa separada da implantação, que deixa os arquivos no cache do sistema
+# operacional, mas não os caches de um servidor que rode em outro processo).
+
+SCRIPT_PAINEL = 'painel_observatorio.py'
+ARQUIVO_PRONTO = os.path.join('static', 'pronto.json')
+
+# Abas, pelo parâmetro 'tab' do painel, renderizadas no aquecimento; a
+# primeira é a aba aberta por padrão
+ABAS_AQUECIDAS = ['analise-geral', 'feminicidios', 'metodologia', 'download']
+
+
+def desmarcar_pronto():
+    if os.path.exists(ARQUIVO_PRONTO):
+        os.remove(ARQUIVO_PRONTO)
+
+
+def marcar_pronto(versao, segundos):
+    """Grava o sinal de prontidão (de uma vez, para o proxy nunca ler um arquivo pela metade)."""
+    os.makedirs(os.path.dirname(ARQUIVO_PRONTO), exist_ok=True)
+    temporario = ARQUIVO_PRONTO + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump({'pronto': True, 'versao': versao, 'aquecido_em': datetime.now().isoformat(timespec='seconds'),
+                   'segundos_aquecimento': round(segundos, 1), 'pid': os.getpid()}, f)
+    os.replace(temporario, ARQUIVO_PRONTO)
+
+
+def aquecer_dados(diretorio=None):
+    """
+    Carrega nos caches do processo os dados de todas as abas, a malha, os
+    índices dos filtros e as seleções, opções e métricas do estado padrão
+    da barra lateral (todo o período, todas as opções), a partir de
+    'diretorio' (por padrão, o do painel). Os índices só são
+    usados pelo backend de consultas 'pandas'; com o DuckDB, aquece em vez
+    deles as tabelas que as conexões registram. Retorna os segundos de cada etapa.
+    """
+    diretorio = diretorio or diretorio_processado()
+    tempos = {}
+
+    inicio = time.perf_counter()
+    for aba in CONJUNTOS_POR_ABA:
+        for nome, colunas in dados_da_aba(aba, diretorio).items():
+            if nome == 'geojson_sc':
+                obter_geojson(diretorio)
+            else:
+                obter_dataset(nome, colunas, diretorio)
+    obter_localidades(diretorio)
+    tempos['dados'] = time.perf_counter() - inicio
+    if consultas.backend_configurado() != 'pandas':
+        inicio = time.perf_counter()
+        for nome in ('geral', 'feminicidio'):
+            obter_tabela_sql(nome, diretorio)
+        tempos['tabelas do DuckDB'] = time.perf_counter() - inicio
+        return tempos
+
+    inicio = time.perf_counter()
+    indices = {nome: obter_indice(nome, diretorio) for nome in ('geral', 'feminicidio')}
+    tempos['índices dos filtros'] = time.perf_counter() - inicio
+
+    # Mesmo estado que os widgets da barra lateral têm ao abrir o painel
+    inicio = time.perf_counter()
+    tabelas = {nome: obter_dataset(nome, None, diretorio) for nome in ('geral', 'feminicidio', 'populacao')}
+    motor = consultas.criar_consultas(tabelas, backend='pandas', indices=indices)
+    data_inicial = tabelas['geral']['data_fato'].min().date()
+    data_final = tabelas['geral']['data_fato'].max().date()
+    opcoes = motor.opcoes_disponiveis(data_inicial, data_final)
+    metricas = motor.metricas_populacionais(data_inicial, data_final)
+    populacao = tabelas['populacao']['populacao_feminina']
+    faixas = [(int(populacao.min()), int(populacao.max()))] + [
+        (float(metricas[coluna].min()), float(metricas[coluna].max()))
+        for coluna in ('media_anual_fatos', 'taxa_por_mil_mulheres', 'percentual_mulheres_vitimas')]
+    municipios_populacao = filtros.municipios_por_metricas(metricas, *faixas)
+    argumentos = (data_inicial, data_final, opcoes['municipios'], opcoes['mesoregioes'], opcoes['associacoes'],
+                  (0, 100), municipios_populacao)
+    motor.selecionar_ocorrencias('geral', *argumentos, fatos=opcoes['fatos'])
+    motor.selecionar_ocorrencias('feminicidio', *argumentos)
+    tempos['filtros padrão'] = time.perf_counter() - inicio
+    return tempos
+
+
+def aquecer_abas(abas=ABAS_AQUECIDAS):
+    """
+    Executa o painel (streamlit.testing) no estado padrão de cada aba, para
+    que as agregações e figuras que as abas guardam nos caches do processo
+    e os módulos que elas importam estejam prontos. Retorna os segundos de
+    cada aba.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    tempos = {}
+    for aba in abas:
+        inicio = time.perf_counter()
+        at = AppTest.from_file(SCRIPT_PAINEL, default_timeout=600)
+        at.query_params['tab'] = aba
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"Falha ao renderizar a aba '{aba}': {at.exception[0].message}")
+        tempos[f"aba '{aba}'"] = time.perf_counter() - inicio
+
+    # As execuções do aquecimento não são acessos: saem dos registros do diagnóstico
+    tempos_execucao.limpar()
+    memoria_sessao._registro_sessoes.clear()
+    return tempos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Aquece os caches do painel e inicia o servidor Streamlit. Argumentos não reconhecidos "
+                    "(por exemplo, --server.port 8501) são repassados ao 'streamlit run'.")
+    parser.add_argument('--sem-abas', action='store_true',
+                        help="Não renderiza as abas; aquece só os dados, os índices e os filtros padrão.")
+    parser.add_argument('--sem-servidor', action='store_true',
+                        help="Só aquece e mostra os tempos, sem iniciar o servidor nem gravar o sinal de prontidão.")
+    args, argumentos_streamlit = parser.parse_known_args()
+
+    # O painel usa caminhos relativos à sua pasta
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    if not args.sem_servidor:
+        desmarcar_pronto()
+        atexit.register(desmarcar_pronto)
+
+    print("Aquecendo o painel...")
+    inicio = time.perf_counter()
+    tempos = aquecer_dados()
+    if not args.sem_abas:
+        tempos.update(aquecer_abas())
+    total = time.perf_counter() - inicio
+    for etapa, segundos in tempos.items():
+        print(f"  {etapa:<28} {segundos:>8.2f} s")
+    print(f"Aquecimento concluído em {total:.2f} s.")
+
+    if not args.sem_servidor:
+        marcar_pronto(versao_atual(diretorio_processado()), total)
+        sys.argv = ['streamlit', 'run', SCRIPT_PAINEL] + argumentos_streamlit
+        sys.exit(stcli.main())
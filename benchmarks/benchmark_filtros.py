@@ -0,0 +1,134 @@
+"""
+Mede a latência dos filtros da barra lateral sobre os dados processados:
+para estados de filtro sorteados (período, municípios, mesorregiões,
+associações, tipos de crime e faixa etária), compara o cálculo das linhas
+selecionadas pelo índice (indice_filtros.py) com as máscaras de colunas
+inteiras (cubo_ocorrencias.mascara_ocorrencias) e confere que as linhas
+são as mesmas. Depois, numa edição passo a passo (cada estado muda um só
+filtro do anterior), compara o índice com e sem o AvaliadorIncremental.
+O cache de seleções do índice é desligado, para medir o cálculo de cada
+estado.
+
+Uso:
+    python benchmarks/benchmark_filtros.py --dados data/processed [--estados 200] [--seed 0]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from cubo_ocorrencias import FILTROS_LISTA, mascara_ocorrencias  # noqa: E402
+from esquemas import ler_conjunto  # noqa: E402
+from indice_filtros import AvaliadorIncremental, CacheSelecoes, IndiceFiltros  # noqa: E402
+from versoes import diretorio_atual  # noqa: E402
+
+
+def sortear_estado(df, gerador):
+    """Estado de filtro aleatório; cada filtro fica com todas as opções em metade dos casos."""
+    datas = df['data_fato'].dropna()
+    data_minima, data_maxima = datas.min().normalize(), datas.max().normalize()
+    filtros = {'data_inicial': data_minima.date(), 'data_final': data_maxima.date(), 'idade': (0, None)}
+    if gerador.random() < 0.5:
+        dias = sorted(gerador.integers(0, (data_maxima - data_minima).days + 1, size=2))
+        filtros['data_inicial'] = (data_minima + pd.Timedelta(days=int(dias[0]))).date()
+        filtros['data_final'] = (data_minima + pd.Timedelta(days=int(dias[1]))).date()
+    for chave, coluna in FILTROS_LISTA.items():
+        valores = list(df[coluna].dropna().unique())
+        if gerador.random() < 0.5 and len(valores) > 1:
+            quantidade = int(gerador.integers(1, len(valores)))
+            filtros[chave] = list(gerador.choice(valores, size=quantidade, replace=False))
+        else:
+            filtros[chave] = valores
+    if gerador.random() < 0.5:
+        idade_min = int(gerador.integers(0, 60))
+        filtros['idade'] = (idade_min, int(gerador.integers(idade_min, 101)))
+    return filtros
+
+
+def editar_estado(df, filtros, gerador):
+    """Cópia de 'filtros' com um só filtro (período, lista ou idade) sorteado de novo."""
+    novo = dict(filtros)
+    sorteado = sortear_estado(df, gerador)
+    chave = gerador.choice(['periodo', 'idade'] + list(FILTROS_LISTA))
+    if chave == 'periodo':
+        novo['data_inicial'], novo['data_final'] = sorteado['data_inicial'], sorteado['data_final']
+    else:
+        novo[chave] = sorteado[chave]
+    return novo
+
+
+def percentis(tempos):
+    tempos = np.array(tempos) * 1000
+    return np.percentile(tempos, 50), np.percentile(tempos, 95), tempos.max()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dados', default='data/processed', help="Diretório dos dados processados.")
+    parser.add_argument('--conjunto', default='geral', choices=['geral', 'feminicidio'])
+    parser.add_argument('--estados', type=int, default=200, help="Número de estados de filtro sorteados.")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    df = ler_conjunto(os.path.join(diretorio_atual(args.dados), args.conjunto))
+    print(f"{len(df)} linhas em '{args.conjunto}'.")
+
+    inicio = time.perf_counter()
+    indice = IndiceFiltros(df, cache=CacheSelecoes(limite_bytes=0))
+    print(f"Índice construído em {time.perf_counter() - inicio:.3f} s.")
+
+    gerador = np.random.default_rng(args.seed)
+    estados = [sortear_estado(df, gerador) for _ in range(args.estados)]
+    tempos_indice, tempos_mascaras = [], []
+    for filtros in estados:
+        inicio = time.perf_counter()
+        linhas = indice.linhas(filtros)
+        tempos_indice.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        esperadas = np.flatnonzero(mascara_ocorrencias(df, filtros))
+        tempos_mascaras.append(time.perf_counter() - inicio)
+        if not np.array_equal(linhas, esperadas):
+            print(f"Erro: linhas divergentes para o estado {filtros}")
+            sys.exit(1)
+
+    print(f"\n{'Método':<30} {'p50 (ms)':>10} {'p95 (ms)':>10} {'máx. (ms)':>10}")
+    for metodo, tempos in (('máscaras de colunas', tempos_mascaras), ('índice dos filtros', tempos_indice)):
+        p50, p95, maximo = percentis(tempos)
+        print(f"{metodo:<30} {p50:>10.2f} {p95:>10.2f} {maximo:>10.2f}")
+    print(f"\nAs {len(estados)} seleções coincidiram.")
+
+    # Edição passo a passo, a partir do primeiro estado sorteado
+    avaliador = AvaliadorIncremental(indice)
+    filtros = estados[0]
+    indice.selecionar(filtros, avaliador)
+    tempos_completo, tempos_incremental, recalculadas = [], [], []
+    for _ in range(args.estados):
+        filtros = editar_estado(df, filtros, gerador)
+        inicio = time.perf_counter()
+        esperadas = indice.selecionar(filtros)
+        tempos_completo.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        linhas = indice.selecionar(filtros, avaliador)
+        tempos_incremental.append(time.perf_counter() - inicio)
+        recalculadas.append(avaliador.recalculadas)
+        if not np.array_equal(indice.linhas(filtros), np.arange(len(df)) if linhas is None else linhas) \
+                or (esperadas is None) != (linhas is None):
+            print(f"Erro: linhas divergentes na edição para o estado {filtros}")
+            sys.exit(1)
+
+    print(f"\n{'Edição passo a passo':<30} {'p50 (ms)':>10} {'p95 (ms)':>10} {'máx. (ms)':>10}")
+    for metodo, tempos in (('estado inteiro', tempos_completo), ('avaliador incremental', tempos_incremental)):
+        p50, p95, maximo = percentis(tempos)
+        print(f"{metodo:<30} {p50:>10.2f} {p95:>10.2f} {maximo:>10.2f}")
+    print(f"\nDimensões recalculadas por passo: média de {np.mean(recalculadas):.2f}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Mede o tempo de servidor do painel por tipo de interação, antes e depois da
+execução parcial (fragmento do conteúdo da aba e reuso das linhas
+selecionadas quando os filtros não mudam):
+
+- antes: OVM_EXECUCAO_PARCIAL=0, toda interação reexecuta o script inteiro,
+  filtros e aba;
+- depois: OVM_EXECUCAO_PARCIAL=1 (padrão do painel).
+
+O painel roda pelo streamlit.testing (AppTest) sobre data/processed da raiz
+do repositório, e os tempos são os registrados pelo próprio painel (ver
+tempos_execucao.py). O AppTest reexecuta o script inteiro mesmo para widgets
+dentro de fragmentos; por isso, depois, o tempo de um widget da aba é o do
+conteúdo da aba, que é o que o fragmento reexecuta no servidor. Cada modo
+roda num processo separado.
+
+Uso:
+    python benchmarks/benchmark_interacoes.py [--repeticoes 20]
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+INTERACOES = ['sem mudança nos filtros', 'widget da aba', 'troca de aba', 'filtros', 'agrupamento']
+
+
+def alternar(widget, opcoes):
+    """Troca o valor do widget pela opção seguinte de 'opcoes'."""
+    atual = opcoes.index(widget.value) if widget.value in opcoes else -1
+    widget.set_value(opcoes[(atual + 1) % len(opcoes)])
+
+
+def widget_da_aba(at):
+    """Primeiro radio ou selectbox com mais de uma opção no conteúdo principal, ou None."""
+    for widget in list(at.main.radio) + list(at.main.selectbox):
+        if len(widget.options) > 1:
+            return widget
+    return None
+
+
+def interagir(at, interacao, rodada):
+    """Prepara a interação no AppTest; retorna False se a aba não tem widget para ela."""
+    if interacao == 'widget da aba':
+        widget = widget_da_aba(at)
+        if widget is None:
+            return False
+        alternar(widget, list(widget.options))
+    elif interacao == 'troca de aba':
+        at.query_params['tab'] = 'feminicidios' if rodada % 2 == 0 else 'analise-geral'
+    elif interacao == 'filtros':
+        data_inicial = at.sidebar.date_input[0]
+        minimo = at.session_state.df_geral['data_fato'].min().date()
+        data_inicial.set_value(minimo if rodada % 2 else minimo + datetime.timedelta(days=30))
+    elif interacao == 'agrupamento':
+        agrupamento = at.sidebar.selectbox[0]
+        alternar(agrupamento, list(agrupamento.options))
+    return True
+
+
+def simular(modo, repeticoes):
+    """Roda as interações no processo atual e retorna os tempos (ms) de cada uma."""
+    os.environ['OVM_EXECUCAO_PARCIAL'] = '1' if modo == 'depois' else '0'
+    os.chdir(RAIZ)
+    from streamlit.testing.v1 import AppTest
+    import tempos_execucao
+
+    at = AppTest.from_file(os.path.join(RAIZ, 'painel_observatorio.py'), default_timeout=120)
+    at.query_params['tab'] = 'analise-geral'
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    tempos = {'carga inicial': [tempos_execucao.resumo().set_index('interacao').loc['carga inicial', 'p50_ms']]}
+
+    for rodada in range(repeticoes):
+        for interacao in INTERACOES:
+            tempos_execucao.limpar()
+            if not interagir(at, interacao, rodada):
+                continue
+            at.run()
+            if at.exception:
+                raise RuntimeError(at.exception[0].message)
+            registrados = tempos_execucao.resumo().set_index('interacao')['p50_ms']
+            if modo == 'depois' and interacao == 'widget da aba':
+                tempo = registrados['conteúdo da aba']
+            else:
+                tempo = registrados.drop('conteúdo da aba').iloc[0]
+            tempos.setdefault(interacao, []).append(float(tempo))
+    return tempos
+
+
+def medir_em_subprocesso(modo, repeticoes):
+    """Executa simular() num processo novo e devolve o resultado."""
+    comando = [sys.executable, os.path.abspath(__file__), '--repeticoes', str(repeticoes), '--filho', modo]
+    saida = subprocess.run(comando, check=True, capture_output=True, text=True).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticoes', type=int, default=20, help="Repetições de cada interação.")
+    parser.add_argument('--filho', choices=['antes', 'depois'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        print(json.dumps(simular(args.filho, args.repeticoes)))
+        return
+
+    antes = medir_em_subprocesso('antes', args.repeticoes)
+    depois = medir_em_subprocesso('depois', args.repeticoes)
+
+    print(f"{'Interação':<26} {'Antes p50':>10} {'Antes p95':>10} {'Depois p50':>11} {'Depois p95':>11}")
+    for interacao in ['carga inicial'] + INTERACOES:
+        if interacao not in antes or interacao not in depois:
+            print(f"{interacao:<26} {'(a aba não tem widget para esta interação)':>44}")
+            continue
+        colunas = [np.percentile(tempos[interacao], p) for tempos in (antes, depois) for p in (50, 95)]
+        print(f"{interacao:<26} {colunas[0]:>10.1f} {colunas[1]:>10.1f} {colunas[2]:>11.1f} {colunas[3]:>11.1f}")
+    print("\nTempos de servidor em ms.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Compara o tempo e o pico de memória da leitura de uma planilha grande pelo
+caminho atual (pd.read_excel com openpyxl) e pela camada de ingestão de
+leitura_planilhas.py (leitura em streaming com projeção de colunas e cache
+em Parquet).
+
+Uso:
+    python benchmarks/benchmark_leitura_excel.py --linhas 300000 [--memoria]
+
+Com --memoria, o pico de memória é medido com tracemalloc, o que deixa todas
+as leituras bem mais lentas; compare os tempos apenas entre execuções com a
+mesma opção.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import leitura_planilhas  # noqa: E402
+from leitura_planilhas import ler_planilha  # noqa: E402
+
+COLUNAS_GERAL = ['data_do_fato', 'municipio', 'fato_comunicado', 'idade']
+
+
+def gerar_planilha(caminho, linhas, seed=42):
+    """Gera uma planilha no formato da base geral, com colunas extras não usadas pelo ETL."""
+    import openpyxl
+
+    rng = np.random.default_rng(seed)
+    fatos = ['Ameaça', 'Lesão Corporal Dolosa', 'Estupro', 'Injúria', 'Vias de fato']
+    municipios = [f"Município {i}" for i in range(295)]
+    inicio = datetime(2018, 1, 1)
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Dados')
+    ws.append(['Data do Fato', 'Município', 'Fato Comunicado', 'Idade', 'Bairro', 'Hora', 'Protocolo', 'Observação'])
+    dias = rng.integers(0, 365 * 7, linhas)
+    idx_fato = rng.integers(0, len(fatos), linhas)
+    idx_mun = rng.integers(0, len(municipios), linhas)
+    idades = rng.integers(0, 95, linhas)
+    for i in range(linhas):
+        idade = 'NI' if i % 40 == 0 else int(idades[i])
+        ws.append([inicio + timedelta(days=int(dias[i])), municipios[idx_mun[i]], fatos[idx_fato[i]], idade,
+                   f"Bairro {i % 500}", f"{i % 24:02d}:00", f"BO-{i:09d}", "Sem observações"])
+    wb.save(caminho)
+
+
+def medir(rotulo, funcao, memoria=False):
+    """Executa 'funcao' medindo tempo de parede e, opcionalmente, o pico de memória alocada."""
+    if memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    df = funcao()
+    duracao = time.perf_counter() - inicio
+    texto_memoria = '-'
+    if memoria:
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        texto_memoria = f"{pico / 1024 ** 2:.1f} MiB"
+    print(f"{rotulo:<45} {duracao:>9.2f} s {texto_memoria:>14}  {df.shape}")
+    return duracao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, default=300_000, help="Número de linhas da planilha sintética.")
+    parser.add_argument('--memoria', action='store_true', help="Mede também o pico de memória (mais lento).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = os.path.join(tmp, 'base_geral.xlsx')
+        print(f"Gerando planilha sintética com {args.linhas} linhas...")
+        gerar_planilha(caminho, args.linhas)
+        print(f"Tamanho do arquivo: {os.path.getsize(caminho) / 1024 ** 2:.1f} MiB")
+        print(f"Leitor calamine disponível: {leitura_planilhas.CALAMINE_DISPONIVEL}\n")
+
+        cache = os.path.join(tmp, 'cache')
+        print(f"{'Caminho':<45} {'Tempo':>11} {'Pico mem.':>14}")
+        base = medir("pd.read_excel (openpyxl, todas as colunas)", lambda: pd.read_excel(caminho), args.memoria)
+        medir("ler_planilha sem cache (colunas do ETL)",
+              lambda: ler_planilha(caminho, colunas=COLUNAS_GERAL, diretorio_cache=None), args.memoria)
+        medir("ler_planilha, cache frio (lê e grava Parquet)",
+              lambda: ler_planilha(caminho, colunas=COLUNAS_GERAL, diretorio_cache=cache), args.memoria)
+        quente = medir("ler_planilha, cache quente (só Parquet)",
+                       lambda: ler_planilha(caminho, colunas=COLUNAS_GERAL, diretorio_cache=cache), args.memoria)
+        print(f"\nGanho do cache quente sobre pd.read_excel: {base / quente:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
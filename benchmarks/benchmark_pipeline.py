@@ -0,0 +1,286 @@
+"""
+Mede o pipeline completo em volumes crescentes de dados sintéticos: cada
+etapa do ETL, o carregamento do painel (carregar_dados_processados), o bloco
+de filtros da barra lateral e as agregações principais das abas. Serve de
+linha de base para as mudanças de desempenho.
+
+O bloco de filtros é medido de dois modos: pelas máscaras do pandas
+(filtros.filtrar_ocorrencias) e pelo caminho que o painel usa, com as
+colunas compartilhadas de obter_dataset, o índice dos filtros
+(IndiceFiltros, com as contagens acumuladas por dia e o CacheSelecoes) e
+cada estado de filtro medido na primeira seleção e de novo, já em cache.
+
+Para cada volume, os dados brutos são gerados por gerar_dados_sinteticos.py
+(planilhas até o limite do Excel; Parquet acima dele, caso em que a leitura
+do Excel não é medida). O pico de memória é o aumento máximo do RSS do
+processo durante a etapa, amostrado por uma thread a cada poucos
+milissegundos; é uma aproximação, mas não deixa as etapas mais lentas.
+
+Uso:
+    python benchmarks/benchmark_pipeline.py --linhas 100000 1000000 10000000 \\
+        --geojson data/municipios_sc.json [--formato parquet] [--csv resultados.csv]
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+import psutil
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import consultas  # noqa: E402
+import filtros  # noqa: E402
+import preprocess_data as etl  # noqa: E402
+from cubo_ocorrencias import classificar_faixa_etaria, construir_cubo, contar_por  # noqa: E402
+from data_loader import dados_da_aba, ler_dados_processados, obter_dataset, obter_geojson, obter_indice  # noqa: E402
+from gerar_dados_sinteticos import gerar_bases  # noqa: E402
+from leitura_planilhas import ler_planilha  # noqa: E402
+
+
+class MedidorMemoria:
+    """Acompanha o pico de RSS do processo enquanto o bloco 'with' executa."""
+
+    def __init__(self, intervalo=0.005):
+        self.processo = psutil.Process()
+        self.intervalo = intervalo
+        self.inicial = self.pico = 0
+        self._parar = threading.Event()
+
+    def _amostrar(self):
+        while not self._parar.is_set():
+            self.pico = max(self.pico, self.processo.memory_info().rss)
+            time.sleep(self.intervalo)
+
+    def __enter__(self):
+        self.inicial = self.pico = self.processo.memory_info().rss
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+        self.pico = max(self.pico, self.processo.memory_info().rss)
+
+    @property
+    def aumento_mib(self):
+        return (self.pico - self.inicial) / 1024 ** 2
+
+
+class Relatorio:
+    """Executa e registra as etapas medidas de um volume de dados."""
+
+    def __init__(self, linhas):
+        self.linhas = linhas
+        self.resultados = []
+
+    def medir(self, etapa, funcao):
+        with MedidorMemoria() as memoria:
+            inicio = time.perf_counter()
+            resultado = funcao()
+            duracao = time.perf_counter() - inicio
+        self.resultados.append({'linhas': self.linhas, 'etapa': etapa, 'segundos': round(duracao, 4),
+                                'pico_mib': round(memoria.aumento_mib, 1)})
+        print(f"  {etapa:<48} {duracao:>9.3f} s {memoria.aumento_mib:>10.1f} MiB")
+        return resultado
+
+
+# --- ETAPAS MEDIDAS ---
+
+def ler_base(diretorio, nome, formato):
+    """Lê base_geral/base_feminicidio como o ETL leria (sem o cache em Parquet)."""
+    if formato == 'parquet':
+        return pd.read_parquet(os.path.join(diretorio, f"{nome}.parquet"))
+    fonte = f"{nome}.xlsx"
+    return ler_planilha(os.path.join(diretorio, fonte), colunas=etl.COLUNAS_UTILIZADAS.get(fonte),
+                        diretorio_cache=None)
+
+
+def medir_etl(relatorio, dados, diretorio_saida, formato):
+    """Executa as etapas do ETL uma a uma e grava as saídas."""
+    leitura = 'Excel' if formato == 'xlsx' else 'Parquet'
+    df_geral_bruto = relatorio.medir(f"leitura base_geral ({leitura})", lambda: ler_base(dados, 'base_geral', formato))
+    df_fem_bruto = relatorio.medir(f"leitura base_feminicidio ({leitura})",
+                                   lambda: ler_base(dados, 'base_feminicidio', formato))
+
+    df_regioes, _ = relatorio.medir("etapa regioes", lambda: etl.processar_regioes(dados))
+    df_populacao, _ = relatorio.medir("etapa populacao", lambda: etl.processar_populacao(dados))
+    df_calendario, _ = relatorio.medir("etapa calendario", lambda: etl.processar_calendario(dados))
+    geojson, _ = relatorio.medir("etapa geojson_sc", lambda: etl.processar_geojson(dados))
+    df_feminicidio = relatorio.medir("etapa feminicidio (limpeza + regiões)",
+                                     lambda: etl.padronizar_feminicidio(df_fem_bruto, df_regioes))
+    df_ocorrencias = relatorio.medir(
+        "etapa ocorrencias_gerais (limpeza + regiões)",
+        lambda: etl.associar_regioes(etl.padronizar_ocorrencias_gerais(df_geral_bruto), df_regioes))
+    df_geral, _ = relatorio.medir("etapa geral (união)", lambda: etl.processar_geral(df_ocorrencias, df_feminicidio))
+    cubo = relatorio.medir("etapa cubo_ocorrencias", lambda: construir_cubo(df_geral))
+
+    dfs = {'regioes': df_regioes, 'populacao': df_populacao, 'calendario': df_calendario,
+           'feminicidio': df_feminicidio, 'geral': df_geral, 'cubo_ocorrencias': cubo}
+    relatorio.medir("gravação das saídas",
+                    lambda: etl.salvar_dados_processados(dfs, {'geojson_sc': geojson}, diretorio_saida))
+
+
+# Métricas populacionais com filtro de faixa na barra lateral
+COLUNAS_METRICAS = ['populacao_feminina', 'media_anual_fatos', 'taxa_por_mil_mulheres', 'percentual_mulheres_vitimas']
+
+
+def aplicar_filtros(dfs, data_inicial, data_final, fatos=None, mesoregioes=None):
+    """
+    Reproduz o bloco de filtros da barra lateral: período, opções dos
+    filtros, métricas populacionais e filtragem final das duas bases. Os
+    filtros não informados ficam com todas as opções, como no padrão do painel.
+    """
+    df_periodo = filtros.filtrar_periodo(dfs['geral'], data_inicial, data_final)
+    opcoes = filtros.opcoes_disponiveis(df_periodo)
+    metricas = filtros.calcular_metricas_populacionais(df_periodo, dfs['populacao'])
+    faixas = [(metricas[col].min(), metricas[col].max()) for col in COLUNAS_METRICAS]
+    municipios_populacao = filtros.municipios_por_metricas(metricas, *faixas)
+
+    selecao = dict(municipios=opcoes['municipios'], mesoregioes=mesoregioes or opcoes['mesoregioes'],
+                   associacoes=opcoes['associacoes'], idade=(0, 100), municipios_populacao=municipios_populacao)
+    df_geral = filtros.filtrar_ocorrencias(dfs['geral'], data_inicial, data_final,
+                                           fatos=fatos or opcoes['fatos'], **selecao)
+    df_feminicidio = filtros.filtrar_ocorrencias(dfs['feminicidio'], data_inicial, data_final, **selecao)
+    return df_geral, df_feminicidio
+
+
+def carregar_aba(diretorio, aba='Análise Geral'):
+    """Conjuntos da aba obtidos como no painel: colunas compartilhadas de obter_dataset."""
+    return {nome: obter_geojson(diretorio) if nome == 'geojson_sc' else obter_dataset(nome, colunas, diretorio)
+            for nome, colunas in dados_da_aba(aba, diretorio).items()}
+
+
+def filtrar_pelo_indice(motor, data_inicial, data_final, fatos=None, mesoregioes=None):
+    """
+    O mesmo bloco de aplicar_filtros, como o painel o executa: opções e
+    métricas populacionais pelas contagens acumuladas por dia do índice e
+    posições das linhas das duas bases por IndiceFiltros.selecionar.
+    """
+    opcoes = motor.opcoes_disponiveis(data_inicial, data_final)
+    metricas = motor.metricas_populacionais(data_inicial, data_final)
+    faixas = [(metricas[col].min(), metricas[col].max()) for col in COLUNAS_METRICAS]
+    municipios_populacao = filtros.municipios_por_metricas(metricas, *faixas)
+
+    argumentos = (data_inicial, data_final, opcoes['municipios'], mesoregioes or opcoes['mesoregioes'],
+                  opcoes['associacoes'], (0, 100), municipios_populacao)
+    return (motor.selecionar_ocorrencias('geral', *argumentos, fatos=fatos or opcoes['fatos']).linhas,
+            motor.selecionar_ocorrencias('feminicidio', *argumentos).linhas)
+
+
+def agregacoes_principais(df):
+    """Agregações dos gráficos da aba de análise geral, calculadas sobre as linhas filtradas."""
+    return [
+        df.groupby([df['data_fato'].dt.to_period('M'), 'fato_comunicado'], observed=True).size(),
+        df.groupby(df['data_fato'].dt.dayofweek).size(),
+        df.groupby('ano', observed=True).size(),
+        df.groupby(df['data_fato'].dt.month).size(),
+        df.groupby(classificar_faixa_etaria(df['idade_vitima']), observed=True).size(),
+        df.groupby('fato_comunicado', observed=True).size(),
+        df.groupby(['municipio_normalizado', 'mesoregiao', 'associacao'], observed=True).size(),
+    ]
+
+
+def agregacoes_cubo(cubo, filtros_aplicados):
+    """As mesmas agregações respondidas pelo cubo pré-calculado."""
+    dimensoes = [['ano', 'mes_num', 'fato_comunicado'], ['dia_semana_num'], ['ano'], ['mes_num'],
+                 ['faixa_etaria'], ['fato_comunicado'], ['municipio_normalizado', 'mesoregiao', 'associacao']]
+    return [contar_por(por, filtros_aplicados, cubo) for por in dimensoes]
+
+
+def medir_painel(relatorio, diretorio_raiz):
+    """Mede o carregamento e as interações do painel sobre as saídas gravadas."""
+    diretorio_atual = os.getcwd()
+    os.chdir(diretorio_raiz)  # carregar_dados_processados lê de 'data/processed'
+    try:
+        # Mesma leitura de carregar_dados_processados, sem o cache do Streamlit
+        dfs, _ = relatorio.medir("carregar_dados_processados",
+                                 lambda: ler_dados_processados('data/processed'))
+    finally:
+        os.chdir(diretorio_atual)
+
+    data_minima = dfs['geral']['data_fato'].min().date()
+    data_maxima = dfs['geral']['data_fato'].max().date()
+    df_filtrado, _ = relatorio.medir("filtros da barra lateral (padrão)",
+                                     lambda: aplicar_filtros(dfs, data_minima, data_maxima))
+
+    ultimo_ano = data_maxima.year
+    data_inicial = pd.Timestamp(ultimo_ano, 1, 1).date()
+    fatos = sorted(dfs['geral']['fato_comunicado'].dropna().unique())[:2]
+    mesoregioes = sorted(dfs['geral']['mesoregiao'].dropna().unique())[:1]
+    relatorio.medir("filtros da barra lateral (1 ano, 2 fatos)",
+                    lambda: aplicar_filtros(dfs, data_inicial, data_maxima, fatos=fatos, mesoregioes=mesoregioes))
+
+    relatorio.medir("agregações principais (linhas filtradas)", lambda: agregacoes_principais(df_filtrado))
+    filtros_aplicados = {'data_inicial': data_minima, 'data_final': data_maxima}
+    relatorio.medir("agregações principais (cubo)",
+                    lambda: agregacoes_cubo(dfs['cubo_ocorrencias'], filtros_aplicados))
+    medir_indice(relatorio, os.path.join(diretorio_raiz, 'data', 'processed'), data_minima, data_maxima,
+                 data_inicial, fatos, mesoregioes)
+
+
+def medir_indice(relatorio, diretorio, data_minima, data_maxima, data_inicial, fatos, mesoregioes):
+    """Mede o caminho do painel: colunas compartilhadas, índice dos filtros e seleções em cache."""
+    tabelas = relatorio.medir("obter_dataset (aba Análise Geral)", lambda: carregar_aba(diretorio))
+    indices = relatorio.medir("obter_indice (geral e feminicidio)",
+                              lambda: {nome: obter_indice(nome, diretorio) for nome in ('geral', 'feminicidio')})
+    motor = consultas.criar_consultas({nome: tabelas[nome] for nome in ('geral', 'feminicidio', 'populacao')},
+                                      cubo=tabelas['cubo_ocorrencias'], backend='pandas', indices=indices)
+
+    relatorio.medir("contagens_periodo (monta as acumuladas)",
+                    lambda: indices['geral'].contagens_periodo('municipio_normalizado', data_inicial, data_maxima))
+    relatorio.medir("contagens_periodo (acumuladas prontas)",
+                    lambda: indices['geral'].contagens_periodo('municipio_normalizado', data_minima, data_maxima))
+
+    estados = {
+        'padrão': dict(data_inicial=data_minima, data_final=data_maxima),
+        '1 ano, 2 fatos': dict(data_inicial=data_inicial, data_final=data_maxima, fatos=fatos,
+                               mesoregioes=mesoregioes),
+    }
+    for rotulo, estado in estados.items():
+        relatorio.medir(f"filtros pelo índice ({rotulo}, 1ª seleção)", lambda: filtrar_pelo_indice(motor, **estado))
+        relatorio.medir(f"filtros pelo índice ({rotulo}, em cache)", lambda: filtrar_pelo_indice(motor, **estado))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, nargs='+', default=[100_000, 1_000_000, 10_000_000],
+                        help="Volumes da base geral a medir.")
+    parser.add_argument('--geojson', default='data/municipios_sc.json', help="Malha municipal de SC.")
+    parser.add_argument('--regioes', help="Base real de regiões e associações (opcional).")
+    parser.add_argument('--formato', choices=['xlsx', 'parquet'],
+                        help="Formato dos dados brutos (padrão: xlsx se couber no Excel).")
+    parser.add_argument('--csv', help="Arquivo CSV onde gravar os resultados.")
+    args = parser.parse_args()
+
+    resultados = []
+    for linhas in args.linhas:
+        with tempfile.TemporaryDirectory() as tmp:
+            dados = os.path.join(tmp, 'data')
+            print(f"\n=== {linhas} ocorrências ===")
+            inicio = time.perf_counter()
+            formato = gerar_bases(dados, linhas, args.geojson, args.regioes, args.formato)
+            print(f"Dados sintéticos ({formato}) gerados em {time.perf_counter() - inicio:.1f} s\n")
+            print(f"  {'Etapa':<48} {'Tempo':>11} {'Pico RSS':>14}")
+
+            relatorio = Relatorio(linhas)
+            medir_etl(relatorio, dados, os.path.join(dados, 'processed'), formato)
+            medir_painel(relatorio, tmp)
+            resultados.extend(relatorio.resultados)
+
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            escritor = csv.DictWriter(f, fieldnames=['linhas', 'etapa', 'segundos', 'pico_mib'])
+            escritor.writeheader()
+            escritor.writerows(resultados)
+        print(f"\nResultados gravados em '{args.csv}'.")
+
+
+if __name__ == '__main__':
+    main()
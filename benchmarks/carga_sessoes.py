@@ -0,0 +1,436 @@
+"""
+Teste de carga do painel com várias sessões simultâneas. Para cada número
+de sessões pedido, sobe um servidor novo do painel (por padrão pelo
+aquecer_painel.py, como na implantação) sobre os dados de --dados e abre as
+sessões pelo mesmo protocolo do navegador (websocket em /_stcore/stream,
+mensagens protobuf do Streamlit), sem navegador. Cada sessão carrega o
+painel e repete, em ordem sorteada e com pausas de "leitura" entre elas,
+as interações:
+
+- período: muda a Data Inicial e aplica os filtros;
+- municípios: escolhe alguns municípios (ou volta a todos) e aplica os filtros;
+- tipo de gráfico: troca a opção do primeiro radio ou selectbox da aba (com
+  a execução parcial, reexecuta só o fragmento da aba);
+- troca de aba: abre outra aba. O link da navegação recarrega a página, então
+  a troca abre uma sessão nova com ?tab=..., como no navegador.
+
+A latência de cada interação é medida no cliente, do envio do pedido até o
+fim da execução (incluindo as execuções repetidas por st.rerun). Durante a
+carga, o processo do servidor e seus filhos são amostrados a cada 0,5 s
+(CPU e RSS). O relatório traz p50, p95 e p99 das latências por interação,
+a vazão (execuções por segundo), os erros (exceções mostradas no painel), a
+CPU e o pico de RSS de cada processo.
+
+Para rodar localmente sem os dados reais, gere dados sintéticos e
+pré-processe-os:
+    python benchmarks/gerar_dados_sinteticos.py --linhas 1000000 --saida /tmp/dados_1m
+    python preprocess_data.py --dados /tmp/dados_1m --saida /tmp/dados_1m/processed
+
+O servidor usa a porta --porta e grava static/pronto.json na raiz do
+repositório; não rode o teste ao lado de outro servidor do painel na mesma
+pasta.
+
+Uso:
+    python benchmarks/carga_sessoes.py --dados /tmp/dados_1m/processed [--sessoes 1 10 25] [--rodadas 5]
+        [--pausa 1.0] [--rampa 5] [--sem-aquecimento] [--csv medicoes.csv]
+"""
+import argparse
+import asyncio
+import csv
+import datetime
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import numpy as np
+import psutil
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ClientState_pb2 import ClientState
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.websocket import websocket_connect
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from aquecer_painel import ABAS_AQUECIDAS, ARQUIVO_PRONTO, SCRIPT_PAINEL  # noqa: E402
+from data_loader import VARIAVEL_DIRETORIO_DADOS  # noqa: E402
+
+INTERACOES = ['período', 'municípios', 'tipo de gráfico', 'troca de aba']
+ABAS = ABAS_AQUECIDAS
+
+# Área da página no caminho dos elementos (delta_path[0]) do protocolo do Streamlit
+AREA_PRINCIPAL = 0
+
+AMOSTRAGEM_S = 0.5
+ESPERA_SERVIDOR_S = 900
+
+FIM_COM_SUCESSO = (ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY)
+
+
+class SessaoPainel:
+    """
+    Uma sessão do painel vista pelo cliente: envia os pedidos de execução com
+    o estado dos widgets, como o navegador, e guarda os elementos recebidos
+    (por caminho na página) para encontrar os widgets pelo rótulo.
+    """
+
+    def __init__(self, porta):
+        self.url = f'ws://localhost:{porta}/_stcore/stream'
+        self.conexao = None
+        self.query_string = ''
+        self.pagina = ''
+        self.elementos = {}
+        self.estados = {}
+
+    async def abrir(self, query_string):
+        """Abre uma sessão nova (carga da página) e espera a primeira execução; retorna (segundos, erros)."""
+        inicio = time.perf_counter()
+        self.fechar()
+        self.conexao = await websocket_connect(self.url, subprotocols=['streamlit'], max_message_size=1024 ** 3)
+        self.query_string, self.pagina = query_string, ''
+        self.elementos.clear()
+        self.estados.clear()
+        _, erros = await self.executar()
+        return time.perf_counter() - inicio, erros
+
+    def fechar(self):
+        if self.conexao is not None:
+            self.conexao.close()
+            self.conexao = None
+
+    async def executar(self, fragmento=''):
+        """
+        Pede uma execução do script (ou só do 'fragmento') com os estados
+        atuais dos widgets e espera o fim; retorna (segundos, erros).
+        """
+        pedido = BackMsg()
+        pedido.rerun_script.CopyFrom(ClientState(
+            query_string=self.query_string, page_script_hash=self.pagina, fragment_id=fragmento))
+        pedido.rerun_script.widget_states.widgets.extend(self.estados.values())
+        # Como no navegador, o clique de um botão vale uma execução só
+        for id_widget in [i for i, estado in self.estados.items() if estado.WhichOneof('value') == 'trigger_value']:
+            del self.estados[id_widget]
+
+        inicio = time.perf_counter()
+        await self.conexao.write_message(pedido.SerializeToString(), binary=True)
+        erros = 0
+        while True:
+            dados = await self.conexao.read_message()
+            if dados is None:
+                raise ConnectionError("O servidor fechou a conexão da sessão.")
+            mensagem = ForwardMsg.FromString(dados)
+            tipo = mensagem.WhichOneof('type')
+            if tipo == 'new_session':
+                self.pagina = mensagem.new_session.page_script_hash
+                if not mensagem.new_session.fragment_ids_this_run:
+                    self.elementos.clear()
+            elif tipo == 'page_info_changed':
+                self.query_string = mensagem.page_info_changed.query_string
+            elif tipo == 'delta' and mensagem.delta.WhichOneof('type') == 'new_element':
+                elemento = mensagem.delta.new_element
+                tipo_elemento = elemento.WhichOneof('type')
+                erros += tipo_elemento == 'exception'
+                self.elementos[tuple(mensagem.metadata.delta_path)] = (
+                    tipo_elemento, getattr(elemento, tipo_elemento), mensagem.delta.fragment_id)
+            elif tipo == 'session_event' and mensagem.session_event.WhichOneof('type') == 'script_compilation_exception':
+                erros += 1
+            elif tipo == 'script_finished':
+                if mensagem.script_finished in FIM_COM_SUCESSO:
+                    break
+                if mensagem.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    erros += 1
+                    break
+                # FINISHED_EARLY_FOR_RERUN: st.rerun(); a execução seguinte faz parte da mesma interação
+
+        # Widgets que sumiram (ou mudaram de id) voltam ao padrão, como no navegador
+        ids = {getattr(proto, 'id', None) for _, proto, _ in self.elementos.values()}
+        self.estados = {i: estado for i, estado in self.estados.items() if i in ids}
+        return time.perf_counter() - inicio, erros
+
+    def widget(self, tipo, rotulo=None, area=None, minimo_opcoes=0):
+        """(proto, fragment_id) do primeiro widget 'tipo' com o rótulo e a área pedidos, ou (None, None)."""
+        for caminho, (tipo_elemento, proto, fragmento) in sorted(self.elementos.items()):
+            if (tipo_elemento == tipo and (rotulo is None or proto.label == rotulo)
+                    and (area is None or caminho[0] == area) and len(getattr(proto, 'options', ())) >= minimo_opcoes):
+                return proto, fragmento
+        return None, None
+
+    def definir(self, id_widget, **valor):
+        """Define o valor de um widget para as próximas execuções (por exemplo, bool_value=True)."""
+        estado = WidgetState(id=id_widget)
+        for campo, conteudo in valor.items():
+            if campo == 'string_array_value':
+                estado.string_array_value.data[:] = conteudo
+            else:
+                setattr(estado, campo, conteudo)
+        self.estados[id_widget] = estado
+
+    def valor(self, id_widget, campo, padrao):
+        estado = self.estados.get(id_widget)
+        return padrao if estado is None else getattr(estado, campo)
+
+    async def aplicar_filtros(self):
+        botao, _ = self.widget('button', "✅ Aplicar filtros")
+        if botao is None:
+            raise RuntimeError("Botão 'Aplicar filtros' não encontrado no painel.")
+        self.definir(botao.id, trigger_value=True)
+        return await self.executar()
+
+
+async def interagir(sessao, interacao, aleatorio, aba_atual):
+    """
+    Faz a 'interacao' na sessão e retorna (segundos, erros, aba), ou None se
+    a aba não tem widget para ela.
+    """
+    if interacao == 'período':
+        data, _ = sessao.widget('date_input', "Data Inicial")
+        minimo, maximo = (datetime.datetime.strptime(d, '%Y/%m/%d').date() for d in (data.min, data.max))
+        nova = minimo + datetime.timedelta(days=aleatorio.randint(0, max((maximo - minimo).days - 30, 0)))
+        sessao.definir(data.id, string_array_value=[nova.strftime('%Y/%m/%d')])
+        return (*await sessao.aplicar_filtros(), aba_atual)
+
+    if interacao == 'municípios':
+        todos, _ = sessao.widget('checkbox', "Todos os municípios")
+        especificos, _ = sessao.widget('multiselect', "Município(s) específico(s)")
+        if sessao.valor(todos.id, 'bool_value', todos.default) and especificos.options:
+            escolhidos = aleatorio.sample(list(especificos.options), min(len(especificos.options), aleatorio.randint(1, 5)))
+            sessao.definir(especificos.id, string_array_value=escolhidos)
+            sessao.definir(todos.id, bool_value=False)
+        else:
+            sessao.definir(todos.id, bool_value=True)
+        return (*await sessao.aplicar_filtros(), aba_atual)
+
+    if interacao == 'tipo de gráfico':
+        for tipo, campo in (('radio', 'int_value'), ('selectbox', 'string_value')):
+            widget, fragmento = sessao.widget(tipo, area=AREA_PRINCIPAL, minimo_opcoes=2)
+            if widget is None:
+                continue
+            opcoes = list(widget.options)
+            if campo == 'int_value':
+                sessao.definir(widget.id, int_value=(sessao.valor(widget.id, campo, widget.default) + 1) % len(opcoes))
+            else:
+                atual = sessao.valor(widget.id, campo, opcoes[widget.default] if widget.HasField('default') else '')
+                proxima = (opcoes.index(atual) + 1) % len(opcoes) if atual in opcoes else 0
+                sessao.definir(widget.id, string_value=opcoes[proxima])
+            return (*await sessao.executar(fragmento), aba_atual)
+        return None
+
+    aba = aleatorio.choice([a for a in ABAS if a != aba_atual])
+    return (*await sessao.abrir(f'tab={aba}'), aba)
+
+
+async def simular_sessao(numero, porta, rodadas, pausa, atraso, semente, medicoes):
+    """Uma sessão: carga inicial e 'rodadas' rodadas das interações; as medições vão para 'medicoes'."""
+    aleatorio = random.Random(semente * 100_003 + numero)
+    await asyncio.sleep(atraso)
+    sessao = SessaoPainel(porta)
+    aba = ABAS[0]
+    try:
+        segundos, erros = await sessao.abrir(f'tab={aba}')
+        medicoes.append({'sessao': numero, 'interacao': 'carga inicial', 'ms': segundos * 1000, 'erros': erros})
+        for _ in range(rodadas):
+            roteiro = list(INTERACOES)
+            aleatorio.shuffle(roteiro)
+            for interacao in roteiro:
+                if pausa > 0:
+                    await asyncio.sleep(aleatorio.expovariate(1 / pausa))
+                resultado = await interagir(sessao, interacao, aleatorio, aba)
+                if resultado is None:
+                    continue
+                segundos, erros, aba = resultado
+                medicoes.append({'sessao': numero, 'interacao': interacao, 'ms': segundos * 1000, 'erros': erros})
+    finally:
+        sessao.fechar()
+
+
+async def simular_sessoes(sessoes, porta, rodadas, pausa, rampa, semente):
+    """Roda as sessões ao mesmo tempo, com inícios espalhados por 'rampa' segundos; retorna as medições."""
+    medicoes = []
+    await asyncio.gather(*(
+        simular_sessao(numero, porta, rodadas, pausa, rampa * numero / sessoes, semente, medicoes)
+        for numero in range(sessoes)))
+    return medicoes
+
+
+class AmostradorRecursos(threading.Thread):
+    """Amostra a CPU e o RSS do processo do servidor e de seus filhos até parar()."""
+
+    def __init__(self, pid):
+        super().__init__(daemon=True)
+        self.principal = psutil.Process(pid)
+        self.processos = {}
+        self.cpu = []
+        self.rss_maximo = {}
+        self.rss_total_maximo = 0
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(AMOSTRAGEM_S):
+            try:
+                atuais = [self.principal] + self.principal.children(recursive=True)
+            except psutil.NoSuchProcess:
+                return
+            cpu = rss_total = 0
+            for processo in atuais:
+                if processo.pid not in self.processos:
+                    # A primeira leitura de cpu_percent só marca o início do intervalo
+                    self.processos[processo.pid] = processo
+                    processo.cpu_percent()
+                    continue
+                try:
+                    cpu += processo.cpu_percent()
+                    rss = processo.memory_info().rss
+                except psutil.NoSuchProcess:
+                    continue
+                rss_total += rss
+                descricao = f"{processo.pid} {' '.join(processo.cmdline()[:3])}"
+                self.rss_maximo[descricao] = max(self.rss_maximo.get(descricao, 0), rss)
+            self.cpu.append(cpu)
+            self.rss_total_maximo = max(self.rss_total_maximo, rss_total)
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+
+def iniciar_servidor(porta, dados, aquecer, log):
+    """Sobe o servidor do painel na 'porta' sobre os 'dados' e espera ele ficar pronto; retorna o processo."""
+    opcoes = ['--server.port', str(porta), '--server.headless', 'true', '--browser.gatherUsageStats', 'false']
+    if aquecer:
+        comando = [sys.executable, 'aquecer_painel.py'] + opcoes
+    else:
+        comando = [sys.executable, '-m', 'streamlit', 'run', SCRIPT_PAINEL] + opcoes
+    ambiente = dict(os.environ, **{VARIAVEL_DIRETORIO_DADOS: os.path.abspath(dados)})
+    processo = subprocess.Popen(comando, cwd=RAIZ, env=ambiente, stdout=log, stderr=subprocess.STDOUT)
+
+    # Com o aquecimento, o servidor só está pronto com o sinal de prontidão
+    caminho = f'/app/{ARQUIVO_PRONTO}' if aquecer else '/_stcore/health'
+    limite = time.monotonic() + ESPERA_SERVIDOR_S
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"O servidor terminou ao iniciar (código {processo.returncode}); ver {log.name}.")
+        try:
+            with urllib.request.urlopen(f'http://localhost:{porta}{caminho}', timeout=2) as resposta:
+                if resposta.status == 200:
+                    return processo
+        except OSError:
+            pass
+        time.sleep(0.5)
+    parar_servidor(processo)
+    raise RuntimeError(f"O servidor não ficou pronto em {ESPERA_SERVIDOR_S} s; ver {log.name}.")
+
+
+def parar_servidor(processo):
+    processo.terminate()
+    try:
+        processo.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        processo.kill()
+        processo.wait()
+
+
+def percentis(ms):
+    return {f'p{p}_ms': float(np.percentile(ms, p)) for p in (50, 95, 99)}
+
+
+def medir(sessoes, args):
+    """Sobe um servidor, roda 'sessoes' sessões simultâneas e retorna as medições e o resumo."""
+    with tempfile.NamedTemporaryFile('w', prefix='carga_sessoes_', suffix='.log', delete=False) as log:
+        processo = iniciar_servidor(args.porta, args.dados, not args.sem_aquecimento, log)
+        try:
+            amostrador = AmostradorRecursos(processo.pid)
+            amostrador.start()
+            inicio = time.perf_counter()
+            medicoes = asyncio.run(simular_sessoes(sessoes, args.porta, args.rodadas, args.pausa, args.rampa,
+                                                   args.seed))
+            duracao = time.perf_counter() - inicio
+            amostrador.parar()
+        finally:
+            parar_servidor(processo)
+    os.remove(log.name)
+
+    ms = np.array([m['ms'] for m in medicoes])
+    resumo = {
+        'sessoes': sessoes,
+        'execucoes': len(medicoes),
+        'erros': sum(m['erros'] for m in medicoes),
+        'duracao_s': duracao,
+        'vazao': len(medicoes) / duracao,
+        **percentis(ms),
+        'cpu_media': float(np.mean(amostrador.cpu)) if amostrador.cpu else 0.0,
+        'cpu_max': max(amostrador.cpu, default=0.0),
+        'rss_total_max_mib': amostrador.rss_total_maximo / 1024 ** 2,
+        'rss_por_processo': amostrador.rss_maximo,
+        'por_interacao': {
+            interacao: {'execucoes': int(np.sum(selecao)), **percentis(ms[selecao])}
+            for interacao in ['carga inicial'] + INTERACOES
+            if (selecao := np.array([m['interacao'] == interacao for m in medicoes])).any()},
+    }
+    for medicao in medicoes:
+        medicao['sessoes'] = sessoes
+    return medicoes, resumo
+
+
+def imprimir_nivel(resumo):
+    print(f"\n=== {resumo['sessoes']} sessão(ões) simultânea(s) ===")
+    print(f"Execuções: {resumo['execucoes']}  erros: {resumo['erros']}  duração: {resumo['duracao_s']:.1f} s  "
+          f"vazão: {resumo['vazao']:.2f} execuções/s")
+    print(f"CPU do servidor: média {resumo['cpu_media']:.0f}%  máximo {resumo['cpu_max']:.0f}%  "
+          f"(100% = um núcleo)")
+    for descricao, rss in resumo['rss_por_processo'].items():
+        print(f"RSS máximo: {rss / 1024 ** 2:>8.0f} MiB  [{descricao}]")
+    print(f"\n{'Interação':<18} {'Execuções':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for interacao, linha in resumo['por_interacao'].items():
+        print(f"{interacao:<18} {linha['execucoes']:>9} {linha['p50_ms']:>9.1f} {linha['p95_ms']:>9.1f} "
+              f"{linha['p99_ms']:>9.1f}")
+    print(f"{'todas':<18} {resumo['execucoes']:>9} {resumo['p50_ms']:>9.1f} {resumo['p95_ms']:>9.1f} "
+          f"{resumo['p99_ms']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dados', default=os.path.join(RAIZ, 'data', 'processed'),
+                        help="Diretório dos dados processados servidos pelo painel.")
+    parser.add_argument('--sessoes', type=int, nargs='+', default=[1, 10, 25],
+                        help="Números de sessões simultâneas; cada um roda num servidor novo.")
+    parser.add_argument('--rodadas', type=int, default=5, help="Rodadas das interações por sessão.")
+    parser.add_argument('--pausa', type=float, default=1.0,
+                        help="Pausa média (s, exponencial) entre as interações de uma sessão; 0 para nenhuma.")
+    parser.add_argument('--rampa', type=float, default=5.0, help="Segundos em que os inícios das sessões se espalham.")
+    parser.add_argument('--porta', type=int, default=8599, help="Porta do servidor do teste.")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--sem-aquecimento', action='store_true',
+                        help="Sobe o servidor com 'streamlit run', sem o aquecer_painel.py.")
+    parser.add_argument('--csv', help="Grava cada medição (sessões, sessão, interação, ms, erros) neste arquivo.")
+    args = parser.parse_args()
+
+    todas, resumos = [], []
+    for sessoes in args.sessoes:
+        medicoes, resumo = medir(sessoes, args)
+        imprimir_nivel(resumo)
+        todas.extend(medicoes)
+        resumos.append(resumo)
+
+    print(f"\n{'Sessões':>7} {'Vazão/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'CPU méd.':>9} {'RSS máx.':>10} "
+          f"{'Erros':>6}")
+    for resumo in resumos:
+        print(f"{resumo['sessoes']:>7} {resumo['vazao']:>8.2f} {resumo['p50_ms']:>9.1f} {resumo['p95_ms']:>9.1f} "
+              f"{resumo['p99_ms']:>9.1f} {resumo['cpu_media']:>8.0f}% {resumo['rss_total_max_mib']:>6.0f} MiB "
+              f"{resumo['erros']:>6}")
+    print("\nLatências em ms, medidas no cliente (do pedido ao fim da execução).")
+
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            escritor = csv.DictWriter(f, fieldnames=['sessoes', 'sessao', 'interacao', 'ms', 'erros'])
+            escritor.writeheader()
+            escritor.writerows(todas)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Compara os backends de consultas do painel (consultas.py) sobre os dados
+processados: para um conjunto fixo de cenários de filtro, confere que
+'pandas' e 'duckdb' devolvem exatamente os mesmos resultados (opções dos
+filtros, métricas populacionais, linhas filtradas das duas bases e as
+agregações das abas) e mede o tempo de cada um.
+
+Termina com código de saída 1 se algum resultado divergir, de modo que
+também serve de teste de regressão ao mexer em qualquer um dos backends.
+
+Uso:
+    python benchmarks/comparar_backends.py --dados data/processed [--repeticoes 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+import consultas  # noqa: E402
+import filtros  # noqa: E402
+from data_loader import ler_dados_processados  # noqa: E402
+
+# Agregações das abas, como listas de dimensões do cubo
+AGREGACOES = [
+    [], ['ano', 'mes_num', 'fato_comunicado'], ['dia_semana_num'], ['ano'], ['mes_num'], ['faixa_etaria'],
+    ['fato_comunicado'], ['municipio_normalizado', 'mesoregiao', 'associacao'],
+]
+
+
+def montar_cenarios(df_geral):
+    """Cenários de filtro da barra lateral, do padrão (tudo selecionado) a recortes estreitos."""
+    data_minima = df_geral['data_fato'].min().date()
+    data_maxima = df_geral['data_fato'].max().date()
+    ultimo_ano = pd.Timestamp(data_maxima.year, 1, 1).date()
+    meio_do_mes = pd.Timestamp(data_maxima.year, 1, 15).date()
+    fatos = sorted(df_geral['fato_comunicado'].dropna().unique())
+    mesoregioes = sorted(df_geral['mesoregiao'].dropna().unique())
+    return [
+        {'nome': 'padrão', 'periodo': (data_minima, data_maxima)},
+        {'nome': 'último ano, 2 fatos', 'periodo': (ultimo_ano, data_maxima), 'fatos': fatos[:2]},
+        {'nome': 'uma mesorregião, 18 a 60 anos', 'periodo': (data_minima, data_maxima),
+         'mesoregioes': mesoregioes[:1], 'idade': (18, 60)},
+        {'nome': 'período fora dos limites do mês', 'periodo': (meio_do_mes, data_maxima), 'idade': (30, 100)},
+        {'nome': 'municípios acima da mediana da taxa', 'periodo': (data_minima, data_maxima), 'taxa_mediana': True},
+    ]
+
+
+def executar_cenario(motor, cenario):
+    """Executa as consultas de um cenário como o painel faz e devolve os resultados."""
+    data_inicial, data_final = cenario['periodo']
+    opcoes = motor.opcoes_disponiveis(data_inicial, data_final)
+    metricas = motor.metricas_populacionais(data_inicial, data_final)
+
+    faixas = {col: (metricas[col].min(), metricas[col].max()) for col in
+              ['populacao_feminina', 'media_anual_fatos', 'taxa_por_mil_mulheres', 'percentual_mulheres_vitimas']}
+    if cenario.get('taxa_mediana'):
+        faixas['taxa_por_mil_mulheres'] = (metricas['taxa_por_mil_mulheres'].median(),
+                                           faixas['taxa_por_mil_mulheres'][1])
+    municipios_populacao = filtros.municipios_por_metricas(
+        metricas, faixas['populacao_feminina'], faixas['media_anual_fatos'], faixas['taxa_por_mil_mulheres'],
+        faixas['percentual_mulheres_vitimas'])
+
+    idade = cenario.get('idade', (0, 100))
+    selecao = dict(municipios=opcoes['municipios'], mesoregioes=cenario.get('mesoregioes', opcoes['mesoregioes']),
+                   associacoes=opcoes['associacoes'], idade=idade, municipios_populacao=municipios_populacao)
+    fatos = cenario.get('fatos', opcoes['fatos'])
+    resultados = {
+        'opções': opcoes,
+        'métricas populacionais': metricas,
+        'linhas de geral': motor.filtrar_ocorrencias('geral', data_inicial, data_final, fatos=fatos, **selecao),
+        'linhas de feminicidio': motor.filtrar_ocorrencias('feminicidio', data_inicial, data_final, **selecao),
+    }
+
+    filtros_aplicados = {
+        'data_inicial': data_inicial, 'data_final': data_final, 'fatos': list(fatos),
+        'municipios': list(selecao['municipios']), 'mesoregioes': list(selecao['mesoregioes']),
+        'associacoes': list(selecao['associacoes']), 'idade': (idade[0], None if idade[1] == 100 else idade[1]),
+        'municipios_normalizados': list(municipios_populacao),
+    }
+    for por in AGREGACOES:
+        resultados[f"contagens por {por}"] = motor.contar_por(por, filtros_aplicados)
+        resultados[f"feminicídios por {por}"] = motor.contar_por(por, filtros_aplicados, 'feminicidio')
+    return resultados
+
+
+def diferenca(esperado, obtido):
+    """Descrição da primeira diferença entre dois resultados, ou None se forem idênticos."""
+    try:
+        if isinstance(esperado, pd.DataFrame):
+            pd.testing.assert_frame_equal(esperado, obtido)
+        elif esperado != obtido:
+            return "valores diferentes"
+    except AssertionError as e:
+        return str(e).splitlines()[0]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dados', default='data/processed', help="Diretório dos dados processados.")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Execuções de cada cenário (vale a menor).")
+    args = parser.parse_args()
+
+    if not consultas.DUCKDB_DISPONIVEL:
+        print("Erro: o pacote 'duckdb' não está instalado.")
+        sys.exit(2)
+
+    dfs, _ = ler_dados_processados(args.dados)
+    if dfs is None:
+        sys.exit(2)
+    tabelas = {nome: dfs[nome] for nome in ('geral', 'feminicidio', 'populacao')}
+    motores = {backend: consultas.criar_consultas(tabelas, dfs.get('cubo_ocorrencias'), backend)
+               for backend in consultas.BACKENDS}
+    print(f"{len(tabelas['geral'])} ocorrências na base geral.\n")
+    print(f"{'Cenário':<40} " + " ".join(f"{backend + ' (s)':>12}" for backend in consultas.BACKENDS))
+
+    divergencias = 0
+    for cenario in montar_cenarios(tabelas['geral']):
+        tempos, resultados = {}, {}
+        for backend, motor in motores.items():
+            tempos[backend] = float('inf')
+            for _ in range(args.repeticoes):
+                inicio = time.perf_counter()
+                resultados[backend] = executar_cenario(motor, cenario)
+                tempos[backend] = min(tempos[backend], time.perf_counter() - inicio)
+        print(f"{cenario['nome']:<40} " + " ".join(f"{tempos[backend]:>12.3f}" for backend in consultas.BACKENDS))
+
+        for consulta, esperado in resultados['pandas'].items():
+            problema = diferenca(esperado, resultados['duckdb'][consulta])
+            if problema:
+                divergencias += 1
+                print(f"  DIVERGÊNCIA em '{consulta}': {problema}")
+
+    if divergencias:
+        print(f"\n{divergencias} resultado(s) divergente(s) entre os backends.")
+        sys.exit(1)
+    print("\nOs dois backends produziram resultados idênticos em todos os cenários.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""
+Gera um diretório de dados brutos sintéticos no formato esperado por
+preprocess_data.py, com o volume de ocorrências desejado, para medir o ETL e
+o painel em escalas maiores que a atual.
+
+Os municípios são os da malha real (municipios_sc.json), com ocorrências
+distribuídas proporcionalmente a uma população feminina sorteada. A mistura
+de tipos de crime, as idades, a sazonalidade e os campos da base de
+feminicídios seguem distribuições plausíveis, mas não reproduzem os dados
+reais. Se a base real de regiões for informada, ela é copiada; caso
+contrário, mesorregiões e associações são sorteadas entre as reais.
+
+As planilhas têm o limite de 1.048.575 linhas do Excel; acima disso (ou com
+--formato parquet), base_geral e base_feminicidio são gravadas como Parquet
+com as mesmas colunas, para uso direto pelo benchmark do pipeline.
+
+Uso:
+    python benchmarks/gerar_dados_sinteticos.py --linhas 1000000 --saida /tmp/dados_1m
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gerar_calendario import criar_base_calendario_brasil  # noqa: E402
+
+LIMITE_LINHAS_EXCEL = 1_048_575
+
+# Tipos de crime da base geral e sua participação aproximada
+FATOS = {
+    'Ameaça': 0.40,
+    'Lesão Corporal Dolosa': 0.27,
+    'Injúria': 0.15,
+    'Estupro': 0.09,
+    'Lesão corporal grave ou gravíssima - Dolosa': 0.085,
+    'Estupro coletivo': 0.005,
+}
+FATOS_SEXUAIS = {'Estupro', 'Estupro coletivo'}
+PROPORCAO_IDADE_NAO_INFORMADA = 0.03
+
+# Mesorregiões de SC e as associações de municípios de cada uma
+ASSOCIACOES_POR_MESORREGIAO = {
+    'Oeste Catarinense': ['AMEOSC', 'AMERIOS', 'AMNOROESTE', 'AMOSC', 'AMAUC', 'AMMOC', 'AMARP', 'AMAI'],
+    'Norte Catarinense': ['AMUNESC', 'AMVALI', 'AMPLANORTE', 'AMURC'],
+    'Serrana': ['AMURES', 'AMPLASC'],
+    'Vale do Itajaí': ['AMMVI', 'AMAVI', 'AMFRI'],
+    'Grande Florianópolis': ['GRANFPOLIS'],
+    'Sul Catarinense': ['AMUREL', 'AMREC', 'AMESC'],
+}
+
+# Campos categóricos da base de feminicídios: valores e probabilidades
+CAMPOS_FEMINICIDIO = {
+    'LOCALIDADE': {'Residência': 0.66, 'Via pública': 0.18, 'Zona rural': 0.06,
+                   'Estabelecimento comercial': 0.04, 'Outros': 0.06},
+    'PASSAGEM POR VIOLÊNCIA DOMÉSTICA': {'SIM': 0.45, 'NÃO': 0.45, 'Não informado': 0.10},
+    'RELAÇÃO COM O AUTOR': {'Companheiro': 0.35, 'Ex-companheiro': 0.20, 'Marido': 0.15, 'Namorado': 0.08,
+                            'Ex-namorado': 0.07, 'Familiar': 0.08, 'Outro': 0.07},
+    'BO DE VD CONTRA O AUTOR': {'SIM': 0.30, 'NÃO': 0.60, 'Não informado': 0.10},
+    'ETNIA/RAÇA AUTOR': {'Branca': 0.68, 'Parda': 0.20, 'Preta': 0.07, 'Não informado': 0.05},
+    'PASSAGEM POLICIAL': {'SIM': 0.55, 'NÃO': 0.40, 'Não informado': 0.05},
+    'PRISÃO': {'SIM': 0.70, 'NÃO': 0.12, 'Suicídio': 0.15, 'Não informado': 0.03},
+    'ETNIA/RAÇA VITIMA': {'Branca': 0.70, 'Parda': 0.19, 'Preta': 0.07, 'Não informado': 0.04},
+    'MEIO': {'Arma branca': 0.45, 'Arma de fogo': 0.28, 'Espancamento': 0.10, 'Asfixia': 0.11, 'Outro': 0.06},
+}
+
+
+def _sortear(rng, probabilidades, tamanho):
+    """Sorteia 'tamanho' valores de um dicionário {valor: probabilidade}."""
+    valores = list(probabilidades)
+    p = np.array(list(probabilidades.values()), dtype='float64')
+    return np.array(valores, dtype=object)[rng.choice(len(valores), size=tamanho, p=p / p.sum())]
+
+
+def _idades(rng, media, desvio, minimo, maximo, tamanho):
+    """Idades inteiras de uma normal truncada em [minimo, maximo]."""
+    return np.clip(np.rint(rng.normal(media, desvio, tamanho)), minimo, maximo).astype('int64')
+
+
+def _pesos_dias(dias):
+    """Peso de cada dia: mais ocorrências nos fins de semana e no verão."""
+    fim_de_semana = np.isin(dias.dayofweek, [5, 6])
+    sazonalidade = 1 + 0.12 * np.cos(2 * np.pi * (dias.dayofyear.to_numpy() - 15) / 365.25)
+    pesos = sazonalidade * np.where(fim_de_semana, 1.25, 1.0)
+    return pesos / pesos.sum()
+
+
+def ler_municipios(caminho_geojson):
+    """Nomes dos municípios (propriedade NM_MUN) da malha municipal."""
+    with open(caminho_geojson, 'r', encoding='utf-8') as f:
+        geojson = json.load(f)
+    return [feature['properties']['NM_MUN'] for feature in geojson['features']
+            if feature['properties'].get('NM_MUN')]
+
+
+def gerar_regioes(rng, municipios):
+    """Sorteia mesorregião e associação de cada município."""
+    mesoregioes = list(ASSOCIACOES_POR_MESORREGIAO)
+    sorteadas = rng.choice(len(mesoregioes), size=len(municipios))
+    linhas = []
+    for municipio, i in zip(municipios, sorteadas):
+        mesoregiao = mesoregioes[i]
+        associacao = rng.choice(ASSOCIACOES_POR_MESORREGIAO[mesoregiao])
+        linhas.append({'Municipio': municipio, 'Mesoregiao': mesoregiao, 'Associacao': associacao})
+    return pd.DataFrame(linhas)
+
+
+def gerar_populacao(rng, municipios):
+    """População feminina por município: poucos municípios grandes e muitos pequenos."""
+    populacao = np.clip(rng.lognormal(mean=8.7, sigma=1.1, size=len(municipios)), 800, 320_000)
+    return pd.DataFrame({'Municipio': municipios, 'Populacao Feminina': populacao.astype('int64')})
+
+
+def gerar_base_geral(rng, linhas, municipios, pesos_municipios, dias):
+    """Ocorrências da base geral, com as colunas da planilha original."""
+    datas = dias[rng.choice(len(dias), size=linhas, p=_pesos_dias(dias))]
+    fatos = _sortear(rng, FATOS, linhas)
+    sexual = np.isin(fatos, list(FATOS_SEXUAIS))
+    idades = np.where(sexual, _idades(rng, 17, 9, 0, 90, linhas), _idades(rng, 35, 13, 12, 95, linhas))
+    idades = idades.astype(object)
+    idades[rng.random(linhas) < PROPORCAO_IDADE_NAO_INFORMADA] = 'NI'
+    nomes = np.array([m.upper() for m in municipios], dtype=object)
+    return pd.DataFrame({
+        'Data do Fato': datas,
+        'Município': nomes[rng.choice(len(municipios), size=linhas, p=pesos_municipios)],
+        'Fato Comunicado': fatos,
+        'Idade': idades,
+    })
+
+
+def gerar_base_feminicidio(rng, linhas, municipios, pesos_municipios, dias):
+    """Feminicídios, com as colunas da planilha original."""
+    horas = (rng.normal(21, 5, linhas) % 24).astype('int64')
+    minutos = rng.integers(0, 60, linhas)
+    df = pd.DataFrame({
+        'FATO': 'Feminicídio',
+        'DATA': dias[rng.choice(len(dias), size=linhas, p=_pesos_dias(dias))],
+        'HORA': [f"{h:02d}:{m:02d}:00" for h, m in zip(horas, minutos)],
+        'MUNICÍPIO': np.array(municipios, dtype=object)[rng.choice(len(municipios), size=linhas, p=pesos_municipios)],
+        'IDADE AUTOR': _idades(rng, 39, 12, 16, 85, linhas),
+        'IDADE VITIMA': _idades(rng, 37, 13, 12, 90, linhas),
+    })
+    for coluna, probabilidades in CAMPOS_FEMINICIDIO.items():
+        df[coluna] = _sortear(rng, probabilidades, linhas)
+    return df
+
+
+def gravar_planilha(df, caminho):
+    """Grava a planilha em modo write-only do openpyxl (bem mais rápido que to_excel em bases grandes)."""
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Dados')
+    ws.append(list(df.columns))
+    # Timestamps do pandas são datetime, aceitos diretamente pelo openpyxl
+    colunas = [df[col].tolist() for col in df.columns]
+    for linha in zip(*colunas):
+        ws.append(linha)
+    wb.save(caminho)
+
+
+def gravar_base(df, diretorio, nome, formato):
+    """Grava base_geral/base_feminicidio como planilha ou Parquet. Retorna o caminho."""
+    if formato == 'parquet':
+        caminho = os.path.join(diretorio, f"{nome}.parquet")
+        # Colunas mistas (idades e 'NI') viram texto, como na leitura da planilha
+        df = df.copy()
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+        df.to_parquet(caminho, index=False)
+    else:
+        caminho = os.path.join(diretorio, f"{nome}.xlsx")
+        gravar_planilha(df, caminho)
+    return caminho
+
+
+def gerar_bases(diretorio, linhas, geojson, regioes=None, formato=None, seed=42,
+                inicio='2018-01-01', fim='2024-12-31'):
+    """
+    Gera em 'diretorio' todas as fontes do ETL com 'linhas' ocorrências na
+    base geral. Com formato=None, usa planilhas sempre que couberem no Excel.
+    Retorna o formato usado para base_geral e base_feminicidio.
+    """
+    if formato is None:
+        formato = 'xlsx' if linhas <= LIMITE_LINHAS_EXCEL else 'parquet'
+    if formato == 'xlsx' and linhas > LIMITE_LINHAS_EXCEL:
+        raise ValueError(f"O Excel aceita no máximo {LIMITE_LINHAS_EXCEL} linhas; use o formato parquet.")
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(diretorio, exist_ok=True)
+    municipios = ler_municipios(geojson)
+    shutil.copyfile(geojson, os.path.join(diretorio, 'municipios_sc.json'))
+
+    if regioes is not None:
+        shutil.copyfile(regioes, os.path.join(diretorio, 'base_regioes_associacoes.xlsx'))
+    else:
+        gerar_regioes(rng, municipios).to_excel(os.path.join(diretorio, 'base_regioes_associacoes.xlsx'), index=False)
+
+    df_populacao = gerar_populacao(rng, municipios)
+    df_populacao.to_excel(os.path.join(diretorio, 'base_populacao.xlsx'), index=False)
+    pesos = df_populacao['Populacao Feminina'].to_numpy(dtype='float64')
+    pesos /= pesos.sum()
+
+    dias = pd.date_range(inicio, fim, freq='D')
+    calendario = criar_base_calendario_brasil(dias[0].year, dias[-1].year)
+    calendario.to_excel(os.path.join(diretorio, 'base_calendario_feriados.xlsx'), index=False)
+
+    gravar_base(gerar_base_geral(rng, linhas, municipios, pesos, dias), diretorio, 'base_geral', formato)
+    # Cerca de um feminicídio para cada 250 ocorrências da base geral
+    linhas_feminicidio = max(linhas // 250, 20)
+    gravar_base(gerar_base_feminicidio(rng, linhas_feminicidio, municipios, pesos, dias),
+                diretorio, 'base_feminicidio', formato)
+    return formato
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, default=100_000, help="Número de ocorrências da base geral.")
+    parser.add_argument('--saida', required=True, help="Diretório onde os dados brutos serão gerados.")
+    parser.add_argument('--geojson', default='data/municipios_sc.json', help="Malha municipal de SC.")
+    parser.add_argument('--regioes', help="Base real de regiões e associações (opcional).")
+    parser.add_argument('--formato', choices=['xlsx', 'parquet'],
+                        help="Formato de base_geral e base_feminicidio (padrão: xlsx se couber no Excel).")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    formato = gerar_bases(args.saida, args.linhas, args.geojson, args.regioes, args.formato, args.seed)
+    duracao = time.perf_counter() - inicio
+    print(f"{args.linhas} ocorrências geradas em '{args.saida}' ({formato}) em {duracao:.1f} s.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Compara a memória residente (RSS) do processo do painel com 1, 10 e 50
+sessões simuladas, antes e depois do cache compartilhado de dados:
+
+- antes: cada sessão chama carregar_dados_processados (st.cache_data), que
+  devolve uma cópia desserializada de todos os DataFrames a cada execução
+  do script, e guarda essa cópia no session_state;
+- depois: como no painel, cada sessão pede a obter_dataset os conjuntos e
+  colunas da aba aberta (dados_da_aba), e todas recebem DataFrames sobre
+  as mesmas colunas somente leitura, lidas uma vez por processo
+  (st.cache_resource).
+
+Cada combinação roda num processo separado, para que uma medição não
+interfira na outra. Só os dados carregados entram na conta; os recortes
+filtrados de cada sessão não são simulados.
+
+Uso:
+    python benchmarks/relatorio_memoria_sessoes.py --dados data/processed [--sessoes 1 10 50]
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+
+import psutil
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+CHAVES_SESSAO = ['geral', 'feminicidio', 'populacao', 'regioes', 'calendario', 'cubo_ocorrencias']
+ABA_INICIAL = 'Análise Geral'
+EXECUCOES_POR_SESSAO = 2
+
+
+def rss_mib():
+    return psutil.Process().memory_info().rss / 1024 ** 2
+
+
+def simular(modo, sessoes, diretorio):
+    """Simula 'sessoes' sessões do painel no processo atual e retorna o RSS em MiB."""
+    import data_loader
+
+    rss_inicial = rss_mib()
+
+    estados = []
+    for _ in range(sessoes):
+        estado = {}
+        # Cada interação reexecuta o script e substitui os objetos da sessão
+        for _ in range(EXECUCOES_POR_SESSAO):
+            if modo == 'antes':
+                dfs, geojson_data = data_loader.carregar_dados_processados(diretorio)
+                for chave in CHAVES_SESSAO:
+                    estado[chave] = dfs.get(chave)
+                estado['geojson_sc'] = geojson_data
+            else:
+                for nome, colunas in data_loader.dados_da_aba(ABA_INICIAL, diretorio).items():
+                    if nome == 'geojson_sc':
+                        estado[nome] = data_loader.obter_geojson(diretorio)
+                    else:
+                        estado[nome] = data_loader.obter_dataset(nome, colunas, diretorio)
+        estados.append(estado)
+
+    gc.collect()
+    return {'rss_inicial': rss_inicial, 'rss_final': rss_mib()}
+
+
+def medir_em_subprocesso(modo, sessoes, diretorio):
+    """Executa simular() num processo novo e devolve o resultado."""
+    comando = [sys.executable, os.path.abspath(__file__), '--dados', diretorio,
+               '--filho', modo, str(sessoes)]
+    saida = subprocess.run(comando, check=True, capture_output=True, text=True).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dados', default='data/processed', help="Diretório dos dados processados.")
+    parser.add_argument('--sessoes', type=int, nargs='+', default=[1, 10, 50], help="Números de sessões simuladas.")
+    parser.add_argument('--filho', nargs=2, metavar=('MODO', 'SESSOES'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        modo, sessoes = args.filho
+        print(json.dumps(simular(modo, int(sessoes), args.dados)))
+        return
+
+    print(f"{'Sessões':>8} {'Antes (MiB)':>14} {'Depois (MiB)':>14} {'Dados antes':>13} {'Dados depois':>13}")
+    for sessoes in args.sessoes:
+        antes = medir_em_subprocesso('antes', sessoes, args.dados)
+        depois = medir_em_subprocesso('depois', sessoes, args.dados)
+        print(f"{sessoes:>8} {antes['rss_final']:>14.1f} {depois['rss_final']:>14.1f} "
+              f"{antes['rss_final'] - antes['rss_inicial']:>13.1f} "
+              f"{depois['rss_final'] - depois['rss_inicial']:>13.1f}")
+    print("\n'Dados' é o aumento do RSS em relação ao processo logo após importar o painel.")
+
+
+if __name__ == '__main__':
+    main()
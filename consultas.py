@@ -0,0 +1,319 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import filtros
+from indice_filtros import AvaliadorIncremental, IndiceFiltros
+from memoria_sessao import SelecaoLinhas
+from cubo_ocorrencias import (FAIXA_NAO_INFORMADA, FAIXAS_ETARIAS, FILTROS_LISTA, adicionar_dimensoes,
+                              classificar_faixa_etaria, contar_por, filtros_compativeis, somar_medidas)
+
+# O DuckDB é uma dependência opcional: sem ele, as consultas usam o pandas.
+try:
+    import duckdb
+    DUCKDB_DISPONIVEL = True
+except ImportError:
+    DUCKDB_DISPONIVEL = False
+
+# --- MOTOR DE CONSULTAS DO PAINEL ---
+# Filtros da barra lateral, métricas populacionais e agregações das abas,
+# respondidos por um de dois backends com os mesmos resultados:
+# - 'pandas': opera sobre os DataFrames em memória (padrão);
+# - 'duckdb': registra os mesmos DataFrames numa conexão DuckDB em memória
+#   (sem copiá-los) e responde as consultas em SQL; só os resultados pequenos
+#   (listas de opções, contagens, posições das linhas filtradas) voltam ao pandas.
+# O backend é escolhido pela variável de ambiente OVM_BACKEND_CONSULTAS.
+# benchmarks/comparar_backends.py confere que os dois dão o mesmo resultado.
+VARIAVEL_BACKEND = 'OVM_BACKEND_CONSULTAS'
+BACKENDS = ('pandas', 'duckdb')
+
+# Colunas das ocorrências usadas pelas consultas
+COLUNAS_CONSULTA = ['data_fato', 'ano', 'idade_vitima', 'municipio', 'municipio_normalizado', 'mesoregiao',
+                    'associacao', 'fato_comunicado']
+
+
+def backend_configurado():
+    """Backend escolhido em OVM_BACKEND_CONSULTAS; 'pandas' se a variável não existir ou o DuckDB faltar."""
+    backend = os.environ.get(VARIAVEL_BACKEND, 'pandas').strip().lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de consultas desconhecido: '{backend}'. Use um de {BACKENDS}.")
+    if backend == 'duckdb' and not DUCKDB_DISPONIVEL:
+        print("Aviso: o pacote 'duckdb' não está instalado; usando o backend 'pandas'.")
+        return 'pandas'
+    return backend
+
+
+def criar_consultas(tabelas, cubo=None, backend=None, indices=None, tabelas_sql=None):
+    """
+    Cria o motor de consultas sobre 'tabelas' ({'geral': df, 'feminicidio':
+    df, 'populacao': df}; os conjuntos de ocorrências ausentes não podem ser
+    consultados). Com backend=None, usa backend_configurado(). 'indices'
+    ({conjunto: IndiceFiltros}) permite reaproveitar índices já construídos
+    para os mesmos DataFrames; os que faltarem são construídos na primeira consulta.
+    'tabelas_sql' ({conjunto: DataFrame de tabela_sql}) faz o mesmo com as
+    tabelas registradas no DuckDB; com elas, 'tabelas' dispensa esses conjuntos.
+    """
+    backend = backend or backend_configurado()
+    if backend == 'duckdb':
+        return ConsultasDuckDB(tabelas, cubo, tabelas_sql)
+    return ConsultasPandas(tabelas, cubo, indices)
+
+
+def filtros_da_barra_lateral(data_inicial, data_final, municipios, mesoregioes, associacoes, idade,
+                             municipios_populacao, fatos=None):
+    """
+    Converte os valores dos widgets da barra lateral (os argumentos de
+    filtros.filtrar_ocorrencias) para o formato de cubo_ocorrencias.contar_por.
+    """
+    return {
+        'data_inicial': data_inicial,
+        'data_final': data_final,
+        'fatos': None if fatos is None else list(fatos),
+        'municipios': list(municipios),
+        'mesoregioes': list(mesoregioes),
+        'associacoes': list(associacoes),
+        'idade': (idade[0], None if idade[1] == 100 else idade[1]),
+        'municipios_normalizados': list(municipios_populacao),
+    }
+
+
+def tabela_sql(df):
+    """
+    Tabela de ocorrências registrada no DuckDB: as colunas de 'df' que estão
+    em COLUNAS_CONSULTA, sem copiá-las, e '_linha', a posição de cada linha.
+    """
+    tabela = pd.DataFrame({col: df[col] for col in COLUNAS_CONSULTA if col in df.columns}, copy=False)
+    tabela['_linha'] = np.arange(len(df), dtype='int64')
+    return tabela
+
+
+class ConsultasPandas:
+    """
+    Consultas do painel sobre os DataFrames em memória, respondidas pelo
+    índice dos filtros (indice_filtros.py) de cada conjunto de ocorrências.
+    Os índices podem ser compartilhados; os avaliadores incrementais das
+    seleções são deste motor, que é de uma sessão.
+    """
+
+    backend = 'pandas'
+
+    def __init__(self, tabelas, cubo=None, indices=None):
+        self.tabelas = tabelas
+        self.cubo = cubo
+        self.indices = dict(indices or {})
+        self.avaliadores = {}
+
+    def indice(self, nome):
+        """Índice dos filtros do conjunto 'nome', construído na primeira consulta se não foi informado."""
+        if nome not in self.indices:
+            self.indices[nome] = IndiceFiltros(self.tabelas[nome])
+        return self.indices[nome]
+
+    def avaliador(self, nome):
+        """AvaliadorIncremental das seleções do conjunto 'nome' nesta sessão."""
+        if nome not in self.avaliadores:
+            self.avaliadores[nome] = AvaliadorIncremental(self.indice(nome))
+        return self.avaliadores[nome]
+
+    def _linhas(self, nome, filtros_aplicados):
+        """DataFrame 'nome' restrito às linhas que atendem aos filtros."""
+        df = self.tabelas[nome]
+        linhas = self.indice(nome).selecionar(filtros_aplicados)
+        # A cópia rasa de todas as linhas não duplica os dados, que são somente leitura
+        return df.copy(deep=False) if linhas is None else df.take(linhas)
+
+    def opcoes_disponiveis(self, data_inicial, data_final):
+        """Opções dos filtros da barra lateral para as ocorrências do período (ver filtros.opcoes_disponiveis)."""
+        indice = self.indice('geral')
+
+        # Um valor está disponível se tem ocorrências no período, o que as
+        # contagens acumuladas por dia respondem sem percorrer as linhas
+        def presentes(coluna):
+            return indice.valores_periodo(coluna, data_inicial, data_final)
+
+        return {
+            'municipios': presentes('municipio'),
+            'mesoregioes': [m for m in presentes('mesoregiao') if m != 'Não informado'],
+            'associacoes': [a for a in presentes('associacao') if a != 'Não informado'],
+            'fatos': presentes('fato_comunicado'),
+        }
+
+    def metricas_populacionais(self, data_inicial, data_final):
+        """Métricas populacionais dos municípios no período (ver filtros.calcular_metricas_populacionais)."""
+        indice = self.indice('geral')
+        return filtros.metricas_de_contagens(
+            self.tabelas['populacao'], indice.contagens_periodo('municipio_normalizado', data_inicial, data_final),
+            len(indice.anos_periodo(data_inicial, data_final)))
+
+    def filtrar_ocorrencias(self, nome, data_inicial, data_final, municipios, mesoregioes, associacoes, idade,
+                            municipios_populacao, fatos=None):
+        """Linhas do conjunto 'nome' que atendem aos filtros finais (ver filtros.filtrar_ocorrencias)."""
+        return self.selecionar_ocorrencias(nome, data_inicial, data_final, municipios, mesoregioes, associacoes,
+                                           idade, municipios_populacao, fatos).carregar()
+
+    def selecionar_ocorrencias(self, nome, data_inicial, data_final, municipios, mesoregioes, associacoes, idade,
+                               municipios_populacao, fatos=None):
+        """Como filtrar_ocorrencias, mas devolve as posições das linhas (memoria_sessao.SelecaoLinhas)."""
+        filtros_aplicados = filtros_da_barra_lateral(data_inicial, data_final, municipios, mesoregioes,
+                                                     associacoes, idade, municipios_populacao, fatos)
+        return SelecaoLinhas(self.tabelas[nome], self.indice(nome).selecionar(filtros_aplicados, self.avaliador(nome)))
+
+    def contar_por(self, por, filtros_aplicados, nome='geral'):
+        """
+        Contagens por 'por' (lista de DIMENSOES) das ocorrências de 'nome' que
+        atendem a 'filtros_aplicados', no formato de cubo_ocorrencias.contar_por.
+        Filtros compatíveis com o cubo pré-calculado da base geral são
+        respondidos por ele; os demais agregam as linhas.
+        """
+        if nome == 'geral' and self.cubo is not None and filtros_compativeis(filtros_aplicados, self.cubo):
+            return contar_por(por, filtros_aplicados, self.cubo)
+        return somar_medidas(self._agregar_linhas(por, filtros_aplicados, nome), list(por))
+
+    def _agregar_linhas(self, por, filtros_aplicados, nome):
+        """Cubo parcial: as medidas das linhas filtradas, ainda sem agrupar."""
+        return adicionar_dimensoes(self._linhas(nome, filtros_aplicados))
+
+
+class ConsultasDuckDB(ConsultasPandas):
+    """
+    Consultas do painel em SQL, numa conexão DuckDB em memória. As
+    ocorrências são registradas como views (o DuckDB as lê sem copiar) de
+    tabelas montadas por tabela_sql, com a coluna '_linha', para que os
+    filtros devolvam só as posições selecionadas. As tabelas de
+    'tabelas_sql' podem ser compartilhadas entre motores; as que faltarem
+    são montadas a partir de 'tabelas'. Um conjunto que só está em
+    'tabelas_sql' é também a base das seleções de linhas.
+    """
+
+    backend = 'duckdb'
+
+    def __init__(self, tabelas, cubo=None, tabelas_sql=None):
+        tabelas_sql = dict(tabelas_sql or {})
+        for nome in ('geral', 'feminicidio'):
+            if nome not in tabelas_sql and tabelas.get(nome) is not None:
+                tabelas_sql[nome] = tabela_sql(tabelas[nome])
+        super().__init__({**tabelas_sql, **tabelas}, cubo)
+        self.conexao = duckdb.connect()
+        for nome, df in tabelas_sql.items():
+            self.conexao.register(nome, df)
+
+    def _executar(self, sql, parametros=()):
+        return self.conexao.execute(sql, list(parametros))
+
+    @staticmethod
+    def _condicao_periodo(data_inicial, data_final):
+        """Condição SQL do período (datas inclusivas) e seus parâmetros."""
+        inicio = pd.Timestamp(data_inicial).to_pydatetime()
+        fim = (pd.Timestamp(data_final).normalize() + pd.Timedelta(days=1)).to_pydatetime()
+        return "data_fato >= ? AND data_fato < ?", [inicio, fim]
+
+    def opcoes_disponiveis(self, data_inicial, data_final):
+        periodo, parametros = self._condicao_periodo(data_inicial, data_final)
+
+        def distintos(coluna):
+            linhas = self._executar(f"SELECT DISTINCT {coluna} FROM geral WHERE {periodo} AND {coluna} IS NOT NULL",
+                                    parametros).fetchall()
+            return sorted(str(valor) for valor, in linhas)
+
+        return {
+            'municipios': distintos('municipio'),
+            'mesoregioes': [m for m in distintos('mesoregiao') if m != 'Não informado'],
+            'associacoes': [a for a in distintos('associacao') if a != 'Não informado'],
+            'fatos': distintos('fato_comunicado'),
+        }
+
+    def metricas_populacionais(self, data_inicial, data_final):
+        periodo, parametros = self._condicao_periodo(data_inicial, data_final)
+        contagens = self._executar(
+            f"SELECT municipio_normalizado, COUNT(*) FROM geral WHERE {periodo} "
+            f"AND municipio_normalizado IS NOT NULL GROUP BY 1", parametros).fetchall()
+        num_anos, = self._executar(f"SELECT COUNT(DISTINCT ano) FROM geral WHERE {periodo}", parametros).fetchone()
+
+        # Mesmo formato de value_counts(): com a coluna categórica, todas as
+        # categorias aparecem, inclusive as sem ocorrências no período
+        serie = self.tabelas['geral']['municipio_normalizado']
+        total_fatos = pd.Series(dict(((str(m), n) for m, n in contagens)), dtype='int64')
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            total_fatos = total_fatos.reindex(serie.cat.categories, fill_value=0)
+            total_fatos.index = pd.CategoricalIndex(total_fatos.index, dtype=serie.dtype)
+        return filtros.metricas_de_contagens(self.tabelas['populacao'], total_fatos, num_anos)
+
+    def selecionar_ocorrencias(self, nome, data_inicial, data_final, municipios, mesoregioes, associacoes, idade,
+                               municipios_populacao, fatos=None):
+        periodo, parametros = self._condicao_periodo(data_inicial, data_final)
+        condicoes = [periodo]
+        listas = {'municipio': municipios, 'mesoregiao': mesoregioes, 'associacao': associacoes,
+                  'municipio_normalizado': municipios_populacao}
+        if fatos is not None:
+            listas['fato_comunicado'] = fatos
+        for coluna, valores in listas.items():
+            condicoes.append(f"list_contains(?::VARCHAR[], {coluna}::VARCHAR)")
+            parametros.append([str(v) for v in valores])
+        # Idade máxima 100 no slider inclui todas as idades acima
+        condicoes.append("idade_vitima >= ?")
+        parametros.append(idade[0])
+        if idade[1] != 100:
+            condicoes.append("idade_vitima <= ?")
+            parametros.append(idade[1])
+
+        linhas = self._executar(f"SELECT _linha FROM {nome} WHERE {' AND '.join(condicoes)}",
+                                parametros).fetchnumpy()['_linha']
+        return SelecaoLinhas(self.tabelas[nome], np.sort(linhas))
+
+    def _agregar_linhas(self, por, filtros_aplicados, nome):
+        """Cubo parcial agrupado por 'por' no DuckDB, com os tipos do cubo do pandas."""
+        condicoes, parametros = ["TRUE"], []
+        if filtros_aplicados.get('data_inicial') is not None:
+            condicoes.append("data_fato >= ?")
+            parametros.append(pd.Timestamp(filtros_aplicados['data_inicial']).to_pydatetime())
+        if filtros_aplicados.get('data_final') is not None:
+            condicoes.append("data_fato < ?")
+            parametros.append((pd.Timestamp(filtros_aplicados['data_final']).normalize()
+                               + pd.Timedelta(days=1)).to_pydatetime())
+        for chave, coluna in FILTROS_LISTA.items():
+            if filtros_aplicados.get(chave) is not None:
+                condicoes.append(f"list_contains(?::VARCHAR[], {coluna}::VARCHAR)")
+                parametros.append([str(v) for v in filtros_aplicados[chave]])
+        if filtros_aplicados.get('idade') is not None:
+            idade_min, idade_max = filtros_aplicados['idade']
+            condicoes.append("idade_vitima >= ?")
+            parametros.append(idade_min)
+            if idade_max is not None:
+                condicoes.append("idade_vitima <= ?")
+                parametros.append(idade_max)
+
+        expressoes = [f"{_EXPRESSOES_DIMENSOES.get(col, col)} AS {col}" for col in por]
+        agrupamento = f"GROUP BY {', '.join(str(i + 1) for i in range(len(por)))}" if por else ""
+        sql = (f"SELECT {', '.join(expressoes + _EXPRESSOES_MEDIDAS)} FROM {nome} "
+               f"WHERE {' AND '.join(condicoes)} {agrupamento}")
+        parcial = self._executar(sql, parametros).df()
+
+        # Alinha os tipos ao cubo do pandas, para que o agrupamento final seja idêntico
+        df = self.tabelas[nome]
+        for col in por:
+            parcial[col] = parcial[col].astype(_TIPOS_DIMENSOES.get(col, df[col].dtype if col in df else 'object'))
+        return parcial.astype({'quantidade': 'int32', 'soma_idade': 'float64', 'qtd_idade': 'int32'})
+
+
+# Dimensões derivadas do cubo em SQL (ver cubo_ocorrencias.adicionar_dimensoes).
+# As faixas etárias seguem os limites de pd.cut: (fim anterior + 0,5, fim + 0,5].
+_FAIXAS_SQL = " ".join(
+    f"WHEN idade_vitima <= {fim + 0.5} THEN '{rotulo}'" for _, fim, rotulo in FAIXAS_ETARIAS[:-1]
+)
+_EXPRESSOES_DIMENSOES = {
+    'mes_num': "month(data_fato)",
+    'dia_semana_num': "isodow(data_fato) - 1",
+    'faixa_etaria': (f"CASE WHEN idade_vitima IS NULL OR idade_vitima <= -0.5 THEN '{FAIXA_NAO_INFORMADA}' "
+                     f"{_FAIXAS_SQL} ELSE '{FAIXAS_ETARIAS[-1][2]}' END"),
+}
+_EXPRESSOES_MEDIDAS = [
+    "COUNT(*) AS quantidade",
+    "COALESCE(SUM(idade_vitima), 0)::DOUBLE AS soma_idade",
+    "COUNT(idade_vitima) AS qtd_idade",
+]
+_TIPOS_DIMENSOES = {
+    'mes_num': 'Int8',
+    'dia_semana_num': 'Int8',
+    'faixa_etaria': classificar_faixa_etaria(pd.Series([], dtype='float64')).dtype,
+}
@@ -0,0 +1,197 @@
+import numpy as np
+import pandas as pd
+
+# --- DEFINIÇÃO DO CUBO ---
+# Contagens de ocorrências por combinação de dimensões, materializadas no
+# pré-processamento. 'mes_num' e 'dia_semana_num' seguem a convenção da base
+# de calendário (mês 1-12, segunda-feira = 0).
+DIMENSOES = [
+    'municipio', 'municipio_normalizado', 'mesoregiao', 'associacao', 'fato_comunicado',
+    'ano', 'mes_num', 'dia_semana_num', 'faixa_etaria'
+]
+# Somas que permitem derivar médias (ex.: idade média = soma_idade / qtd_idade)
+MEDIDAS = ['quantidade', 'soma_idade', 'qtd_idade']
+
+# Faixas etárias do cubo: (idade inicial, idade final, rótulo). A última faixa
+# não tem limite superior.
+FAIXAS_ETARIAS = [
+    (0, 17, '0-17 anos'),
+    (18, 29, '18-29 anos'),
+    (30, 40, '30-40 anos'),
+    (41, 50, '41-50 anos'),
+    (51, 60, '51-60 anos'),
+    (61, None, '60+ anos'),
+]
+FAIXA_NAO_INFORMADA = 'Não informado'
+
+# Filtros de lista: chave em 'filtros' -> coluna filtrada
+FILTROS_LISTA = {
+    'fatos': 'fato_comunicado',
+    'municipios': 'municipio',
+    'mesoregioes': 'mesoregiao',
+    'associacoes': 'associacao',
+    'municipios_normalizados': 'municipio_normalizado',
+}
+
+
+def classificar_faixa_etaria(idades):
+    """Classifica idades nas FAIXAS_ETARIAS; ausentes ou negativas ficam como 'Não informado'."""
+    idades = pd.to_numeric(idades, errors='coerce').astype('float64')
+    limites = [-0.5] + [fim + 0.5 for _, fim, _ in FAIXAS_ETARIAS[:-1]] + [np.inf]
+    rotulos = [rotulo for _, _, rotulo in FAIXAS_ETARIAS]
+    faixas = pd.cut(idades, bins=limites, labels=rotulos)
+    faixas = faixas.cat.add_categories([FAIXA_NAO_INFORMADA])
+    return faixas.fillna(FAIXA_NAO_INFORMADA)
+
+
+def adicionar_dimensoes(df):
+    """Acrescenta às ocorrências as dimensões derivadas e as medidas do cubo."""
+    datas = df['data_fato']
+    idades = pd.to_numeric(df['idade_vitima'], errors='coerce').astype('float64')
+    return df.assign(
+        mes_num=datas.dt.month.astype('Int8'),
+        dia_semana_num=datas.dt.dayofweek.astype('Int8'),
+        faixa_etaria=classificar_faixa_etaria(idades),
+        quantidade=np.int32(1),
+        soma_idade=idades.fillna(0),
+        qtd_idade=idades.notna().astype('int32'),
+    )
+
+
+def somar_medidas(df, por):
+    """Soma as MEDIDAS agrupando por 'por' e calcula a idade média."""
+    if por:
+        resultado = df.groupby(por, observed=True, dropna=False)[MEDIDAS].sum().reset_index()
+    else:
+        resultado = df[MEDIDAS].sum().to_frame().T
+    resultado['idade_media'] = resultado['soma_idade'] / resultado['qtd_idade'].replace(0, np.nan)
+    return resultado
+
+
+def construir_cubo(df_geral):
+    """
+    Materializa o cubo de contagens a partir da base geral processada.
+    O período coberto pelos dados fica em cubo.attrs.
+    """
+    colunas = ['data_fato', 'idade_vitima', 'municipio', 'municipio_normalizado', 'mesoregiao',
+               'associacao', 'fato_comunicado', 'ano']
+    cubo = somar_medidas(adicionar_dimensoes(df_geral[colunas]), DIMENSOES)
+    cubo = cubo.drop(columns='idade_media')
+    datas = df_geral['data_fato'].dropna()
+    if not datas.empty:
+        cubo.attrs = {
+            'data_minima': datas.min().date().isoformat(),
+            'data_maxima': datas.max().date().isoformat(),
+        }
+    return cubo
+
+
+def somar_cubos(cubo, delta):
+    """
+    Soma ao cubo as contagens de um cubo parcial (ex.: de um extrato recém
+    anexado), ampliando o período coberto em attrs.
+    """
+    juntos = pd.concat([cubo[DIMENSOES + MEDIDAS], delta[DIMENSOES + MEDIDAS]], ignore_index=True)
+    resultado = juntos.groupby(DIMENSOES, observed=True, dropna=False)[MEDIDAS].sum().reset_index()
+    datas_minimas = [c.attrs['data_minima'] for c in (cubo, delta) if 'data_minima' in c.attrs]
+    datas_maximas = [c.attrs['data_maxima'] for c in (cubo, delta) if 'data_maxima' in c.attrs]
+    if datas_minimas:
+        resultado.attrs = {'data_minima': min(datas_minimas), 'data_maxima': max(datas_maximas)}
+    return resultado
+
+
+# --- CONSULTAS ---
+
+def filtros_compativeis(filtros, cubo):
+    """
+    Indica se o filtro pode ser respondido pelo cubo. O período precisa
+    começar e terminar em limites de mês (ou cobrir as pontas dos dados) e a
+    faixa de idade precisa coincidir com limites de FAIXAS_ETARIAS.
+    """
+    data_minima = pd.Timestamp(cubo.attrs['data_minima']) if 'data_minima' in cubo.attrs else None
+    data_maxima = pd.Timestamp(cubo.attrs['data_maxima']) if 'data_maxima' in cubo.attrs else None
+
+    data_inicial = filtros.get('data_inicial')
+    if data_inicial is not None:
+        inicio = pd.Timestamp(data_inicial)
+        if inicio.day != 1 and (data_minima is None or inicio > data_minima):
+            return False
+    data_final = filtros.get('data_final')
+    if data_final is not None:
+        fim = pd.Timestamp(data_final)
+        if not fim.is_month_end and (data_maxima is None or fim < data_maxima):
+            return False
+
+    idade = filtros.get('idade')
+    if idade is not None:
+        idade_min, idade_max = idade
+        if idade_min not in {inicio for inicio, _, _ in FAIXAS_ETARIAS}:
+            return False
+        if idade_max is not None and idade_max not in {fim for _, fim, _ in FAIXAS_ETARIAS if fim is not None}:
+            return False
+    return True
+
+
+def _mascara_cubo(cubo, filtros):
+    """Máscara das células do cubo que atendem a um filtro compatível."""
+    mascara = np.ones(len(cubo), dtype=bool)
+    mes_absoluto = cubo['ano'].astype('float64') * 12 + cubo['mes_num'].astype('float64') - 1
+    if filtros.get('data_inicial') is not None:
+        inicio = pd.Timestamp(filtros['data_inicial'])
+        mascara &= (mes_absoluto >= inicio.year * 12 + inicio.month - 1).to_numpy()
+    if filtros.get('data_final') is not None:
+        fim = pd.Timestamp(filtros['data_final'])
+        mascara &= (mes_absoluto <= fim.year * 12 + fim.month - 1).to_numpy()
+    for chave, coluna in FILTROS_LISTA.items():
+        if filtros.get(chave) is not None:
+            mascara &= cubo[coluna].isin(filtros[chave]).to_numpy()
+    if filtros.get('idade') is not None:
+        idade_min, idade_max = filtros['idade']
+        faixas = [rotulo for inicio, fim, rotulo in FAIXAS_ETARIAS
+                  if inicio >= idade_min and (idade_max is None or (fim is not None and fim <= idade_max))]
+        mascara &= cubo['faixa_etaria'].isin(faixas).to_numpy()
+    return mascara
+
+
+def mascara_ocorrencias(df, filtros):
+    """
+    Máscara das ocorrências (linhas brutas) que atendem ao filtro, com a
+    mesma semântica da barra lateral: datas inclusivas e idades entre os
+    limites, excluindo idades não informadas.
+    """
+    mascara = np.ones(len(df), dtype=bool)
+    if filtros.get('data_inicial') is not None:
+        mascara &= (df['data_fato'] >= pd.Timestamp(filtros['data_inicial'])).to_numpy()
+    if filtros.get('data_final') is not None:
+        limite = pd.Timestamp(filtros['data_final']).normalize() + pd.Timedelta(days=1)
+        mascara &= (df['data_fato'] < limite).to_numpy()
+    for chave, coluna in FILTROS_LISTA.items():
+        if filtros.get(chave) is not None:
+            mascara &= df[coluna].isin(filtros[chave]).to_numpy()
+    if filtros.get('idade') is not None:
+        idade_min, idade_max = filtros['idade']
+        limite_superior = np.inf if idade_max is None else idade_max
+        dentro = df['idade_vitima'].between(idade_min, limite_superior, inclusive='both')
+        mascara &= dentro.fillna(False).to_numpy(dtype=bool)
+    return mascara
+
+
+def contar_por(por, filtros, cubo, df_geral=None):
+    """
+    Responde "contagens por 'por' para o filtro 'filtros'". Usa o cubo quando
+    o filtro é compatível; caso contrário, agrega as linhas de 'df_geral'.
+
+    'por' é uma lista de DIMENSOES e 'filtros' um dicionário com as chaves
+    opcionais data_inicial, data_final, idade (mínima, máxima ou None) e as
+    listas de FILTROS_LISTA. Retorna as colunas de 'por', as MEDIDAS e
+    'idade_media'.
+    """
+    por = list(por)
+    if cubo is not None and filtros_compativeis(filtros, cubo):
+        base = cubo[_mascara_cubo(cubo, filtros)]
+    elif df_geral is not None:
+        linhas = df_geral[mascara_ocorrencias(df_geral, filtros)]
+        base = adicionar_dimensoes(linhas)
+    else:
+        raise ValueError("Filtro incompatível com o cubo e nenhuma base de ocorrências foi informada.")
+    return somar_medidas(base, por)
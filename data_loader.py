@@ -1,26 +1,39 @@
 import json
+import threading
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 import streamlit as st
-from shapely.geometry import shape
 import os
+from consultas import COLUNAS_CONSULTA, tabela_sql
+from cubo_ocorrencias import FILTROS_LISTA
+from esquemas import COLUNAS_EXCLUSIVAS_FEMINICIDIO, PARTICOES, abrir_dataset, ler_conjunto
+from indice_filtros import LIMITE_CACHE_SELECOES, CacheSelecoes, IndiceFiltros
+from versoes import diretorio_atual
+from vizinhanca import construir_vizinhanca, mapa_vizinhos
 
-@st.cache_data
-def carregar_dados_processados():
+def ler_dados_processados(diretorio='data/processed'):
     """
-    Carrega todos os dados pré-processados da pasta 'data/processed'.
+    Lê todos os dados pré-processados da versão publicada em 'diretorio'.
     Retorna um dicionário de dataframes e o geojson.
     """
-    diretorio = 'data/processed'
     dfs = {}
     geojson_data = None
 
     try:
-        # Carregar todos os arquivos Parquet
+        diretorio = diretorio_atual(diretorio)
+        # Carregar todos os arquivos Parquet e datasets particionados
         for filename in os.listdir(diretorio):
+            caminho_arquivo = os.path.join(diretorio, filename)
             if filename.endswith('.parquet'):
                 key = filename.replace('.parquet', '')
-                caminho_arquivo = os.path.join(diretorio, filename)
-                dfs[key] = pd.read_parquet(caminho_arquivo)
+            elif filename in PARTICOES and os.path.isdir(caminho_arquivo):
+                key = filename
+            else:
+                continue
+            if key in dfs and not os.path.isdir(caminho_arquivo):
+                continue  # O dataset particionado tem prioridade sobre um Parquet antigo
+            dfs[key] = ler_conjunto(caminho_arquivo)
 
         # Carregar o arquivo GeoJSON
         caminho_geojson = os.path.join(diretorio, 'geojson_sc.json')
@@ -39,38 +52,248 @@ def carregar_dados_processados():
         
     return dfs, geojson_data
 
+# --- VERSÃO DOS DADOS ---
+# O pré-processamento publica cada execução como uma versão nova (ver
+# versoes.py). As funções abaixo recebem o diretório raiz dos dados e o
+# resolvem para o diretório da versão publicada, que é o que entra na chave
+# dos caches: quando uma versão nova é publicada, a próxima execução do
+# script passa a ler dela, sem reiniciar o servidor, enquanto as execuções em
+# andamento terminam com a versão que já tinham resolvido. Os caches de
+# recursos guardam no máximo VERSOES_EM_CACHE versões.
+VERSOES_EM_CACHE = 2
+
+# Diretório raiz dos dados processados lidos pelo painel; OVM_DIRETORIO_DADOS
+# aponta o painel para outro (por exemplo, dados sintéticos num teste de carga)
+VARIAVEL_DIRETORIO_DADOS = 'OVM_DIRETORIO_DADOS'
+
+def diretorio_processado():
+    """Diretório raiz dos dados processados do painel (OVM_DIRETORIO_DADOS ou 'data/processed')."""
+    return os.environ.get(VARIAVEL_DIRETORIO_DADOS, 'data/processed')
+
+def carregar_dados_processados(diretorio='data/processed'):
+    """
+    Carrega todos os dados pré-processados da versão publicada em
+    'diretorio'. Retorna um dicionário de dataframes e o geojson. Cada
+    chamada devolve uma cópia nova; o painel lê só os conjuntos e colunas de cada aba, com
+    obter_dataset e obter_geojson.
+    """
+    return _carregar_dados_processados(diretorio_atual(diretorio))
+
+@st.cache_data(max_entries=VERSOES_EM_CACHE)
+def _carregar_dados_processados(diretorio):
+    return ler_dados_processados(diretorio)
+
+def somente_leitura(serie):
+    """
+    Marca como somente leitura os arrays de uma coluna compartilhada entre as
+    sessões. Alterar os seus valores no lugar (df.loc[...] = ..., atribuição
+    encadeada, inplace=True) levanta ValueError, em vez de alterar os dados
+    de todas as sessões; criar ou substituir colunas de um DataFrame que a
+    usa continua possível. Retorna a própria 'serie'.
+    """
+    valores = serie.array
+    # Arrays numpy por trás de cada tipo de coluna: numéricas, datas e object
+    # (_ndarray), categóricas (_codes) e inteiros anuláveis (_data e _mask)
+    for atributo in ('_ndarray', '_codes', '_data', '_mask'):
+        dados = getattr(valores, atributo, None)
+        if isinstance(dados, np.ndarray):
+            dados.flags.writeable = False
+    return serie
+
+# --- CARREGAMENTO SOB DEMANDA ---
+
+# Conjuntos usados por cada aba do painel ('geojson_sc' é a malha municipal).
+# A barra lateral usa 'geral' e 'populacao' em todas as abas.
+CONJUNTOS_POR_ABA = {
+    'Análise Geral': ['geral', 'feminicidio', 'populacao', 'regioes', 'calendario', 'cubo_ocorrencias', 'geojson_sc'],
+    'Análise de Feminicídios': ['geral', 'feminicidio', 'populacao', 'regioes', 'calendario', 'geojson_sc'],
+    'Metodologia e Glossário': ['geral', 'populacao'],
+    'Download de Dados': ['geral', 'feminicidio', 'populacao'],
+}
+# Abas que usam a base 'geral' completa; as demais não leem as colunas
+# exclusivas dos feminicídios
+ABAS_COM_GERAL_COMPLETA = {'Download de Dados'}
+# Ocorrências filtradas que cada aba lê; as demais só são filtradas se a aba
+# as pedir (ver memoria_sessao.SelecaoLinhas)
+FILTRADOS_POR_ABA = {
+    'Análise Geral': ['geral', 'feminicidio'],
+    'Análise de Feminicídios': ['geral', 'feminicidio'],
+    'Metodologia e Glossário': [],
+    'Download de Dados': ['geral', 'feminicidio'],
+}
+
+def caminho_conjunto(nome, diretorio='data/processed'):
+    """Caminho do conjunto 'nome': diretório do dataset particionado ou arquivo Parquet."""
+    caminho = os.path.join(diretorio, nome)
+    return caminho if os.path.isdir(caminho) else caminho + '.parquet'
+
+def colunas_disponiveis(nome, diretorio='data/processed'):
+    """Colunas do conjunto 'nome', lidas apenas dos metadados."""
+    caminho = caminho_conjunto(nome, diretorio_atual(diretorio))
+    esquema = abrir_dataset(caminho).schema if os.path.isdir(caminho) else pq.read_schema(caminho)
+    return list(esquema.names)
+
+@st.cache_resource(max_entries=VERSOES_EM_CACHE)
+def _armazem_colunas(diretorio):
+    """Colunas já lidas de cada conjunto da versão em 'diretorio', compartilhadas por todas as sessões."""
+    return {'trava': threading.Lock(), 'conjuntos': {}}
+
+def obter_dataset(nome, colunas=None, diretorio='data/processed'):
+    """
+    Retorna o conjunto processado 'nome' com as 'colunas' pedidas (None para
+    todas), na ordem do arquivo. Cada coluna é lida do disco na primeira vez
+    que alguma sessão a pede e fica em memória para o processo todo, de modo
+    que pedidos seguintes só leem as colunas ainda não carregadas.
+
+    O DataFrame devolvido compartilha os dados com o cache, que são somente
+    leitura (ver somente_leitura): a sessão pode criar ou substituir colunas,
+    mas não alterar valores no lugar.
+    """
+    diretorio = diretorio_atual(diretorio)
+    armazem = _armazem_colunas(diretorio)
+    with armazem['trava']:
+        conjunto = armazem['conjuntos'].get(nome)
+        if conjunto is None:
+            conjunto = {'ordem': colunas_disponiveis(nome, diretorio), 'colunas': {}, 'attrs': {}}
+            armazem['conjuntos'][nome] = conjunto
+
+        if colunas is None:
+            pedidas = conjunto['ordem']
+        else:
+            desconhecidas = set(colunas) - set(conjunto['ordem'])
+            if desconhecidas:
+                raise KeyError(f"Colunas inexistentes em '{nome}': {sorted(desconhecidas)}")
+            pedidas = [col for col in conjunto['ordem'] if col in set(colunas)]
+
+        faltantes = [col for col in pedidas if col not in conjunto['colunas']]
+        if faltantes:
+            df = ler_conjunto(caminho_conjunto(nome, diretorio), colunas=faltantes)
+            conjunto['colunas'].update({col: somente_leitura(df[col]) for col in faltantes})
+            conjunto['attrs'] = df.attrs
+
+    df = pd.DataFrame({col: conjunto['colunas'][col] for col in pedidas}, copy=False)
+    df.attrs = dict(conjunto['attrs'])
+    return df
+
+# Limite, em MiB, do cache de seleções dos filtros compartilhado pelo processo
+VARIAVEL_LIMITE_SELECOES = 'OVM_CACHE_SELECOES_MB'
+
+@st.cache_resource
+def obter_cache_selecoes():
+    """
+    Cache das seleções de linhas dos filtros (indice_filtros.CacheSelecoes),
+    único no processo e usado pelos índices de todos os conjuntos e versões.
+    O limite vem de OVM_CACHE_SELECOES_MB.
+    """
+    limite_mb = os.environ.get(VARIAVEL_LIMITE_SELECOES)
+    limite = LIMITE_CACHE_SELECOES if limite_mb is None else int(float(limite_mb) * 1024 ** 2)
+    return CacheSelecoes(limite)
+
+def obter_indice(nome, diretorio='data/processed'):
+    """
+    Índice dos filtros da barra lateral (indice_filtros.IndiceFiltros) sobre
+    o conjunto 'nome', construído uma vez por processo e versão. As seleções
+    calculadas vão para obter_cache_selecoes() e servem a todas as sessões e abas.
+    """
+    return _construir_indice(nome, diretorio_atual(diretorio))
+
+@st.cache_resource(max_entries=2 * VERSOES_EM_CACHE)
+def _construir_indice(nome, diretorio):
+    colunas = ['data_fato', 'idade_vitima'] + list(FILTROS_LISTA.values())
+    return IndiceFiltros(obter_dataset(nome, colunas, diretorio), cache=obter_cache_selecoes())
+
+def obter_tabela_sql(nome, diretorio='data/processed'):
+    """
+    Tabela de 'nome' registrada pelo backend DuckDB (consultas.tabela_sql),
+    montada uma vez por processo e versão sobre as colunas compartilhadas de
+    obter_dataset. As conexões de todas as sessões registram o mesmo
+    DataFrame, sem cópia das colunas nem da posição das linhas.
+    """
+    return _montar_tabela_sql(nome, diretorio_atual(diretorio))
+
+@st.cache_resource(max_entries=2 * VERSOES_EM_CACHE)
+def _montar_tabela_sql(nome, diretorio):
+    colunas = [col for col in COLUNAS_CONSULTA if col in colunas_disponiveis(nome, diretorio)]
+    tabela = tabela_sql(obter_dataset(nome, colunas, diretorio))
+    somente_leitura(tabela['_linha'])
+    return tabela
+
+# Colunas de localização das ocorrências, na ordem de obter_localidades
+COLUNAS_LOCALIDADE = ['municipio', 'municipio_normalizado', 'mesoregiao', 'associacao']
+
+def obter_localidades(diretorio='data/processed'):
+    """
+    Combinações distintas de município, município normalizado, mesorregião
+    e associação que aparecem na base geral (algumas centenas de linhas),
+    calculadas uma vez por processo e versão. Com elas, os filtros de
+    localização são traduzidos nos municípios e mesorregiões que de fato
+    cobrem (ver filtros.localidades_filtradas).
+    """
+    return _localidades(diretorio_atual(diretorio))
+
+@st.cache_resource(max_entries=VERSOES_EM_CACHE)
+def _localidades(diretorio):
+    return obter_dataset('geral', COLUNAS_LOCALIDADE, diretorio).drop_duplicates().reset_index(drop=True)
+
+def obter_geojson(diretorio='data/processed'):
+    """Malha municipal processada, lida uma única vez por processo e versão."""
+    return _ler_geojson(diretorio_atual(diretorio))
+
+@st.cache_resource(max_entries=VERSOES_EM_CACHE)
+def _ler_geojson(diretorio):
+    with open(os.path.join(diretorio, 'geojson_sc.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def dados_da_aba(aba, diretorio='data/processed'):
+    """
+    Conjuntos e colunas de que a aba 'aba' precisa, no formato
+    {conjunto: colunas ou None}, para uso com obter_dataset.
+    """
+    necessidades = {nome: None for nome in CONJUNTOS_POR_ABA.get(aba, CONJUNTOS_POR_ABA['Análise Geral'])}
+    if aba not in ABAS_COM_GERAL_COMPLETA:
+        necessidades['geral'] = [col for col in colunas_disponiveis('geral', diretorio)
+                                 if col not in COLUNAS_EXCLUSIVAS_FEMINICIDIO]
+    return necessidades
+
+def carregar_vizinhanca(diretorio='data/processed'):
+    """Lê o artefato de vizinhança gerado pelo pré-processamento. Retorna None se não existir."""
+    return _ler_vizinhanca(diretorio_atual(diretorio))
+
+@st.cache_data(max_entries=VERSOES_EM_CACHE)
+def _ler_vizinhanca(diretorio):
+    caminho = os.path.join(diretorio, 'vizinhos.json')
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
 # --- CORREÇÃO APLICADA AQUI ---
 # Função 'mapear_vizinhos' adicionada para corrigir o erro em 'analises_avancadas.py'
-@st.cache_data
-def mapear_vizinhos(geojson_data):
-    """
-    Mapeia os vizinhos de cada município a partir de um arquivo GeoJSON.
-    Requer a biblioteca 'shapely'.
-    """
-    municipios = geojson_data['features']
-    geometrias = {
-        feature['properties']['NM_MUN_NORMALIZADO']: shape(feature['geometry'])
-        for feature in municipios if feature.get('geometry')
-    }
-    
-    mapa_vizinhos = {}
-    lista_nomes = list(geometrias.keys())
-
-    for i in range(len(lista_nomes)):
-        nome_mun1 = lista_nomes[i]
-        geom1 = geometrias[nome_mun1]
-        mapa_vizinhos[nome_mun1] = []
-        
-        for j in range(i + 1, len(lista_nomes)):
-            nome_mun2 = lista_nomes[j]
-            geom2 = geometrias[nome_mun2]
-            
-            # Verifica se as geometrias se tocam (são vizinhas)
-            if geom1.touches(geom2):
-                mapa_vizinhos[nome_mun1].append(nome_mun2)
-                # Garante que a relação de vizinhança seja mútua
-                if nome_mun2 not in mapa_vizinhos:
-                    mapa_vizinhos[nome_mun2] = []
-                mapa_vizinhos[nome_mun2].append(nome_mun1)
-                
-    return mapa_vizinhos
+def mapear_vizinhos(geojson_data=None, criterio='rainha', distancia_km=None, diretorio=None):
+    """
+    Mapeia os vizinhos de cada município ({município: [vizinhos]}). Usa o
+    artefato 'vizinhos.json' do pré-processamento; se ele não existir ou não
+    corresponder à malha, calcula a vizinhança na hora.
+    'criterio' é 'rainha' ou 'torre'; com 'distancia_km', considera vizinhos
+    os municípios cujos centroides estão a até essa distância.
+
+    A malha é a da versão dos dados em 'diretorio' (por padrão,
+    diretorio_processado()), e o resultado fica em cache por versão, sem
+    comparar a malha a cada chamada. Um 'geojson_data' diferente da malha
+    dessa versão é mapeado sem cache.
+    """
+    diretorio = diretorio_atual(diretorio or diretorio_processado())
+    if geojson_data is None or geojson_data is obter_geojson(diretorio):
+        return _mapear_vizinhos(diretorio, criterio, distancia_km)
+    return _vizinhos_da_malha(geojson_data, _ler_vizinhanca(diretorio), criterio, distancia_km)
+
+@st.cache_data(max_entries=4 * VERSOES_EM_CACHE)
+def _mapear_vizinhos(diretorio, criterio, distancia_km):
+    return _vizinhos_da_malha(obter_geojson(diretorio), _ler_vizinhanca(diretorio), criterio, distancia_km)
+
+def _vizinhos_da_malha(geojson_data, artefato, criterio, distancia_km):
+    nomes = [feature['properties']['NM_MUN_NORMALIZADO']
+             for feature in geojson_data['features'] if feature.get('geometry')]
+    if artefato is None or artefato['municipios'] != nomes:
+        artefato = construir_vizinhanca(geojson_data)
+    return mapa_vizinhos(artefato, criterio=criterio, distancia_km=distancia_km)
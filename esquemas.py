@@ -0,0 +1,302 @@
+import json
+import os
+import shutil
+from datetime import timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# --- TIPOS USADOS NOS ESQUEMAS ---
+# Texto de baixa cardinalidade é gravado como dicionário e lido como Categorical
+TEXTO_CATEGORICO = pa.dictionary(pa.int32(), pa.string())
+DATA = pa.timestamp('ms')
+IDADE = pa.int16()
+ANO = pa.int16()
+
+_COLUNAS_OCORRENCIA = {
+    'data_fato': DATA,
+    'municipio': TEXTO_CATEGORICO,
+    'municipio_normalizado': TEXTO_CATEGORICO,
+    'mesoregiao': TEXTO_CATEGORICO,
+    'associacao': TEXTO_CATEGORICO,
+    'fato_comunicado': TEXTO_CATEGORICO,
+    'idade_vitima': IDADE,
+    'ano': ANO,
+    'id_registro': pa.int64(),
+}
+
+_COLUNAS_FEMINICIDIO = {
+    'hora_fato': TEXTO_CATEGORICO,
+    'localidade': TEXTO_CATEGORICO,
+    'passagem_por_violencia_domestica': TEXTO_CATEGORICO,
+    'relacao_autor': TEXTO_CATEGORICO,
+    'bo_de_vd_contra_o_autor': TEXTO_CATEGORICO,
+    'idade_autor': IDADE,
+    'etnia_autor': TEXTO_CATEGORICO,
+    'passagem_policial': TEXTO_CATEGORICO,
+    'autor_preso': TEXTO_CATEGORICO,
+    'etnia_vitima': TEXTO_CATEGORICO,
+    'meio_crime': TEXTO_CATEGORICO,
+}
+
+# Colunas que só existem na base de feminicídios; na base 'geral' elas ficam
+# preenchidas apenas nas linhas de feminicídio
+COLUNAS_EXCLUSIVAS_FEMINICIDIO = tuple(_COLUNAS_FEMINICIDIO)
+
+# Esquema declarado de cada conjunto processado. Colunas que não aparecem
+# aqui são gravadas com o tipo inferido pelo pyarrow.
+ESQUEMAS = {
+    'geral': {**_COLUNAS_OCORRENCIA, **_COLUNAS_FEMINICIDIO, 'mes': TEXTO_CATEGORICO},
+    'feminicidio': {**_COLUNAS_OCORRENCIA, **_COLUNAS_FEMINICIDIO},
+    'regioes': {
+        'municipio': pa.string(),
+        'municipio_normalizado': pa.string(),
+        'mesoregiao': TEXTO_CATEGORICO,
+        'associacao': TEXTO_CATEGORICO,
+    },
+    'populacao': {
+        'municipio': pa.string(),
+        'municipio_normalizado': pa.string(),
+    },
+    'calendario': {
+        'data': DATA,
+        'nome_feriado': TEXTO_CATEGORICO,
+        'is_feriado': pa.bool_(),
+        'dia_semana_num': pa.int8(),
+        'dia_semana_nome': TEXTO_CATEGORICO,
+        'is_fim_de_semana': pa.bool_(),
+        'is_vespera_feriado': pa.bool_(),
+        'is_pos_feriado': pa.bool_(),
+    },
+    'cubo_ocorrencias': {
+        'municipio': TEXTO_CATEGORICO,
+        'municipio_normalizado': TEXTO_CATEGORICO,
+        'mesoregiao': TEXTO_CATEGORICO,
+        'associacao': TEXTO_CATEGORICO,
+        'fato_comunicado': TEXTO_CATEGORICO,
+        'ano': ANO,
+        'mes_num': pa.int8(),
+        'dia_semana_num': pa.int8(),
+        'faixa_etaria': TEXTO_CATEGORICO,
+        'quantidade': pa.int32(),
+        'soma_idade': pa.float64(),
+        'qtd_idade': pa.int32(),
+    },
+}
+
+# Conjuntos gravados como dataset Parquet particionado no estilo Hive
+# (ex.: geral/ano=2023/parte-0.parquet), ordenados por data do fato para que
+# as estatísticas de cada grupo de linhas permitam descartar períodos inteiros
+PARTICOES = {
+    'geral': ['ano'],
+    'feminicidio': ['ano'],
+}
+COLUNA_ORDENACAO = 'data_fato'
+LINHAS_POR_GRUPO = 64 * 1024
+
+# Chave, nos metadados do Parquet, onde é gravado o df.attrs do conjunto
+CHAVE_ATRIBUTOS = b'ovm_atributos'
+
+# Inteiros pequenos voltam como inteiros anuláveis do pandas (e não float64)
+_TIPOS_PANDAS = {
+    pa.int8(): pd.Int8Dtype(),
+    pa.int16(): pd.Int16Dtype(),
+}
+
+
+def _como_texto(serie):
+    """Converte valores não textuais para str, preservando os ausentes."""
+    return serie.map(lambda v: v if pd.isna(v) else str(v))
+
+
+def _converter_coluna(nome, serie, tipo):
+    """Converte uma coluna do pandas para um array Arrow do tipo declarado."""
+    if tipo is None:
+        return pa.array(serie, from_pandas=True)
+
+    if pa.types.is_dictionary(tipo):
+        try:
+            valores = pa.array(serie, type=pa.string(), from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            valores = pa.array(_como_texto(serie), type=pa.string(), from_pandas=True)
+        return valores.dictionary_encode().cast(tipo)
+
+    if pa.types.is_integer(tipo):
+        valores = pa.array(pd.to_numeric(serie, errors='coerce'), from_pandas=True)
+        try:
+            return valores.cast(tipo)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            # Valores fracionários ou fora da faixa: mantém o tipo original
+            print(f"Aviso: coluna '{nome}' não cabe em {tipo}; mantida como {valores.type}.")
+            return valores
+
+    if pa.types.is_timestamp(tipo):
+        return pa.array(pd.to_datetime(serie), from_pandas=True).cast(tipo, safe=False)
+
+    return pa.array(serie, type=tipo, from_pandas=True)
+
+
+def para_tabela(df, nome):
+    """
+    Converte o DataFrame do conjunto 'nome' em tabela Arrow aplicando o
+    esquema declarado em ESQUEMAS. O índice do pandas não é gravado.
+    """
+    esquema = ESQUEMAS.get(nome, {})
+    arrays = [_converter_coluna(col, df[col], esquema.get(col)) for col in df.columns]
+    tabela = pa.Table.from_arrays(arrays, names=[str(col) for col in df.columns])
+    if df.attrs:
+        # Metadados do conjunto (df.attrs) viajam junto no esquema do arquivo
+        tabela = tabela.replace_schema_metadata({CHAVE_ATRIBUTOS: json.dumps(df.attrs, default=str)})
+    return tabela
+
+
+def para_dataframe(tabela, categorias=True):
+    """
+    Converte uma tabela Arrow em DataFrame preservando os tipos compactos:
+    dicionários viram Categorical, inteiros pequenos viram Int8/Int16 e datas
+    viram datetime64[ns]. Com categorias=False, colunas de dicionário são
+    decodificadas para texto comum (útil no ETL, que acrescenta valores novos).
+    """
+    if not categorias:
+        campos = [pa.field(f.name, f.type.value_type) if pa.types.is_dictionary(f.type) else f
+                  for f in tabela.schema]
+        tabela = tabela.cast(pa.schema(campos, metadata=tabela.schema.metadata))
+    df = tabela.to_pandas(types_mapper=_TIPOS_PANDAS.get, coerce_temporal_nanoseconds=True)
+    metadados = tabela.schema.metadata or {}
+    if CHAVE_ATRIBUTOS in metadados:
+        df.attrs = json.loads(metadados[CHAVE_ATRIBUTOS])
+    return df
+
+
+def salvar_parquet(df, nome, caminho_arquivo):
+    """Grava o conjunto 'nome' em Parquet com o esquema declarado."""
+    pq.write_table(para_tabela(df, nome), caminho_arquivo)
+
+
+def ler_parquet(caminho_arquivo, colunas=None, categorias=True):
+    """Lê um Parquet gravado por salvar_parquet, preservando os tipos compactos."""
+    return para_dataframe(pq.read_table(caminho_arquivo, columns=colunas), categorias=categorias)
+
+
+def _particionamento(nome):
+    """Esquema de particionamento Hive do conjunto 'nome', com os tipos declarados."""
+    esquema = ESQUEMAS.get(nome, {})
+    campos = [(col, esquema.get(col, pa.int32())) for col in PARTICOES[nome]]
+    return ds.partitioning(pa.schema(campos), flavor='hive')
+
+
+def salvar_dataset_particionado(df, nome, diretorio):
+    """
+    Grava o conjunto 'nome' como dataset Parquet particionado pelas colunas
+    de PARTICOES, ordenado por data do fato e com grupos de linhas de tamanho
+    LINHAS_POR_GRUPO. O dataset é montado num diretório temporário e só então
+    substitui o anterior.
+    """
+    if COLUNA_ORDENACAO in df.columns:
+        df = df.sort_values(COLUNA_ORDENACAO, kind='stable')
+    tabela = para_tabela(df, nome)
+
+    diretorio_tmp = diretorio.rstrip('/\\') + '.tmp'
+    shutil.rmtree(diretorio_tmp, ignore_errors=True)
+    ds.write_dataset(tabela, diretorio_tmp, format='parquet', partitioning=_particionamento(nome),
+                     basename_template='parte-{i}.parquet',
+                     min_rows_per_group=LINHAS_POR_GRUPO, max_rows_per_group=LINHAS_POR_GRUPO)
+    if os.path.isdir(diretorio):
+        shutil.rmtree(diretorio)
+    os.replace(diretorio_tmp, diretorio)
+
+
+def anexar_segmento(df, nome, diretorio, segmento):
+    """
+    Acrescenta as linhas de 'df' ao dataset particionado 'nome' já gravado em
+    'diretorio'. Só as partições que recebem linhas novas são regravadas: as
+    linhas existentes e as novas são reordenadas juntas pela data do fato, de
+    modo que o dataset continua ordenado (o painel depende disso para buscar
+    períodos e descartar grupos de linhas). As colunas são alinhadas ao
+    esquema do dataset (as ausentes ficam nulas).
+    """
+    dataset = abrir_dataset(diretorio)
+    esquema = dataset.schema
+    df = df.reindex(columns=esquema.names)
+    novas = para_tabela(df, nome).replace_schema_metadata(None).cast(esquema)
+
+    # Linhas existentes das partições afetadas, seguidas das novas
+    colunas_particao = PARTICOES[nome]
+    chaves = df[colunas_particao].drop_duplicates().itertuples(index=False, name=None)
+    filtro = None
+    for chave in chaves:
+        condicao = None
+        for coluna, valor in zip(colunas_particao, chave):
+            termo = ds.field(coluna).is_null() if pd.isna(valor) else ds.field(coluna) == valor
+            condicao = termo if condicao is None else condicao & termo
+        filtro = condicao if filtro is None else filtro | condicao
+    tabela = pa.concat_tables([dataset.to_table(filter=filtro), novas]).unify_dictionaries()
+    if COLUNA_ORDENACAO in tabela.column_names:
+        tabela = tabela.sort_by(COLUNA_ORDENACAO)
+
+    diretorio_tmp = diretorio.rstrip('/\\') + f'.{segmento}.tmp'
+    shutil.rmtree(diretorio_tmp, ignore_errors=True)
+    ds.write_dataset(tabela, diretorio_tmp, format='parquet', partitioning=_particionamento(nome),
+                     basename_template='parte-{i}.parquet',
+                     min_rows_per_group=LINHAS_POR_GRUPO, max_rows_per_group=LINHAS_POR_GRUPO)
+    # Substitui as partições afetadas pelas regravadas. Os arquivos antigos
+    # podem ser hard links de outra versão: remover o diretório só desfaz os links
+    for raiz, _, arquivos in os.walk(diretorio_tmp):
+        if not arquivos:
+            continue
+        destino = os.path.join(diretorio, os.path.relpath(raiz, diretorio_tmp))
+        shutil.rmtree(destino, ignore_errors=True)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        os.replace(raiz, destino)
+    shutil.rmtree(diretorio_tmp, ignore_errors=True)
+
+
+def abrir_dataset(caminho):
+    """Abre um dataset particionado sem ler os dados, apenas os metadados."""
+    nome = os.path.basename(os.path.normpath(caminho))
+    particionamento = _particionamento(nome) if nome in PARTICOES else 'hive'
+    return ds.dataset(caminho, format='parquet', partitioning=particionamento)
+
+
+def filtro_periodo(data_inicial=None, data_final=None, fatos=None):
+    """
+    Monta a expressão do pyarrow equivalente ao filtro de período (datas
+    inclusivas) e de tipos de crime da barra lateral. O filtro pelo ano poda
+    partições inteiras; o filtro pela data usa as estatísticas dos grupos de
+    linhas. Retorna None se nenhum filtro for informado.
+    """
+    condicoes = []
+    if data_inicial is not None:
+        inicio = pd.Timestamp(data_inicial)
+        condicoes.append(ds.field('ano') >= inicio.year)
+        condicoes.append(ds.field(COLUNA_ORDENACAO) >= inicio.to_pydatetime())
+    if data_final is not None:
+        fim = pd.Timestamp(data_final)
+        condicoes.append(ds.field('ano') <= fim.year)
+        condicoes.append(ds.field(COLUNA_ORDENACAO) < (fim.normalize() + timedelta(days=1)).to_pydatetime())
+    if fatos is not None:
+        condicoes.append(ds.field('fato_comunicado').isin(list(fatos)))
+
+    expressao = None
+    for condicao in condicoes:
+        expressao = condicao if expressao is None else expressao & condicao
+    return expressao
+
+
+def ler_dataset(caminho, colunas=None, filtro=None, categorias=True):
+    """
+    Lê um dataset particionado, decodificando apenas as colunas pedidas e os
+    grupos de linhas que podem satisfazer o 'filtro' (expressão do pyarrow).
+    """
+    tabela = abrir_dataset(caminho).to_table(columns=colunas, filter=filtro)
+    return para_dataframe(tabela, categorias=categorias)
+
+
+def ler_conjunto(caminho, colunas=None, filtro=None, categorias=True):
+    """Lê um conjunto processado, seja um Parquet único ou um dataset particionado."""
+    if os.path.isdir(caminho):
+        return ler_dataset(caminho, colunas=colunas, filtro=filtro, categorias=categorias)
+    tabela = pq.read_table(caminho, columns=colunas, filters=filtro)
+    return para_dataframe(tabela, categorias=categorias)
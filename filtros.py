@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+
+
+# --- FILTROS DA BARRA LATERAL ---
+# Lógica de filtragem do painel separada dos widgets do Streamlit, para que
+# possa ser reutilizada e medida (ver benchmarks/benchmark_pipeline.py).
+
+def limites_periodo(data_inicial, data_final):
+    """Instantes [início, fim) equivalentes às datas inclusivas 'data_inicial' e 'data_final'."""
+    return pd.Timestamp(data_inicial).normalize(), pd.Timestamp(data_final).normalize() + pd.Timedelta(days=1)
+
+
+def mascara_periodo(datas, data_inicial, data_final):
+    """
+    Máscara das 'datas' entre 'data_inicial' e 'data_final' (inclusivas).
+    Compara os datetime64 diretamente, sem criar um objeto date por linha.
+    """
+    inicio, fim = limites_periodo(data_inicial, data_final)
+    return (datas >= inicio) & (datas < fim)
+
+
+def filtrar_periodo(df, data_inicial, data_final):
+    """
+    Ocorrências com data do fato entre 'data_inicial' e 'data_final'
+    (inclusivas). Se as datas estiverem em ordem crescente, como o
+    pré-processamento grava os conjuntos, o período é um trecho contínuo
+    localizado por busca binária.
+    """
+    datas = df['data_fato']
+    if datas.is_monotonic_increasing:
+        inicio, fim = datas.searchsorted(list(limites_periodo(data_inicial, data_final)))
+        return df.iloc[inicio:fim]
+    return df[mascara_periodo(datas, data_inicial, data_final)]
+
+
+def opcoes_disponiveis(df_periodo):
+    """Opções dos filtros de localização e de tipo de crime para as ocorrências do período."""
+    return {
+        'municipios': sorted(df_periodo['municipio'].dropna().unique()),
+        'mesoregioes': sorted([m for m in df_periodo['mesoregiao'].unique() if m != 'Não informado']),
+        'associacoes': sorted([a for a in df_periodo['associacao'].dropna().unique() if a != 'Não informado']),
+        'fatos': sorted(df_periodo['fato_comunicado'].unique()),
+    }
+
+
+def calcular_metricas_populacionais(df_periodo, df_populacao):
+    """
+    Total de fatos, média anual, taxa por mil mulheres e percentual de
+    mulheres vítimas de cada município, considerando as ocorrências do período.
+    """
+    return metricas_de_contagens(df_populacao, df_periodo['municipio_normalizado'].value_counts(),
+                                 len(df_periodo['ano'].unique()))
+
+
+def metricas_de_contagens(df_populacao, total_fatos, num_anos):
+    """
+    Métricas populacionais a partir do total de fatos por município
+    normalizado ('total_fatos', uma Series indexada pelo município) e do
+    número de anos com ocorrências no período. Os totais são alinhados às
+    linhas de 'df_populacao' pelo índice e as métricas, calculadas sobre os
+    arrays, sem merge.
+    """
+    posicoes = total_fatos.index.get_indexer(df_populacao['municipio_normalizado'])
+    totais = np.where(posicoes >= 0, total_fatos.to_numpy()[posicoes], 0)
+    num_anos = num_anos if num_anos > 0 else 1
+
+    populacao = df_populacao['populacao_feminina'].to_numpy()
+    media_anual = totais / num_anos
+    with np.errstate(divide='ignore', invalid='ignore'):
+        por_mulher = media_anual / populacao
+    por_mulher = np.where(np.isnan(por_mulher), 0.0, por_mulher)
+
+    df_populacional_metrics = df_populacao.reset_index(drop=True)
+    df_populacional_metrics['total_fatos'] = totais
+    df_populacional_metrics['media_anual_fatos'] = media_anual
+    df_populacional_metrics['taxa_por_mil_mulheres'] = por_mulher * 1000
+    df_populacional_metrics['percentual_mulheres_vitimas'] = por_mulher * 100
+    return df_populacional_metrics
+
+
+def municipios_por_metricas(df_populacional_metrics, pop, media_fatos, taxa, perc):
+    """Municípios (normalizados) cujas métricas populacionais estão nas faixas (mínimo, máximo) informadas."""
+    mascara = np.ones(len(df_populacional_metrics), dtype=bool)
+    for coluna, (minimo, maximo) in (('populacao_feminina', pop), ('media_anual_fatos', media_fatos),
+                                     ('taxa_por_mil_mulheres', taxa), ('percentual_mulheres_vitimas', perc)):
+        valores = df_populacional_metrics[coluna].to_numpy()
+        mascara &= (valores >= minimo) & (valores <= maximo)
+    return df_populacional_metrics['municipio_normalizado'][mascara]
+
+
+def localidades_filtradas(localidades, filtros_aplicados):
+    """
+    Municípios e mesorregiões cobertos pelos filtros de localização aplicados
+    (municípios, mesorregiões, associações e municípios dos filtros
+    populacionais, no formato de cubo_ocorrencias.contar_por), a partir das
+    combinações de data_loader.obter_localidades. Como as opções de
+    municípios já vêm só do período, o resultado corresponde aos municípios
+    e mesorregiões das ocorrências filtradas, sem precisar filtrá-las.
+    """
+    mascara = np.ones(len(localidades), dtype=bool)
+    for chave, coluna in (('municipios', 'municipio'), ('mesoregioes', 'mesoregiao'),
+                          ('associacoes', 'associacao'), ('municipios_normalizados', 'municipio_normalizado')):
+        if filtros_aplicados.get(chave) is not None:
+            mascara &= localidades[coluna].isin(filtros_aplicados[chave]).to_numpy()
+    selecionadas = localidades[mascara]
+    return {
+        'municipios': sorted(selecionadas['municipio'].dropna().astype(str).unique()),
+        'mesoregioes': sorted(selecionadas['mesoregiao'].dropna().astype(str).unique()),
+    }
+
+
+def filtrar_ocorrencias(df, data_inicial, data_final, municipios, mesoregioes, associacoes, idade,
+                        municipios_populacao, fatos=None):
+    """
+    Aplica os filtros finais da barra lateral. 'idade' é o intervalo do
+    slider; o valor máximo 100 inclui todas as idades acima. Com fatos=None,
+    o tipo de crime não é filtrado (caso da base de feminicídios).
+    """
+    idade_max_filtro = float('inf') if idade[1] == 100 else idade[1]
+    mascara = mascara_periodo(df['data_fato'], data_inicial, data_final)
+    if fatos is not None:
+        mascara &= df['fato_comunicado'].isin(fatos)
+    mascara &= (
+        (df['municipio'].isin(municipios)) &
+        (df['mesoregiao'].isin(mesoregioes)) &
+        (df['associacao'].isin(associacoes)) &
+        (df['idade_vitima'].between(idade[0], idade_max_filtro, inclusive='both')) &
+        (df['municipio_normalizado'].isin(municipios_populacao))
+    )
+    return df[mascara].copy()
@@ -396,16 +396,16 @@ def render_custom_header():
         return nav_html
 
     def build_info_html():
-        """Constrói os cards de informação dos filtros"""
-        if 'data_inicial' not in st.session_state or 'df_geral_filtrado' not in st.session_state:
+        """Constrói os cards de informação a partir das localidades dos filtros aplicados, sem ler as ocorrências filtradas"""
+        if 'data_inicial' not in st.session_state or 'localidades_filtradas' not in st.session_state:
             return ""
 
         data_ini = st.session_state.data_inicial
         data_fim = st.session_state.data_final
         dias_totais = (data_fim - data_ini).days
 
-        mesos_no_filtro = st.session_state.df_geral_filtrado['mesoregiao'].unique()
-        mesos_reais = [m for m in mesos_no_filtro if m != 'Não informado']
+        localidades = st.session_state.localidades_filtradas
+        mesos_reais = [m for m in localidades['mesoregioes'] if m != 'Não informado']
         qtd_mesos = len(mesos_reais)
 
         if qtd_mesos >= 6:
@@ -418,7 +418,7 @@ def render_custom_header():
             texto_meso = f"{qtd_mesos} Mesorregiões"
             detalhe_meso = None
 
-        muns_selecionados = st.session_state.df_geral_filtrado['municipio'].unique()
+        muns_selecionados = localidades['municipios']
         qtd_mun = len(muns_selecionados)
 
         if qtd_mun >= 293:
@@ -0,0 +1,518 @@
+import itertools
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from cubo_ocorrencias import FILTROS_LISTA
+
+# --- ÍNDICE DOS FILTROS DA BARRA LATERAL ---
+# Cada dimensão filtrável de um conjunto de ocorrências é codificada como
+# dicionário: as colunas categóricas usam os próprios códigos, e a idade vira
+# o código do seu valor na lista ordenada de idades distintas. Na primeira
+# vez que uma seleção estreita usa a dimensão, ela ganha as listas ordenadas
+# de linhas de cada valor, em formato CSR: as linhas com o código c são
+# ordem[acumuladas[c + 1]:acumuladas[c + 2]] (a posição 0 guarda as linhas
+# sem valor).
+#
+# Um estado de filtro é respondido de um de dois modos. Se alguma dimensão
+# seleciona poucas linhas, as listas dos seus valores escolhidos dão as
+# candidatas, e as demais dimensões só conferem os códigos delas. Se não,
+# cada dimensão desmarca numa máscara as linhas que exclui, percorrendo as
+# listas do lado menor (valores escolhidos ou não escolhidos), de modo que o
+# custo é proporcional às linhas afetadas e não ao tamanho da base.
+# Dimensões em que todas as linhas passam são ignoradas.
+#
+# As seleções calculadas ficam num CacheSelecoes, que pode ser compartilhado
+# por todos os índices e sessões do processo. A chave é a forma normalizada
+# do estado: o trecho de dias do período e o conjunto de códigos escolhidos
+# em cada dimensão. Estados que selecionam as mesmas linhas pelos mesmos
+# critérios (listas em outra ordem, datas além dos limites dos dados, uma
+# lista com todos os valores ou nenhum filtro) usam a mesma entrada.
+#
+# O período usa o dia de cada ocorrência (inteiro desde 1970-01-01) em ordem
+# crescente: um intervalo de datas vira um par de buscas binárias. Como o
+# pré-processamento grava os conjuntos ordenados pela data do fato, os dias
+# normalmente já estão em ordem e o período é um trecho contínuo de linhas;
+# se não estiverem (conjuntos gravados por outro caminho), o índice guarda a
+# permutação que os ordena.
+#
+# Para as contagens por período sem outros filtros (métricas populacionais),
+# cada dimensão pode ter também a matriz das contagens acumuladas por dia:
+# acumuladas[p, d] é o número de linhas da posição p (código p - 1) antes do
+# dia d (contado a partir do primeiro dia dos dados). As contagens de um
+# período são a diferença de duas colunas da matriz, qualquer que seja ele.
+#
+# Numa sessão, os estados de filtro costumam mudar uma dimensão por vez. Um
+# AvaliadorIncremental, que é da sessão e não do índice, guarda a máscara de
+# cada dimensão do último estado calculado: no modo das máscaras, só as
+# dimensões que mudaram são recalculadas, e as máscaras guardadas são
+# combinadas de novo. As máscaras ficam compactadas (um bit por linha).
+
+# Uma dimensão conduz a busca pelas listas de linhas se selecionar no máximo
+# esta fração das linhas
+FRACAO_SELETIVA = 1 / 8
+
+# Limite padrão, em bytes, das posições guardadas por um CacheSelecoes
+LIMITE_CACHE_SELECOES = 256 * 1024 ** 2
+
+# Dia usado para datas ausentes: fica depois de todos os dias e nunca cai num período
+DIA_AUSENTE = np.iinfo(np.int32).max
+
+
+def _tipo_posicoes(total):
+    return np.int32 if total < np.iinfo(np.int32).max else np.int64
+
+
+def _codificar_ordenado(valores):
+    """Códigos de valores numéricos na ordem dos valores distintos (-1 para ausentes)."""
+    presentes = ~np.isnan(valores)
+    distintos = np.unique(valores[presentes])
+    tipo = np.int16 if len(distintos) < np.iinfo(np.int16).max else np.int32
+    codigos = np.full(len(valores), -1, dtype=tipo)
+    codigos[presentes] = np.searchsorted(distintos, valores[presentes])
+    return codigos, distintos
+
+
+class _Dimensao:
+    """Coluna codificada como dicionário, com as listas de linhas por código calculadas sob demanda."""
+
+    def __init__(self, codigos, rotulos):
+        self.codigos = codigos
+        self.rotulos = rotulos
+        # Posições dos códigos nas contagens e nas listas: 0 são as linhas sem
+        # valor (código -1) e c + 1, as do código c
+        self.contagens = np.bincount(codigos.astype(np.int64) + 1, minlength=len(rotulos) + 1)
+        self.acumuladas = np.concatenate([[0], np.cumsum(self.contagens)])
+        self._ordem = None
+
+    @property
+    def ordem(self):
+        """Posições das linhas ordenadas por código (e, dentro do código, pela posição)."""
+        if self._ordem is None:
+            self._ordem = np.argsort(self.codigos, kind='stable').astype(_tipo_posicoes(len(self.codigos)))
+        return self._ordem
+
+    def fatias(self, posicoes):
+        """
+        Trechos de 'ordem' com as linhas das posições marcadas em 'posicoes'
+        (booleano, uma por posição). Posições vizinhas viram um só trecho,
+        que fica ordenado por código e não por linha.
+        """
+        bordas = np.diff(np.concatenate([[0], posicoes.astype(np.int8), [0]]))
+        inicios, fins = np.flatnonzero(bordas == 1), np.flatnonzero(bordas == -1)
+        ordem = self.ordem
+        return [ordem[self.acumuladas[i]:self.acumuladas[f]] for i, f in zip(inicios, fins)
+                if self.acumuladas[f] > self.acumuladas[i]]
+
+
+class _RestricaoCodigos:
+    """Códigos escolhidos numa dimensão (uma lista de valores ou uma faixa de idades)."""
+
+    def __init__(self, coluna, dimensao, posicoes):
+        self.dimensao = dimensao
+        self.posicoes = posicoes
+        self.chave = (coluna, np.packbits(posicoes).tobytes())
+        # Tabela indexada pelo próprio código: o código -1 cai na última posição
+        self.tabela = np.concatenate([posicoes[1:], posicoes[:1]])
+        self.contagem = int(dimensao.contagens[posicoes].sum())
+
+    def linhas(self):
+        """Linhas escolhidas, em ordem crescente, unindo as listas dos códigos."""
+        fatias = self.dimensao.fatias(self.posicoes)
+        if not fatias:
+            return np.empty(0, dtype=np.int64)
+        linhas = np.concatenate(fatias).astype(np.int64)
+        # A lista de cada código já está ordenada; as de vários precisam ser intercaladas
+        return linhas if np.count_nonzero(self.posicoes) == 1 else np.sort(linhas)
+
+    def filtrar(self, linhas):
+        """Quais das 'linhas' foram escolhidas, pelos seus códigos."""
+        return self.tabela[self.dimensao.codigos[linhas]]
+
+    def aplicar(self, mascara):
+        """Desmarca na 'mascara' as linhas não escolhidas, percorrendo o lado menor."""
+        if self.contagem * 2 >= len(mascara):
+            for fatia in self.dimensao.fatias(~self.posicoes):
+                mascara[fatia] = False
+        else:
+            escolhidas = np.zeros(len(mascara), dtype=bool)
+            for fatia in self.dimensao.fatias(self.posicoes):
+                escolhidas[fatia] = True
+            mascara &= escolhidas
+
+
+class _RestricaoPeriodo:
+    """Dias de 'inicio' a 'fim' (inclusivos): o trecho [a, b) dos dias em ordem crescente."""
+
+    def __init__(self, indice, inicio, fim):
+        self.dias = indice.dias
+        self.ordem = indice.ordem_dias
+        self.inicio, self.fim = inicio, fim
+        self.a = int(np.searchsorted(indice.dias_ordenados, inicio, side='left'))
+        self.b = int(np.searchsorted(indice.dias_ordenados, fim, side='right'))
+        self.contagem = self.b - self.a
+        self.chave = ('data_fato', self.a, self.b)
+
+    def linhas(self):
+        if self.ordem is None:
+            return np.arange(self.a, self.b)
+        return np.sort(self.ordem[self.a:self.b]).astype(np.int64)
+
+    def filtrar(self, linhas):
+        if self.ordem is None:
+            return (linhas >= self.a) & (linhas < self.b)
+        dias = self.dias[linhas]
+        return (dias >= self.inicio) & (dias <= self.fim)
+
+    def aplicar(self, mascara):
+        if self.ordem is None:
+            mascara[:self.a] = False
+            mascara[self.b:] = False
+        elif self.contagem * 2 >= len(mascara):
+            mascara[self.ordem[:self.a]] = False
+            mascara[self.ordem[self.b:]] = False
+        else:
+            escolhidas = np.zeros(len(mascara), dtype=bool)
+            escolhidas[self.ordem[self.a:self.b]] = True
+            mascara &= escolhidas
+
+
+def _tamanho(linhas):
+    return 0 if linhas is None else linhas.nbytes
+
+
+class CacheSelecoes:
+    """
+    LRU das seleções de linhas (posições, nunca cópias dos dados), limitado
+    pelo total de bytes guardados; limite_bytes=0 desliga o cache. Pode ser
+    compartilhado entre índices e sessões. Conta acertos, falhas e descartes
+    para o diagnóstico do painel.
+    """
+
+    def __init__(self, limite_bytes=LIMITE_CACHE_SELECOES):
+        self.limite_bytes = limite_bytes
+        self.bytes = 0
+        self.acertos = self.falhas = self.descartes = 0
+        self._entradas = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, chave):
+        """(True, seleção) se 'chave' estiver guardada; (False, None) se não."""
+        with self._trava:
+            if chave in self._entradas:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return True, self._entradas[chave]
+            self.falhas += 1
+            return False, None
+
+    def guardar(self, chave, linhas):
+        """Guarda a seleção, descartando as menos usadas até caber no limite."""
+        tamanho = _tamanho(linhas)
+        if self.limite_bytes <= 0 or tamanho > self.limite_bytes:
+            return
+        with self._trava:
+            if chave in self._entradas:
+                self.bytes -= _tamanho(self._entradas.pop(chave))
+            self._entradas[chave] = linhas
+            self.bytes += tamanho
+            while self.bytes > self.limite_bytes:
+                _, descartada = self._entradas.popitem(last=False)
+                self.bytes -= _tamanho(descartada)
+                self.descartes += 1
+
+    def limpar(self):
+        with self._trava:
+            self._entradas.clear()
+            self.bytes = 0
+
+    def estatisticas(self):
+        """Entradas, bytes guardados e limite, acertos, falhas, taxa de acertos e descartes."""
+        with self._trava:
+            consultas = self.acertos + self.falhas
+            return {
+                'entradas': len(self._entradas),
+                'bytes': self.bytes,
+                'limite_bytes': self.limite_bytes,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acertos': self.acertos / consultas if consultas else 0.0,
+                'descartes': self.descartes,
+            }
+
+
+# Identifica cada índice nas chaves de um CacheSelecoes compartilhado
+_NUMERACAO_INDICES = itertools.count()
+
+
+def _dia(data):
+    """Dia (inteiro desde 1970-01-01) de uma data."""
+    return int(np.datetime64(pd.Timestamp(data).date(), 'D').astype(np.int64))
+
+
+class IndiceFiltros:
+    """
+    Índice dos filtros da barra lateral sobre um conjunto de ocorrências
+    ('geral' ou 'feminicidio'). Os filtros seguem o formato de
+    cubo_ocorrencias.contar_por e a mesma semântica de
+    cubo_ocorrencias.mascara_ocorrencias. Pode ser compartilhado entre
+    sessões: depois de construído, só é lido (as listas de linhas calculadas
+    sob demanda e o cache de seleções não mudam o que ele responde). Sem
+    'cache', usa um CacheSelecoes próprio.
+    """
+
+    def __init__(self, df, cache=None):
+        self.total = len(df)
+        self.cache = CacheSelecoes() if cache is None else cache
+        self._numero = next(_NUMERACAO_INDICES)
+        self.dimensoes = {}
+        self.tipos = {}
+        for coluna in FILTROS_LISTA.values():
+            if coluna in df.columns:
+                serie = df[coluna]
+                if not isinstance(serie.dtype, pd.CategoricalDtype):
+                    serie = serie.astype('category')
+                self.dimensoes[coluna] = _Dimensao(serie.cat.codes.to_numpy(), serie.cat.categories)
+                self.tipos[coluna] = serie.dtype
+
+        idades = pd.to_numeric(df['idade_vitima'], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        codigos, distintas = _codificar_ordenado(idades)
+        self.dimensoes['idade_vitima'] = _Dimensao(codigos, distintas)
+
+        datas = df['data_fato'].to_numpy(dtype='datetime64[D]')
+        self.dias = np.where(np.isnat(datas), DIA_AUSENTE, datas.astype(np.int64)).astype(np.int32)
+        if np.all(self.dias[1:] >= self.dias[:-1]):
+            self.ordem_dias = None
+            self.dias_ordenados = self.dias
+        else:
+            self.ordem_dias = np.argsort(self.dias, kind='stable').astype(_tipo_posicoes(self.total))
+            self.dias_ordenados = self.dias[self.ordem_dias]
+        com_data = int(np.searchsorted(self.dias_ordenados, DIA_AUSENTE, side='left'))
+        self.dia_inicial = int(self.dias_ordenados[0]) if com_data else 0
+        self.num_dias = int(self.dias_ordenados[com_data - 1]) - self.dia_inicial + 1 if com_data else 0
+        self._acumuladas_por_dia = {}
+        self._rotulos_ordenados = {}
+        self._total_por_dia = None
+
+    # --- TRADUÇÃO DOS FILTROS ---
+
+    def _restricoes(self, filtros):
+        """Restrições do estado de filtro que não deixam passar todas as linhas."""
+        restricoes = []
+        if filtros.get('data_inicial') is not None or filtros.get('data_final') is not None:
+            inicio = _dia(filtros['data_inicial']) if filtros.get('data_inicial') is not None else np.iinfo(np.int32).min
+            fim = _dia(filtros['data_final']) if filtros.get('data_final') is not None else DIA_AUSENTE - 1
+            restricoes.append(_RestricaoPeriodo(self, inicio, fim))
+
+        for chave, coluna in FILTROS_LISTA.items():
+            if filtros.get(chave) is None or coluna not in self.dimensoes:
+                continue
+            dimensao = self.dimensoes[coluna]
+            codigos = dimensao.rotulos.get_indexer(pd.Index(list(filtros[chave])).unique())
+            posicoes = np.zeros(len(dimensao.contagens), dtype=bool)
+            posicoes[codigos[codigos >= 0] + 1] = True
+            restricoes.append(_RestricaoCodigos(coluna, dimensao, posicoes))
+
+        if filtros.get('idade') is not None:
+            idade_min, idade_max = filtros['idade']
+            dimensao = self.dimensoes['idade_vitima']
+            inicio = int(np.searchsorted(dimensao.rotulos, idade_min, side='left'))
+            fim = int(np.searchsorted(dimensao.rotulos, np.inf if idade_max is None else idade_max, side='right'))
+            posicoes = np.zeros(len(dimensao.contagens), dtype=bool)
+            posicoes[inicio + 1:fim + 1] = True
+            restricoes.append(_RestricaoCodigos('idade_vitima', dimensao, posicoes))
+        return [restricao for restricao in restricoes if restricao.contagem < self.total]
+
+    # --- CONSULTAS ---
+
+    def _calcular(self, restricoes):
+        """Posições das linhas que atendem às 'restricoes', ou None se todas atenderem."""
+        restricoes = sorted(restricoes, key=lambda r: r.contagem)
+        if not restricoes:
+            return None
+        primeira = restricoes[0]
+        if len(restricoes) == 1 and self.ordem_dias is None and isinstance(primeira, _RestricaoPeriodo):
+            # Só o período, com os dias em ordem: um trecho contínuo
+            return primeira.linhas()
+        if primeira.contagem <= self.total * FRACAO_SELETIVA:
+            # Poucas candidatas: as demais restrições só conferem os seus códigos
+            linhas = primeira.linhas()
+            for restricao in restricoes[1:]:
+                if len(linhas) == 0:
+                    break
+                linhas = linhas[restricao.filtrar(linhas)]
+            return linhas
+
+        mascara = np.ones(self.total, dtype=bool)
+        for restricao in restricoes:
+            restricao.aplicar(mascara)
+        return np.flatnonzero(mascara)
+
+    def selecionar(self, filtros, avaliador=None):
+        """
+        Posições (crescentes) das linhas que atendem aos 'filtros', ou None
+        se todas atenderem. O resultado vem do cache quando o mesmo estado
+        normalizado já foi calculado; é somente leitura, pois é compartilhado.
+        Com um 'avaliador' (AvaliadorIncremental deste índice), os estados
+        fora do cache são calculados por ele.
+        """
+        restricoes = self._restricoes(filtros)
+        chave = (self._numero,) + tuple(sorted(restricao.chave for restricao in restricoes))
+        encontrada, linhas = self.cache.obter(chave)
+        if not encontrada:
+            linhas = self._calcular(restricoes) if avaliador is None else avaliador.calcular(restricoes)
+            if linhas is not None:
+                linhas = linhas.astype(_tipo_posicoes(self.total), copy=False)
+                linhas.flags.writeable = False
+            self.cache.guardar(chave, linhas)
+        return linhas
+
+    def linhas(self, filtros):
+        """Posições (crescentes) das linhas que atendem aos 'filtros'."""
+        linhas = self.selecionar(filtros)
+        return np.arange(self.total) if linhas is None else linhas
+
+    def mascara(self, filtros):
+        """Máscara booleana das linhas que atendem aos 'filtros'."""
+        linhas = self.selecionar(filtros)
+        if linhas is None:
+            return np.ones(self.total, dtype=bool)
+        mascara = np.zeros(self.total, dtype=bool)
+        mascara[linhas] = True
+        return mascara
+
+    def contagens(self, coluna, linhas=None):
+        """
+        Número de linhas de cada valor de 'coluna' entre as 'linhas' (None
+        para todas), no formato de value_counts() de uma coluna categórica:
+        todos os valores, inclusive os sem linhas, e sem os ausentes.
+        """
+        dimensao = self.dimensoes[coluna]
+        if linhas is None:
+            contagens = dimensao.contagens
+        else:
+            contagens = np.bincount(dimensao.codigos[linhas].astype(np.int64) + 1,
+                                    minlength=len(dimensao.rotulos) + 1)
+        return self._serie_contagens(coluna, contagens)
+
+    def _serie_contagens(self, coluna, contagens):
+        indice = self.dimensoes[coluna].rotulos
+        if coluna in self.tipos:
+            indice = pd.CategoricalIndex(indice, dtype=self.tipos[coluna], name=coluna)
+        return pd.Series(contagens[1:], index=indice, dtype='int64', name='count')
+
+    # --- CONTAGENS ACUMULADAS POR DIA ---
+
+    def _trecho_dias(self, data_inicial, data_final):
+        """Colunas [inicio, fim) das matrizes acumuladas que correspondem ao período (datas inclusivas)."""
+        inicio = 0 if data_inicial is None else min(max(_dia(data_inicial) - self.dia_inicial, 0), self.num_dias)
+        fim = self.num_dias if data_final is None else min(max(_dia(data_final) - self.dia_inicial + 1, 0),
+                                                           self.num_dias)
+        return inicio, max(inicio, fim)
+
+    def acumuladas_por_dia(self, coluna):
+        """Matriz (posição do código × dia + 1) das contagens acumuladas de 'coluna', calculada na primeira vez."""
+        if coluna not in self._acumuladas_por_dia:
+            dimensao = self.dimensoes[coluna]
+            com_data = self.dias != DIA_AUSENTE
+            posicoes = len(dimensao.rotulos) + 1
+            celulas = ((dimensao.codigos[com_data].astype(np.int64) + 1) * self.num_dias
+                       + (self.dias[com_data] - self.dia_inicial))
+            contagens = np.bincount(celulas, minlength=posicoes * self.num_dias).reshape(posicoes, self.num_dias)
+            acumuladas = np.zeros((posicoes, self.num_dias + 1), dtype=_tipo_posicoes(self.total))
+            np.cumsum(contagens, axis=1, out=acumuladas[:, 1:])
+            self._acumuladas_por_dia[coluna] = acumuladas
+        return self._acumuladas_por_dia[coluna]
+
+    def contagens_periodo(self, coluna, data_inicial=None, data_final=None):
+        """
+        Mesmo resultado de contagens(coluna, linhas do período), pela
+        diferença de duas colunas das contagens acumuladas por dia. Sem
+        nenhuma das datas, o período não filtra e conta também as linhas sem data.
+        """
+        return self._serie_contagens(coluna, self._contagens_no_periodo(coluna, data_inicial, data_final))
+
+    def _contagens_no_periodo(self, coluna, data_inicial, data_final):
+        if data_inicial is None and data_final is None:
+            return self.dimensoes[coluna].contagens
+        inicio, fim = self._trecho_dias(data_inicial, data_final)
+        acumuladas = self.acumuladas_por_dia(coluna)
+        return acumuladas[:, fim].astype(np.int64) - acumuladas[:, inicio]
+
+    def valores_periodo(self, coluna, data_inicial=None, data_final=None):
+        """Valores de 'coluna', como texto e em ordem alfabética, que têm ocorrências no período."""
+        if coluna not in self._rotulos_ordenados:
+            textos = np.array([str(valor) for valor in self.dimensoes[coluna].rotulos], dtype=object)
+            ordem = np.argsort(textos, kind='stable')
+            self._rotulos_ordenados[coluna] = (textos[ordem], ordem + 1)
+        textos, posicoes = self._rotulos_ordenados[coluna]
+        contagens = self._contagens_no_periodo(coluna, data_inicial, data_final)[posicoes]
+        return textos[contagens > 0].tolist()
+
+    def anos_periodo(self, data_inicial=None, data_final=None):
+        """Mesmo resultado de anos(linhas do período), pelas ocorrências acumuladas por dia."""
+        if self.num_dias == 0:
+            return np.empty(0, dtype=np.int64)
+        if self._total_por_dia is None:
+            dias = self.dias[self.dias != DIA_AUSENTE] - self.dia_inicial
+            total = np.zeros(self.num_dias + 1, dtype=np.int64)
+            np.cumsum(np.bincount(dias, minlength=self.num_dias), out=total[1:])
+            self._total_por_dia = total
+        inicio, fim = self._trecho_dias(data_inicial, data_final)
+
+        # Primeiro dia de cada ano dos dados (e do ano seguinte ao último),
+        # como coluna das matrizes, limitado ao período
+        ano_inicial = int(np.datetime64(self.dia_inicial, 'D').astype('datetime64[Y]').astype(np.int64)) + 1970
+        ano_final = int(np.datetime64(self.dia_inicial + self.num_dias - 1, 'D')
+                        .astype('datetime64[Y]').astype(np.int64)) + 1970
+        anos = np.arange(ano_inicial, ano_final + 2)
+        viradas = (anos - 1970).astype('datetime64[Y]').astype('datetime64[D]').astype(np.int64) - self.dia_inicial
+        viradas = np.clip(viradas, inicio, fim)
+        ocorrencias = self._total_por_dia[viradas[1:]] - self._total_por_dia[viradas[:-1]]
+        return anos[:-1][ocorrencias > 0]
+
+    def anos(self, linhas=None):
+        """Anos com ocorrências entre as 'linhas' (None para todas)."""
+        dias = self.dias if linhas is None else self.dias[linhas]
+        dias = np.unique(dias[dias != DIA_AUSENTE])
+        return np.unique(dias.astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970)
+
+
+class AvaliadorIncremental:
+    """
+    Calcula as seleções de um IndiceFiltros para uma sessão, lembrando a
+    máscara de cada dimensão do último estado calculado: um estado novo só
+    recalcula as dimensões que mudaram e combina as máscaras guardadas.
+    Estados com uma dimensão seletiva seguem pelas listas de linhas, como
+    no índice. Guarda até um bit por linha para cada dimensão filtrada.
+    """
+
+    def __init__(self, indice):
+        self.indice = indice
+        self._mascaras = {}
+        # Dimensões recalculadas no último estado calculado (para diagnóstico e benchmarks)
+        self.recalculadas = 0
+
+    def calcular(self, restricoes):
+        """Posições das linhas que atendem às 'restricoes', ou None se todas atenderem."""
+        indice = self.indice
+        if len(restricoes) <= 1 or min(r.contagem for r in restricoes) <= indice.total * FRACAO_SELETIVA:
+            self.recalculadas = len(restricoes)
+            return indice._calcular(restricoes)
+
+        self.recalculadas = 0
+        combinada = None
+        for restricao in restricoes:
+            dimensao = restricao.chave[0]
+            guardada = self._mascaras.get(dimensao)
+            if guardada is None or guardada[0] != restricao.chave:
+                mascara = np.ones(indice.total, dtype=bool)
+                restricao.aplicar(mascara)
+                guardada = (restricao.chave, np.packbits(mascara))
+                self._mascaras[dimensao] = guardada
+                self.recalculadas += 1
+            combinada = guardada[1].copy() if combinada is None else np.bitwise_and(combinada, guardada[1],
+                                                                                    out=combinada)
+        return np.flatnonzero(np.unpackbits(combinada, count=indice.total))
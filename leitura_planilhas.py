@@ -0,0 +1,162 @@
+import hashlib
+import os
+import unicodedata
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas.io.parsers import TextParser
+
+from utils import calcular_hash_arquivo
+
+# O leitor 'calamine' (Rust) é muito mais rápido que o openpyxl, mas é uma
+# dependência opcional. Sem ele, usamos o openpyxl em modo somente leitura.
+try:
+    import python_calamine  # noqa: F401
+    CALAMINE_DISPONIVEL = True
+except ImportError:
+    CALAMINE_DISPONIVEL = False
+
+DIRETORIO_CACHE = 'data/cache'
+
+# Memo de hashes por (caminho, mtime, tamanho), para não reler o arquivo inteiro
+# quando a mesma planilha é consultada mais de uma vez no processo
+_hashes_planilhas = {}
+
+
+def normalizar_coluna(nome):
+    """
+    Padroniza o nome de uma coluna da planilha (minúsculas, sem acentos e com
+    '_' no lugar de espaços) para comparação com a lista de colunas desejadas.
+    """
+    texto = str(nome).strip().lower()
+    texto = ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
+    return texto.replace(' ', '_')
+
+
+def _hash_planilha(caminho):
+    """Retorna o SHA-256 da planilha, reaproveitando o valor se ela não mudou."""
+    stat = os.stat(caminho)
+    chave = (os.path.abspath(caminho), stat.st_mtime_ns, stat.st_size)
+    if chave not in _hashes_planilhas:
+        _hashes_planilhas[chave] = calcular_hash_arquivo(caminho)
+    return _hashes_planilhas[chave]
+
+
+def _converter_celula(valor):
+    """Converte o valor de uma célula da mesma forma que o leitor openpyxl do pandas."""
+    if valor is None:
+        return ""
+    if isinstance(valor, float):
+        inteiro = int(valor)
+        if inteiro == valor:
+            return inteiro
+    return valor
+
+
+def _ler_openpyxl_streaming(caminho, selecionar):
+    """
+    Lê a primeira aba da planilha linha a linha em modo somente leitura,
+    guardando apenas as colunas aceitas por 'selecionar'. A inferência de
+    tipos é feita pelo mesmo TextParser usado por pd.read_excel.
+    """
+    import openpyxl
+
+    wb = openpyxl.load_workbook(caminho, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.worksheets[0]
+        ws.reset_dimensions()
+        linhas = ws.iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return pd.DataFrame()
+        indices = [i for i, nome in enumerate(cabecalho)
+                   if nome is not None and (selecionar is None or selecionar(nome))]
+
+        dados = [[_converter_celula(cabecalho[i]) for i in indices]]
+        ultima_linha_com_dados = 0
+        for linha in linhas:
+            if any(valor is not None and valor != "" for valor in linha):
+                ultima_linha_com_dados = len(dados)
+            dados.append([_converter_celula(linha[i]) if i < len(linha) else "" for i in indices])
+    finally:
+        wb.close()
+
+    # Remove as linhas vazias do final, como faz o leitor do pandas
+    dados = dados[:ultima_linha_com_dados + 1]
+    return TextParser(dados, header=0).read()
+
+
+def _ler_excel(caminho, selecionar):
+    """Lê a planilha com o leitor mais rápido disponível."""
+    if CALAMINE_DISPONIVEL:
+        return pd.read_excel(caminho, engine='calamine', usecols=selecionar)
+    return _ler_openpyxl_streaming(caminho, selecionar)
+
+
+def _para_tabela_cache(df):
+    """
+    Converte a planilha bruta em tabela Arrow. Colunas com tipos misturados
+    (ex.: idades numéricas e 'NI' na mesma coluna) são gravadas como texto,
+    preservando os valores ausentes.
+    """
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _de_tabela_cache(tabela):
+    """Lê a tabela do cache, devolvendo NaN (e não None) em colunas de texto."""
+    df = tabela.to_pandas()
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+def ler_planilha(caminho, colunas=None, diretorio_cache=DIRETORIO_CACHE):
+    """
+    Lê a primeira aba de uma planilha Excel, materializando apenas as
+    'colunas' informadas (comparadas após normalizar_coluna; None lê todas).
+
+    A planilha bruta é guardada em Parquet no 'diretorio_cache', com o hash do
+    arquivo no nome, de modo que uma nova execução sobre o mesmo arquivo não
+    precisa interpretar o Excel de novo. Use diretorio_cache=None para
+    desativar o cache.
+    """
+    selecionar = None
+    chave_colunas = 'todas'
+    if colunas is not None:
+        desejadas = {normalizar_coluna(c) for c in colunas}
+        selecionar = lambda nome: normalizar_coluna(nome) in desejadas  # noqa: E731
+        chave_colunas = hashlib.sha256(','.join(sorted(desejadas)).encode('utf-8')).hexdigest()[:8]
+
+    if diretorio_cache is None:
+        return _ler_excel(caminho, selecionar)
+
+    base = os.path.splitext(os.path.basename(caminho))[0]
+    prefixo = f"{base}-"
+    nome_cache = f"{prefixo}{_hash_planilha(caminho)[:16]}-{chave_colunas}.parquet"
+    caminho_cache = os.path.join(diretorio_cache, nome_cache)
+
+    if os.path.exists(caminho_cache):
+        return _de_tabela_cache(pq.read_table(caminho_cache))
+
+    df = _ler_excel(caminho, selecionar)
+    try:
+        os.makedirs(diretorio_cache, exist_ok=True)
+        caminho_tmp = caminho_cache + '.tmp'
+        pq.write_table(_para_tabela_cache(df), caminho_tmp)
+        os.replace(caminho_tmp, caminho_cache)
+        # Remove cópias antigas da mesma planilha com a mesma seleção de colunas
+        for arquivo in os.listdir(diretorio_cache):
+            if (arquivo.startswith(prefixo) and arquivo.endswith(f"-{chave_colunas}.parquet")
+                    and arquivo != nome_cache and arquivo[len(prefixo):].count('-') == 1):
+                os.remove(os.path.join(diretorio_cache, arquivo))
+    except Exception as e:
+        print(f"Aviso: não foi possível gravar o cache de '{caminho}': {e}")
+    return df
@@ -0,0 +1,205 @@
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# --- MEMÓRIA DAS SESSÕES ---
+# O st.session_state de cada sessão guarda referências aos dados
+# compartilhados do processo (as colunas de data_loader.obter_dataset, a
+# malha, o cubo), que não custam memória à sessão, e valores que são só dela,
+# como as ocorrências filtradas. Este módulo estima os bytes de cada chave e
+# aplica um orçamento à memória própria de cada sessão: ao fim de cada
+# execução, os DataFrames filtrados que não couberem saem da sessão, e só
+# ficam as suas SelecaoLinhas (em CHAVE_SELECOES), que têm apenas as
+# posições das linhas nos dados compartilhados. As chaves dos DataFrames
+# filtrados nunca guardam outro tipo: enquanto a aba é renderizada, elas têm
+# sempre o DataFrame montado.
+
+VARIAVEL_ORCAMENTO = 'OVM_ORCAMENTO_SESSAO_MB'
+ORCAMENTO_PADRAO_MB = 64
+
+# Chave da sessão com as SelecaoLinhas das ocorrências filtradas, por chave do DataFrame filtrado
+CHAVE_SELECOES = 'selecoes_filtradas'
+
+# Sessões sem execuções há mais tempo que isto saem do registro do processo
+SESSAO_INATIVA_S = 30 * 60
+
+
+def orcamento_configurado():
+    """Orçamento, em bytes, da memória própria de cada sessão (OVM_ORCAMENTO_SESSAO_MB)."""
+    valor = os.environ.get(VARIAVEL_ORCAMENTO)
+    return int(float(ORCAMENTO_PADRAO_MB if valor is None else valor) * 1024 ** 2)
+
+
+class SelecaoLinhas:
+    """
+    Linhas de um DataFrame compartilhado, guardadas só pelas posições (None
+    para todas). As posições podem ser adiadas: com 'calcular' (função que
+    as devolve), só são calculadas no primeiro uso. O DataFrame é montado
+    por carregar() e mantido até descartar().
+    """
+
+    def __init__(self, df_base, linhas=None, calcular=None):
+        self.df_base = df_base
+        self._linhas = linhas
+        self._calcular = calcular
+        self._df = None
+
+    @property
+    def linhas(self):
+        if self._calcular is not None:
+            self._linhas = self._calcular()
+            self._calcular = None
+        return self._linhas
+
+    @property
+    def calculada(self):
+        """Se as posições já foram calculadas (ou não eram adiadas)."""
+        return self._calcular is None
+
+    def __len__(self):
+        return len(self.df_base) if self.linhas is None else len(self.linhas)
+
+    @property
+    def bytes_posicoes(self):
+        """Bytes das posições guardadas (0 para todas as linhas ou se ainda não calculadas)."""
+        return 0 if self._linhas is None else self._linhas.nbytes
+
+    @property
+    def bytes(self):
+        """Bytes próprios da seleção: as posições e, se montado, o DataFrame."""
+        return self.bytes_posicoes + (0 if self._df is None else self.bytes_montado())
+
+    def bytes_montado(self):
+        """
+        Bytes estimados do DataFrame montado (uma seleção de todas as linhas
+        compartilha os dados; uma ainda não calculada não é calculada para isso).
+        """
+        if not self.calculada or self._linhas is None or len(self.df_base) == 0:
+            return 0
+        return tamanho(self.df_base) * len(self._linhas) // len(self.df_base)
+
+    def carregar(self):
+        """DataFrame das linhas selecionadas."""
+        if self._df is None:
+            # A cópia rasa de todas as linhas não duplica os dados, que são somente leitura
+            self._df = self.df_base.copy(deep=False) if self.linhas is None else self.df_base.take(self.linhas)
+        return self._df
+
+    def descartar(self):
+        """Libera o DataFrame montado; as posições continuam guardadas."""
+        self._df = None
+
+
+def ocorrencias_filtradas(chave):
+    """
+    DataFrame das ocorrências filtradas da sessão em 'chave'
+    ('df_geral_filtrado' ou 'df_feminicidio_filtrado'). Se a aba não o
+    recebeu montado, a seleção é calculada e montada neste primeiro pedido.
+    """
+    if chave in st.session_state:
+        return st.session_state[chave]
+    return st.session_state[CHAVE_SELECOES][chave].carregar()
+
+
+def tamanho(valor):
+    """
+    Bytes estimados de um valor: os dados dos DataFrames, Series e arrays
+    (colunas object contam só os ponteiros) ou sys.getsizeof dos demais.
+    """
+    if isinstance(valor, SelecaoLinhas):
+        return valor.bytes
+    if isinstance(valor, dict) and valor and all(isinstance(v, SelecaoLinhas) for v in valor.values()):
+        # As seleções de CHAVE_SELECOES: os DataFrames montados contam nas suas próprias chaves
+        return sys.getsizeof(valor) + sum(selecao.bytes_posicoes for selecao in valor.values())
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(index=True, deep=False).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(index=True, deep=False))
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes
+    return sys.getsizeof(valor)
+
+
+def relatorio(estado, compartilhadas=()):
+    """
+    Bytes de cada chave do 'estado' da sessão, das maiores para as menores,
+    indicando as que apontam para dados 'compartilhadas' pelo processo.
+    """
+    linhas = [{'chave': chave, 'tipo': type(valor).__name__, 'bytes': tamanho(valor),
+               'compartilhado': chave in compartilhadas} for chave, valor in estado.items()]
+    df = pd.DataFrame(linhas, columns=['chave', 'tipo', 'bytes', 'compartilhado'])
+    return df.sort_values('bytes', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def memoria_propria(estado, compartilhadas=()):
+    """Bytes estimados dos valores que são só da sessão."""
+    return sum(tamanho(valor) for chave, valor in estado.items() if chave not in compartilhadas)
+
+
+def aplicar_orcamento(estado, selecoes, compartilhadas=(), orcamento=None):
+    """
+    Mantém a memória própria da sessão dentro do 'orcamento' (em bytes; por
+    padrão, orcamento_configurado()). 'selecoes' associa chaves do 'estado'
+    às SelecaoLinhas de onde vieram os seus DataFrames: os que couberem no
+    que sobra do orçamento continuam no 'estado', dos menores para os
+    maiores; os demais saem dele, e a SelecaoLinhas (guardada pelo chamador)
+    descarta o DataFrame montado, que a próxima execução monta de novo. Os
+    DataFrames que não copiam dados (todas as linhas ou nenhuma) e as
+    seleções ainda não calculadas sempre saem, pois remontá-los não custa
+    nada. As seleções sem chave no 'estado', montadas sob demanda, são
+    sempre descartadas. Retorna as chaves retiradas do 'estado'.
+    """
+    orcamento = orcamento_configurado() if orcamento is None else orcamento
+    disponivel = orcamento - memoria_propria(
+        {chave: valor for chave, valor in estado.items() if chave not in selecoes}, compartilhadas)
+
+    retiradas = []
+    for chave, selecao in sorted(selecoes.items(), key=lambda item: item[1].bytes_montado()):
+        if chave not in estado:
+            # Montada sob demanda (ocorrencias_filtradas), fora do estado
+            selecao.descartar()
+            continue
+        custo = selecao.bytes_montado()
+        if 0 < custo <= disponivel:
+            disponivel -= custo
+        else:
+            selecao.descartar()
+            del estado[chave]
+            retiradas.append(chave)
+    return retiradas
+
+
+# --- REGISTRO DAS SESSÕES DO PROCESSO ---
+
+@st.cache_resource
+def _registro_sessoes():
+    return {'trava': threading.Lock(), 'sessoes': {}}
+
+
+def registrar_sessao(bytes_proprios):
+    """
+    Registra a memória da sessão atual no registro do processo e retorna o
+    resumo de todas as sessões ativas (execução nos últimos SESSAO_INATIVA_S
+    segundos): número de sessões, soma da memória própria e a maior delas.
+    """
+    contexto = get_script_run_ctx()
+    registro = _registro_sessoes()
+    agora = time.monotonic()
+    with registro['trava']:
+        sessoes = registro['sessoes']
+        if contexto is not None:
+            sessoes[contexto.session_id] = (bytes_proprios, agora)
+        for id_sessao in [s for s, (_, visto) in sessoes.items() if agora - visto > SESSAO_INATIVA_S]:
+            del sessoes[id_sessao]
+        proprios = [b for b, _ in sessoes.values()]
+    return {
+        'sessoes': len(proprios),
+        'bytes_proprios': sum(proprios),
+        'maior_sessao': max(proprios, default=0),
+    }
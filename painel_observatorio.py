@@ -1,13 +1,36 @@
-import pandas as pd
+import os
+
 import streamlit as st
 import streamlit.components.v1 as components
-from data_loader import carregar_dados_processados
+from data_loader import (FILTRADOS_POR_ABA, _armazem_colunas, _ler_geojson, dados_da_aba, diretorio_processado,
+                         obter_cache_selecoes, obter_dataset, obter_geojson, obter_indice, obter_localidades,
+                         obter_tabela_sql)
+import consultas
+import filtros
+import memoria_sessao
+import tempos_execucao
+from versoes import caminho_versao, versao_atual
 from tabs import analise_geral
 from tabs import analise_feminicidios
 from tabs import download
 from tabs import glossario
 import header  # Importa o módulo do cabeçalho
 
+# Os DataFrames compartilhados entre as sessões (df_geral, df_feminicidio,
+# df_populacao, df_regioes, df_calendario, cubo_ocorrencias e os filtrados
+# que selecionam todas as linhas) têm as colunas somente leitura (ver
+# data_loader.somente_leitura). As abas podem criar ou substituir colunas;
+# para alterar valores no lugar, devem antes fazer uma cópia (df.copy()).
+
+# Tempo de servidor desta execução, registrado por tipo de interação (ver tempos_execucao.py)
+cronometro = tempos_execucao.Cronometro()
+
+# O conteúdo da aba ativa roda num fragmento: os widgets da aba reexecutam só
+# ele, e as execuções que não mudam os filtros (como a troca de aba) reusam as
+# linhas já selecionadas. Com OVM_EXECUCAO_PARCIAL=0, tudo volta a rodar a
+# cada execução do script, para comparar os tempos por interação.
+EXECUCAO_PARCIAL = os.environ.get('OVM_EXECUCAO_PARCIAL', '1') != '0'
+
 # --- FUNÇÃO PARA CARREGAR O CSS EXTERNO ---
 def carregar_css(caminho_arquivo):
     """Lê um arquivo CSS e o retorna formatado para injeção no Streamlit."""
@@ -33,21 +56,6 @@ css_personalizado = carregar_css("style.css")
 st.markdown(css_personalizado, unsafe_allow_html=True)
 
 
-# --- CARREGAMENTO DOS DADOS ---
-dfs, geojson_data = carregar_dados_processados()
-
-if dfs is not None and geojson_data is not None:
-    st.session_state.df_geral = dfs.get('geral', pd.DataFrame())
-    st.session_state.df_feminicidio = dfs.get('feminicidio', pd.DataFrame())
-    st.session_state.df_populacao = dfs.get('populacao', pd.DataFrame())
-    st.session_state.df_regioes = dfs.get('regioes', pd.DataFrame())
-    st.session_state.df_calendario = dfs.get('calendario', pd.DataFrame())
-    st.session_state.geojson_sc = geojson_data
-else:
-    st.error("🚨 Falha no carregamento dos dados processados.")
-    st.warning("Execute o script 'preprocess_data.py' para gerar os arquivos de dados necessários.")
-    st.stop()
-
 # --- INICIALIZAÇÃO DE ESTADO ---
 if 'active_tab' not in st.session_state:
     st.session_state.active_tab = "Análise Geral"
@@ -71,6 +79,113 @@ if tab_param and tab_param in tab_mapping:
         st.session_state.active_tab = nova_aba
         st.rerun()
 
+# --- CARREGAMENTO DOS DADOS ---
+# Só os conjuntos e colunas usados pela aba ativa são lidos; cada coluna é
+# lida do disco uma vez por processo e compartilhada entre as sessões.
+# A versão publicada dos dados é resolvida uma vez por execução: se o
+# pré-processamento publicar uma versão nova, a próxima execução já a usa.
+DIRETORIO_PROCESSADO = diretorio_processado()
+CHAVES_SESSAO = {
+    'geral': 'df_geral',
+    'feminicidio': 'df_feminicidio',
+    'populacao': 'df_populacao',
+    'regioes': 'df_regioes',
+    'calendario': 'df_calendario',
+    'cubo_ocorrencias': 'cubo_ocorrencias',
+}
+
+versao_dados = versao_atual(DIRETORIO_PROCESSADO)
+diretorio_dados = DIRETORIO_PROCESSADO if versao_dados is None else caminho_versao(DIRETORIO_PROCESSADO, versao_dados)
+if st.session_state.get('versao_dados', versao_dados) != versao_dados:
+    st.toast("🔄 Os dados do painel foram atualizados.")
+st.session_state.versao_dados = versao_dados
+
+try:
+    dados_necessarios = dados_da_aba(st.session_state.active_tab, diretorio_dados)
+    for nome, colunas in dados_necessarios.items():
+        if nome == 'geojson_sc':
+            st.session_state.geojson_sc = obter_geojson(diretorio_dados)
+        else:
+            st.session_state[CHAVES_SESSAO[nome]] = obter_dataset(nome, colunas, diretorio_dados)
+except Exception:
+    # Não guarda a falha no cache compartilhado: a próxima execução tenta de novo
+    _armazem_colunas.clear()
+    _ler_geojson.clear()
+    st.error("🚨 Falha no carregamento dos dados processados.")
+    st.warning("Execute o script 'preprocess_data.py' para gerar os arquivos de dados necessários.")
+    st.stop()
+
+# Motor de consultas (pandas ou DuckDB, conforme OVM_BACKEND_CONSULTAS).
+# No pandas, fica sobre os dados desta execução, é recriado quando a versão
+# dos dados ou a aba mudam e os filtros são respondidos pelos índices
+# compartilhados do processo. No DuckDB, consulta as tabelas compartilhadas
+# do processo (obter_tabela_sql), as mesmas em todas as abas, e só é
+# recriado quando a versão muda
+backend_consultas = consultas.backend_configurado()
+chave_consultas = (versao_dados, None if backend_consultas == 'duckdb' else tuple(dados_necessarios),
+                   backend_consultas)
+if st.session_state.get('chave_consultas') != chave_consultas:
+    if backend_consultas == 'duckdb':
+        st.session_state.consultas = consultas.criar_consultas(
+            {'populacao': obter_dataset('populacao', None, diretorio_dados)},
+            cubo=obter_dataset('cubo_ocorrencias', None, diretorio_dados),
+            backend=backend_consultas,
+            tabelas_sql={nome: obter_tabela_sql(nome, diretorio_dados) for nome in ('geral', 'feminicidio')},
+        )
+    else:
+        st.session_state.consultas = consultas.criar_consultas(
+            {nome: st.session_state[CHAVES_SESSAO[nome]] for nome in ('geral', 'feminicidio', 'populacao')
+             if nome in dados_necessarios},
+            cubo=st.session_state.get('cubo_ocorrencias') if 'cubo_ocorrencias' in dados_necessarios else None,
+            backend=backend_consultas,
+            indices={nome: obter_indice(nome, diretorio_dados) for nome in ('geral', 'feminicidio')
+                     if nome in dados_necessarios},
+        )
+    st.session_state.chave_consultas = chave_consultas
+motor_consultas = st.session_state.consultas
+
+# --- CONTEÚDO DAS ABAS ---
+RENDERIZADORES = {
+    "Análise Geral": analise_geral.render,
+    "Análise de Feminicídios": analise_feminicidios.render,
+    "Metodologia e Glossário": glossario.render,
+    "Download de Dados": download.render,
+}
+
+# Chaves da sessão com as ocorrências filtradas de cada conjunto. Contrato
+# com as abas: enquanto a aba é renderizada, a chave de cada conjunto de
+# FILTRADOS_POR_ABA tem sempre um pandas.DataFrame; fora disso (entre as
+# execuções ou para os demais conjuntos) ela pode não existir, e as
+# ocorrências filtradas são lidas com memoria_sessao.ocorrencias_filtradas.
+CHAVES_FILTRADAS = {'geral': 'df_geral_filtrado', 'feminicidio': 'df_feminicidio_filtrado'}
+
+# Dados compartilhados pelo processo não contam no orçamento de memória da sessão
+CHAVES_COMPARTILHADAS = set(CHAVES_SESSAO.values()) | {'geojson_sc', 'consultas'}
+
+
+def _renderizar_aba(aba, selecoes):
+    """
+    Renderiza a aba 'aba' sobre as ocorrências filtradas de 'selecoes'
+    (chave da sessão -> memoria_sessao.SelecaoLinhas) e, ao fim, aplica o
+    orçamento de memória da sessão. Num fragmento, os widgets da aba
+    reexecutam só esta função, com as mesmas seleções.
+    """
+    cronometro_aba = tempos_execucao.Cronometro()
+    # Monta os DataFrames filtrados que a aba lê (inclusive os que o orçamento
+    # de memória tenha descartado); os demais continuam como seleções adiadas,
+    # filtradas só se a aba as pedir com memoria_sessao.ocorrencias_filtradas
+    for nome in FILTRADOS_POR_ABA.get(aba, []):
+        chave = CHAVES_FILTRADAS[nome]
+        if chave in selecoes:
+            st.session_state[chave] = selecoes[chave].carregar()
+    RENDERIZADORES[aba]()
+    memoria_sessao.aplicar_orcamento(st.session_state, selecoes, CHAVES_COMPARTILHADAS)
+    cronometro_aba.registrar(
+        'widget da aba (fragmento)' if tempos_execucao.reexecucao_de_fragmento() else 'conteúdo da aba')
+
+
+renderizar_aba = st.fragment(_renderizar_aba) if EXECUCAO_PARCIAL else _renderizar_aba
+
 # --- SIDEBAR E FILTROS ---
 st.sidebar.image("logo_ovm.jpeg", use_container_width=True)
 
@@ -88,129 +203,128 @@ if not st.session_state.df_geral.empty:
             help="Escolha como os dados devem ser agrupados nos gráficos e tabelas."
         )
 
-        # --- PERÍODO ---
-        st.subheader("📅 PERÍODO")
-        min_date = st.session_state.df_geral['data_fato'].min().date()
-        max_date = st.session_state.df_geral['data_fato'].max().date()
-
-        st.session_state.data_inicial = st.date_input(
-            "Data Inicial",
-            value=min_date, # Mantendo valor inicial padrão
-            min_value=min_date,
-            max_value=max_date,
-            help="Selecione a data de início do período.",
-            format="DD/MM/YYYY"
-        )
+        # --- FORMULÁRIO DOS FILTROS ---
+        # Os filtros só são aplicados ao clicar em "Aplicar filtros": editar
+        # vários deles custa uma só execução do painel, e não uma por widget
+        with st.form("filtros_barra_lateral", border=False):
+            # --- PERÍODO ---
+            st.subheader("📅 PERÍODO")
+            min_date = st.session_state.df_geral['data_fato'].min().date()
+            max_date = st.session_state.df_geral['data_fato'].max().date()
+
+            st.session_state.data_inicial = st.date_input(
+                "Data Inicial",
+                value=min_date, # Mantendo valor inicial padrão
+                min_value=min_date,
+                max_value=max_date,
+                help="Selecione a data de início do período.",
+                format="DD/MM/YYYY"
+            )
 
-        st.session_state.data_final = st.date_input(
-            "Data Final",
-            value=max_date,
-            min_value=st.session_state.data_inicial,
-            max_value=max_date,
-            help="Selecione a data de fim do período.",
-            format="DD/MM/YYYY"
-        )
+            st.session_state.data_final = st.date_input(
+                "Data Final",
+                value=max_date,
+                min_value=st.session_state.data_inicial,
+                max_value=max_date,
+                help="Selecione a data de fim do período.",
+                format="DD/MM/YYYY"
+            )
 
-        # DataFrame filtrado apenas por data para popular as opções dos outros filtros
-        df_geral_filtrado_por_data = st.session_state.df_geral[
-            (st.session_state.df_geral['data_fato'].dt.date >= st.session_state.data_inicial) &
-            (st.session_state.df_geral['data_fato'].dt.date <= st.session_state.data_final)
-        ]
+            # DataFrame filtrado apenas por data para popular as opções dos outros filtros
+            opcoes = motor_consultas.opcoes_disponiveis(st.session_state.data_inicial, st.session_state.data_final)
         
-        # --- LOCALIZAÇÃO ---
-        st.subheader("📍 LOCALIZAÇÃO")
+            # --- LOCALIZAÇÃO ---
+            st.subheader("📍 LOCALIZAÇÃO")
         
-        # Filtro de Município
-        municipios_disponiveis = sorted(df_geral_filtrado_por_data['municipio'].dropna().unique())
-        todos_municipios = st.checkbox("Todos os municípios", value=True, help="Marque para selecionar todos")
+            # Filtro de Município
+            municipios_disponiveis = opcoes['municipios']
+            todos_municipios = st.checkbox("Todos os municípios", value=True, help="Marque para selecionar todos")
 
-        if todos_municipios:
-            municipio_selecionado = municipios_disponiveis
-        else:
-            municipio_selecionado = st.multiselect(
+            # No formulário, a lista aparece sempre: desmarcar a caixa só tem efeito ao aplicar
+            municipios_especificos = st.multiselect(
                 "Município(s) específico(s)",
                 options=municipios_disponiveis,
-                default=[]
+                default=[],
+                help="Usados quando 'Todos os municípios' está desmarcado."
             )
-            if not municipio_selecionado:
-                st.warning("Nenhum município selecionado. Exibindo dados de todos os municípios.")
+            if todos_municipios:
                 municipio_selecionado = municipios_disponiveis
+            else:
+                municipio_selecionado = municipios_especificos
+                if not municipio_selecionado:
+                    st.warning("Nenhum município selecionado. Exibindo dados de todos os municípios.")
+                    municipio_selecionado = municipios_disponiveis
+
+            # Filtro de Mesorregião
+            mesoregioes_disponiveis = opcoes['mesoregioes']
+            mesoregiao_selecionado = st.multiselect(
+                "Mesorregião(ões)",
+                options=mesoregioes_disponiveis,
+                default=mesoregioes_disponiveis,
+                help="Filtre por mesorregião de Santa Catarina"
+            )
 
-        # Filtro de Mesorregião
-        mesoregioes_disponiveis = sorted([m for m in df_geral_filtrado_por_data['mesoregiao'].unique() if m != 'Não informado'])
-        mesoregiao_selecionado = st.multiselect(
-            "Mesorregião(ões)",
-            options=mesoregioes_disponiveis,
-            default=mesoregioes_disponiveis,
-            help="Filtre por mesorregião de Santa Catarina"
-        )
-
-        # Filtro de Associação
-        associacoes_disponiveis = sorted([a for a in df_geral_filtrado_por_data['associacao'].dropna().unique() if a != 'Não informado'])
-        associacao_selecionado = st.multiselect(
-            "Associação(ões)",
-            options=associacoes_disponiveis,
-            default=associacoes_disponiveis,
-            help="Filtre por associação de municípios"
-        )
+            # Filtro de Associação
+            associacoes_disponiveis = opcoes['associacoes']
+            associacao_selecionado = st.multiselect(
+                "Associação(ões)",
+                options=associacoes_disponiveis,
+                default=associacoes_disponiveis,
+                help="Filtre por associação de municípios"
+            )
         
-        # --- TIPO DE CRIME ---
-        st.subheader("🚨 TIPO DE CRIME")
-        fatos_disponiveis = sorted(df_geral_filtrado_por_data['fato_comunicado'].unique())
-        todos_crimes = st.checkbox("Todos os tipos", value=True, help="Marque para incluir todos os crimes")
+            # --- TIPO DE CRIME ---
+            st.subheader("🚨 TIPO DE CRIME")
+            fatos_disponiveis = opcoes['fatos']
+            todos_crimes = st.checkbox("Todos os tipos", value=True, help="Marque para incluir todos os crimes")
 
-        if todos_crimes:
-            fato_selecionado = fatos_disponiveis
-        else:
-            fato_selecionado = st.multiselect(
+            tipos_especificos = st.multiselect(
                 "Tipo(s) de crime",
                 options=fatos_disponiveis,
-                default=[]
+                default=[],
+                help="Usados quando 'Todos os tipos' está desmarcado."
             )
-            if not fato_selecionado:
-                st.warning("Nenhum tipo de crime selecionado. Exibindo todos os tipos.")
+            if todos_crimes:
                 fato_selecionado = fatos_disponiveis
+            else:
+                fato_selecionado = tipos_especificos
+                if not fato_selecionado:
+                    st.warning("Nenhum tipo de crime selecionado. Exibindo todos os tipos.")
+                    fato_selecionado = fatos_disponiveis
+
+            # --- PERFIL DA VÍTIMA ---
+            st.subheader("👥 PERFIL DA VÍTIMA")
+            idade_selecionada = st.slider(
+                "Faixa Etária",
+                min_value=0,
+                max_value=100,
+                value=(0, 100),
+                help="Ajuste o intervalo de idade das vítimas. Se o valor máximo for 100, incluirá todas as idades acima."
+            )
+            idade_max_texto = "100+ anos" if idade_selecionada[1] == 100 else f"{idade_selecionada[1]} anos"
+            st.caption(f"Idades: {idade_selecionada[0]} a {idade_max_texto}")
 
-        # --- PERFIL DA VÍTIMA ---
-        st.subheader("👥 PERFIL DA VÍTIMA")
-        idade_selecionada = st.slider(
-            "Faixa Etária",
-            min_value=0,
-            max_value=100,
-            value=(0, 100),
-            help="Ajuste o intervalo de idade das vítimas. Se o valor máximo for 100, incluirá todas as idades acima."
-        )
-        idade_max_texto = "100+ anos" if idade_selecionada[1] == 100 else f"{idade_selecionada[1]} anos"
-        st.caption(f"Idades: {idade_selecionada[0]} a {idade_max_texto}")
-
-        # --- CÁLCULOS PARA FILTROS POPULACIONAIS ---
-        crimes_por_municipio_para_filtro = df_geral_filtrado_por_data['municipio_normalizado'].value_counts().reset_index()
-        crimes_por_municipio_para_filtro.columns = ['municipio_normalizado', 'total_fatos']
+            # --- CÁLCULOS PARA FILTROS POPULACIONAIS ---
+            df_populacional_metrics = motor_consultas.metricas_populacionais(
+                st.session_state.data_inicial, st.session_state.data_final
+            )
 
-        df_populacional_metrics = pd.merge(st.session_state.df_populacao.copy(), crimes_por_municipio_para_filtro, on='municipio_normalizado', how='left')
-        df_populacional_metrics['total_fatos'] = df_populacional_metrics['total_fatos'].fillna(0)
+            # --- FILTROS POPULACIONAIS ---
+            st.subheader("📊 FILTROS POPULACIONAIS")
         
-        anos_no_filtro = df_geral_filtrado_por_data['ano'].unique()
-        num_anos = len(anos_no_filtro) if len(anos_no_filtro) > 0 else 1
-        
-        df_populacional_metrics['media_anual_fatos'] = df_populacional_metrics['total_fatos'] / num_anos
-        df_populacional_metrics['taxa_por_mil_mulheres'] = ((df_populacional_metrics['media_anual_fatos'] / df_populacional_metrics['populacao_feminina']) * 1000).fillna(0)
-        df_populacional_metrics['percentual_mulheres_vitimas'] = ((df_populacional_metrics['media_anual_fatos'] / df_populacional_metrics['populacao_feminina']) * 100).fillna(0)
+            min_pop, max_pop = int(st.session_state.df_populacao['populacao_feminina'].min()), int(st.session_state.df_populacao['populacao_feminina'].max())
+            pop_selecionada = st.slider("População Feminina", min_value=min_pop, max_value=max_pop, value=(min_pop, max_pop))
 
-        # --- FILTROS POPULACIONAIS ---
-        st.subheader("📊 FILTROS POPULACIONAIS")
-        
-        min_pop, max_pop = int(st.session_state.df_populacao['populacao_feminina'].min()), int(st.session_state.df_populacao['populacao_feminina'].max())
-        pop_selecionada = st.slider("População Feminina", min_value=min_pop, max_value=max_pop, value=(min_pop, max_pop))
+            min_media_fatos, max_media_fatos = float(df_populacional_metrics['media_anual_fatos'].min()), float(df_populacional_metrics['media_anual_fatos'].max())
+            media_fatos_selecionada = st.slider("Média Anual de Fatos", min_value=min_media_fatos, max_value=max_media_fatos, value=(min_media_fatos, max_media_fatos))
 
-        min_media_fatos, max_media_fatos = float(df_populacional_metrics['media_anual_fatos'].min()), float(df_populacional_metrics['media_anual_fatos'].max())
-        media_fatos_selecionada = st.slider("Média Anual de Fatos", min_value=min_media_fatos, max_value=max_media_fatos, value=(min_media_fatos, max_media_fatos))
+            min_taxa, max_taxa = float(df_populacional_metrics['taxa_por_mil_mulheres'].min()), float(df_populacional_metrics['taxa_por_mil_mulheres'].max())
+            taxa_selecionada = st.slider("Fatos por Mil Mulheres", min_value=min_taxa, max_value=max_taxa, value=(min_taxa, max_taxa))
 
-        min_taxa, max_taxa = float(df_populacional_metrics['taxa_por_mil_mulheres'].min()), float(df_populacional_metrics['taxa_por_mil_mulheres'].max())
-        taxa_selecionada = st.slider("Fatos por Mil Mulheres", min_value=min_taxa, max_value=max_taxa, value=(min_taxa, max_taxa))
+            min_perc, max_perc = float(df_populacional_metrics['percentual_mulheres_vitimas'].min()), float(df_populacional_metrics['percentual_mulheres_vitimas'].max())
+            perc_selecionado = st.slider("% de Mulheres Vítimas", min_value=min_perc, max_value=max_perc, value=(min_perc, max_perc))
 
-        min_perc, max_perc = float(df_populacional_metrics['percentual_mulheres_vitimas'].min()), float(df_populacional_metrics['percentual_mulheres_vitimas'].max())
-        perc_selecionado = st.slider("% de Mulheres Vítimas", min_value=min_perc, max_value=max_perc, value=(min_perc, max_perc))
+            st.form_submit_button("✅ Aplicar filtros", type="primary", use_container_width=True)
 
         st.sidebar.markdown("---")
         
@@ -253,52 +367,120 @@ if not st.session_state.df_geral.empty:
             st.rerun()
 
     # --- LÓGICA DE FILTRAGEM FINAL ATUALIZADA ---
-    idade_max_filtro = float('inf') if idade_selecionada[1] == 100 else idade_selecionada[1]
-
-    municipios_filtrados_populacao = df_populacional_metrics[
-        (df_populacional_metrics['populacao_feminina'] >= pop_selecionada[0]) &
-        (df_populacional_metrics['populacao_feminina'] <= pop_selecionada[1]) &
-        (df_populacional_metrics['media_anual_fatos'] >= media_fatos_selecionada[0]) &
-        (df_populacional_metrics['media_anual_fatos'] <= media_fatos_selecionada[1]) &
-        (df_populacional_metrics['taxa_por_mil_mulheres'] >= taxa_selecionada[0]) &
-        (df_populacional_metrics['taxa_por_mil_mulheres'] <= taxa_selecionada[1]) &
-        (df_populacional_metrics['percentual_mulheres_vitimas'] >= perc_selecionado[0]) &
-        (df_populacional_metrics['percentual_mulheres_vitimas'] <= perc_selecionado[1])
-    ]['municipio_normalizado']
-
-    st.session_state.df_geral_filtrado = st.session_state.df_geral[
-        (st.session_state.df_geral['data_fato'].dt.date >= st.session_state.data_inicial) &
-        (st.session_state.df_geral['data_fato'].dt.date <= st.session_state.data_final) &
-        (st.session_state.df_geral['fato_comunicado'].isin(fato_selecionado)) &
-        (st.session_state.df_geral['municipio'].isin(municipio_selecionado)) &
-        (st.session_state.df_geral['mesoregiao'].isin(mesoregiao_selecionado)) &
-        (st.session_state.df_geral['associacao'].isin(associacao_selecionado)) &
-        (st.session_state.df_geral['idade_vitima'].between(idade_selecionada[0], idade_max_filtro, inclusive='both')) &
-        (st.session_state.df_geral['municipio_normalizado'].isin(municipios_filtrados_populacao))
-    ].copy()
-
-    st.session_state.df_feminicidio_filtrado = st.session_state.df_feminicidio[
-        (st.session_state.df_feminicidio['data_fato'].dt.date >= st.session_state.data_inicial) &
-        (st.session_state.df_feminicidio['data_fato'].dt.date <= st.session_state.data_final) &
-        (st.session_state.df_feminicidio['municipio'].isin(municipio_selecionado)) &
-        (st.session_state.df_feminicidio['mesoregiao'].isin(mesoregiao_selecionado)) &
-        (st.session_state.df_feminicidio['associacao'].isin(associacao_selecionado)) &
-        (st.session_state.df_feminicidio['idade_vitima'].between(idade_selecionada[0], idade_max_filtro, inclusive='both')) &
-        (st.session_state.df_feminicidio['municipio_normalizado'].isin(municipios_filtrados_populacao))
-    ].copy()
+    municipios_filtrados_populacao = filtros.municipios_por_metricas(
+        df_populacional_metrics, pop_selecionada, media_fatos_selecionada, taxa_selecionada, perc_selecionado
+    )
+
+    # Filtros aplicados, no formato aceito por cubo_ocorrencias.contar_por, para
+    # que as abas agreguem com st.session_state.consultas.contar_por (pelo cubo
+    # pré-calculado, quando possível) em vez de agrupar as linhas filtradas
+    st.session_state.filtros_aplicados = {
+        'data_inicial': st.session_state.data_inicial,
+        'data_final': st.session_state.data_final,
+        'fatos': list(fato_selecionado),
+        'municipios': list(municipio_selecionado),
+        'mesoregioes': list(mesoregiao_selecionado),
+        'associacoes': list(associacao_selecionado),
+        'idade': (idade_selecionada[0], None if idade_selecionada[1] == 100 else idade_selecionada[1]),
+        'municipios_normalizados': list(municipios_filtrados_populacao),
+    }
+    # Municípios e mesorregiões que os filtros aplicados cobrem, mostrados no cabeçalho
+    st.session_state.localidades_filtradas = filtros.localidades_filtradas(
+        obter_localidades(diretorio_dados), st.session_state.filtros_aplicados)
+
+    # As seleções guardam só as posições das linhas, calculadas no primeiro
+    # uso: a aba só paga pela filtragem dos conjuntos que lê. Os DataFrames
+    # filtrados são montados para esta execução e, ao fim dela, só continuam
+    # na sessão se couberem no orçamento de memória (ver memoria_sessao.py);
+    # as seleções ficam só em memoria_sessao.CHAVE_SELECOES.
+    # Se os filtros e a versão dos dados não mudaram desde a última execução,
+    # as posições já calculadas são reusadas sobre os dados desta
+    chave_selecoes = (versao_dados, chave_consultas[2], st.session_state.filtros_aplicados)
+    selecoes_anteriores = {}
+    if EXECUCAO_PARCIAL and st.session_state.get('chave_selecoes') == chave_selecoes:
+        selecoes_anteriores = st.session_state.get(memoria_sessao.CHAVE_SELECOES, {})
+
+    argumentos_filtros = (
+        st.session_state.data_inicial, st.session_state.data_final,
+        municipio_selecionado, mesoregiao_selecionado, associacao_selecionado, idade_selecionada,
+        municipios_filtrados_populacao
+    )
+
+    def selecionar(nome, **kwargs):
+        df_base = st.session_state[CHAVES_SESSAO[nome]]
+        anterior = selecoes_anteriores.get(CHAVES_FILTRADAS[nome])
+        if anterior is not None and anterior.calculada:
+            return memoria_sessao.SelecaoLinhas(df_base, anterior.linhas)
+        return memoria_sessao.SelecaoLinhas(
+            df_base, calcular=lambda: motor_consultas.selecionar_ocorrencias(nome, *argumentos_filtros, **kwargs).linhas)
+
+    selecoes = {'df_geral_filtrado': selecionar('geral', fatos=fato_selecionado)}
+    if 'feminicidio' in dados_necessarios:
+        selecoes['df_feminicidio_filtrado'] = selecionar('feminicidio')
+    st.session_state[memoria_sessao.CHAVE_SELECOES] = selecoes
+    # Na sessão, ficam só os DataFrames filtrados que a aba lê, montados no
+    # fragmento da aba; os demais são pedidos com memoria_sessao.ocorrencias_filtradas
+    for nome, chave in CHAVES_FILTRADAS.items():
+        if nome not in FILTRADOS_POR_ABA.get(st.session_state.active_tab, []):
+            st.session_state.pop(chave, None)
+    st.session_state.chave_selecoes = chave_selecoes
 
     # Renderiza o header fixo via módulo externo
     header.render_custom_header()
 
     # --- RENDERIZAÇÃO DO CONTEÚDO (BASEADO NA ABA ATIVA) ---
-    if st.session_state.active_tab == "Análise Geral":
-        analise_geral.render()
-    elif st.session_state.active_tab == "Análise de Feminicídios":
-        analise_feminicidios.render()
-    elif st.session_state.active_tab == "Metodologia e Glossário":
-        glossario.render()
-    elif st.session_state.active_tab == "Download de Dados":
-        download.render()
+    renderizar_aba(st.session_state.active_tab, selecoes)
+
+    # --- MEMÓRIA DA SESSÃO ---
+    bytes_proprios = memoria_sessao.memoria_propria(st.session_state, CHAVES_COMPARTILHADAS)
+    resumo_sessoes = memoria_sessao.registrar_sessao(bytes_proprios)
+
+    # --- TEMPO DA EXECUÇÃO ---
+    # A execução é classificada pelo que mudou desde a anterior da sessão
+    estado_execucao = (st.session_state.active_tab, chave_selecoes, st.session_state.agrupamento_selecionado)
+    estado_anterior = st.session_state.get('estado_execucao')
+    if estado_anterior is None:
+        tipo_interacao = 'carga inicial'
+    elif estado_anterior[0] != estado_execucao[0]:
+        tipo_interacao = 'troca de aba'
+    elif estado_anterior[1] != estado_execucao[1]:
+        tipo_interacao = 'filtros'
+    elif estado_anterior[2] != estado_execucao[2]:
+        tipo_interacao = 'agrupamento'
+    else:
+        tipo_interacao = 'sem mudança nos filtros'
+    st.session_state.estado_execucao = estado_execucao
+    cronometro.registrar(tipo_interacao)
+
+    # Diagnóstico do cache de seleções dos filtros, da memória das sessões e
+    # dos tempos de execução (abrir o painel com ?diagnostico=1)
+    if st.query_params.get("diagnostico") == "1":
+        estatisticas = obter_cache_selecoes().estatisticas()
+        with st.sidebar.expander("🩺 Diagnóstico do cache de filtros", expanded=True):
+            col1, col2 = st.columns(2)
+            col1.metric("Taxa de acertos", f"{estatisticas['taxa_acertos']:.0%}")
+            col2.metric("Seleções guardadas", estatisticas['entradas'])
+            col1.metric("Acertos", estatisticas['acertos'])
+            col2.metric("Falhas", estatisticas['falhas'])
+            st.progress(min(estatisticas['bytes'] / max(estatisticas['limite_bytes'], 1), 1.0),
+                        text=f"{estatisticas['bytes'] / 1024 ** 2:.1f} de "
+                             f"{estatisticas['limite_bytes'] / 1024 ** 2:.0f} MiB")
+            st.caption(f"{estatisticas['descartes']} seleções descartadas para respeitar o limite.")
+
+        with st.sidebar.expander("🧠 Memória da sessão", expanded=True):
+            orcamento = memoria_sessao.orcamento_configurado()
+            st.progress(min(bytes_proprios / max(orcamento, 1), 1.0),
+                        text=f"{bytes_proprios / 1024 ** 2:.1f} de {orcamento / 1024 ** 2:.0f} MiB próprios")
+            col1, col2 = st.columns(2)
+            col1.metric("Sessões ativas", resumo_sessoes['sessoes'])
+            col2.metric("Memória das sessões", f"{resumo_sessoes['bytes_proprios'] / 1024 ** 2:.1f} MiB")
+            memoria_chaves = memoria_sessao.relatorio(st.session_state, CHAVES_COMPARTILHADAS)
+            memoria_chaves['MiB'] = (memoria_chaves.pop('bytes') / 1024 ** 2).round(2)
+            st.dataframe(memoria_chaves.head(10), hide_index=True, use_container_width=True)
+
+        with st.sidebar.expander("⏱️ Tempo por interação", expanded=True):
+            st.caption("Execução parcial (fragmento da aba) " + ("ligada." if EXECUCAO_PARCIAL else "desligada."))
+            st.dataframe(tempos_execucao.resumo().round(1), hide_index=True, use_container_width=True)
 
 else:
     st.error("🚨 Nenhum dado para exibir.")
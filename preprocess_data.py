@@ -1,11 +1,358 @@
 import pandas as pd
+import argparse
+import hashlib
 import json
 import os
-from utils import normalizar_nome
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from utils import normalizar_nome, normalizar_nomes, calcular_hash_arquivo
+from leitura_planilhas import ler_planilha
+from cubo_ocorrencias import construir_cubo, somar_cubos
+from vizinhanca import construir_vizinhanca
+from esquemas import (PARTICOES, anexar_segmento, filtro_periodo, ler_conjunto, salvar_dataset_particionado,
+                      salvar_parquet)
+from versoes import (VERSOES_MANTIDAS, copiar_arquivos, criar_versao, descartar_versao, diretorio_atual,
+                     publicar_versao, remover_versoes_antigas)
 import pyarrow as pa
 import pyarrow.parquet as pq
 
-def carregar_e_processar_dados():
+# Versão das regras de ETL. Incrementar sempre que a lógica de processamento
+# mudar, para forçar a reconstrução de todas as saídas no próximo run.
+VERSAO_ETL = 2
+ARQUIVO_MANIFESTO = 'manifest.json'
+
+# --- GRAFO DE ETAPAS ---
+# Cada conjunto processado declara os arquivos brutos que lê ('fontes') e os
+# conjuntos processados de que depende ('dependencias'). A ordem do dicionário
+# já é uma ordem topológica válida. Etapas 'intermediarias' não são gravadas:
+# existem apenas para que a leitura das planilhas grandes rode em paralelo.
+# Etapas com 'anexos' também recebem os registros dos extratos anexados.
+ETAPAS = {
+    'regioes': {'fontes': ['base_regioes_associacoes.xlsx'], 'dependencias': []},
+    'populacao': {'fontes': ['base_populacao.xlsx'], 'dependencias': []},
+    'calendario': {'fontes': ['base_calendario_feriados.xlsx'], 'dependencias': []},
+    'feminicidio': {'fontes': ['base_feminicidio.xlsx'], 'dependencias': ['regioes']},
+    'ocorrencias_gerais': {'fontes': ['base_geral.xlsx'], 'dependencias': ['regioes'], 'intermediaria': True,
+                           'anexos': True},
+    'geral': {'fontes': [], 'dependencias': ['ocorrencias_gerais', 'feminicidio']},
+    'cubo_ocorrencias': {'fontes': [], 'dependencias': ['geral']},
+    'geojson_sc': {'fontes': ['municipios_sc.json'], 'dependencias': []},
+    'vizinhos': {'fontes': [], 'dependencias': ['geojson_sc']},
+}
+
+# Saídas gravadas como JSON em vez de Parquet
+SAIDAS_JSON = {'geojson_sc', 'vizinhos'}
+
+# Registros dos extratos mensais anexados com --anexar, já padronizados e
+# ainda sem as regiões (um Parquet por extrato). Servem de fonte adicional da
+# base geral quando ela precisa ser reconstruída.
+DIRETORIO_ANEXOS = 'anexos_geral'
+
+# Colunas efetivamente usadas de cada planilha (nomes comparados sem acentos,
+# em minúsculas e com '_'). Só a base geral é projetada: as demais são
+# pequenas e todas as suas colunas seguem para o painel.
+COLUNAS_UTILIZADAS = {
+    'base_geral.xlsx': ['data_do_fato', 'municipio', 'fato_comunicado', 'idade'],
+}
+
+
+def calcular_id_registro(df):
+    """
+    Calcula uma chave estável para cada ocorrência: o hash da data, do
+    município normalizado, do fato e da idade da vítima, junto com a ordem da
+    linha entre as idênticas (vítimas do mesmo fato aparecem como linhas
+    iguais). Um mesmo registro recebe o mesmo id em qualquer extrato.
+    """
+    chave = pd.DataFrame({
+        'data_fato': pd.to_datetime(df['data_fato']).astype('int64'),
+        'municipio_normalizado': df['municipio_normalizado'].astype(str),
+        'fato_comunicado': df['fato_comunicado'].astype(str),
+        'idade_vitima': pd.to_numeric(df['idade_vitima'], errors='coerce').astype('float64').fillna(-1),
+    }, index=df.index)
+    chave['ordem'] = chave.groupby(list(chave.columns), sort=False).cumcount()
+    return pd.util.hash_pandas_object(chave, index=False).to_numpy().view('int64')
+
+
+def ler_fonte(diretorio_dados, fonte):
+    """
+    Lê uma planilha bruta pela camada de ingestão, que projeta apenas as
+    colunas utilizadas e mantém uma cópia em Parquet em '<dados>/cache'.
+    """
+    return ler_planilha(os.path.join(diretorio_dados, fonte), colunas=COLUNAS_UTILIZADAS.get(fonte),
+                        diretorio_cache=os.path.join(diretorio_dados, 'cache'))
+
+
+def processar_regioes(diretorio_dados):
+    """Lê e padroniza a base de regiões e associações de municípios."""
+    df_regioes = ler_fonte(diretorio_dados, 'base_regioes_associacoes.xlsx')
+    linhas = {'base_regioes_associacoes.xlsx': len(df_regioes)}
+    df_regioes.columns = (df_regioes.columns.str.strip().str.lower()
+                  .str.replace(' ', '_', regex=False)
+                  .str.replace('ã', 'a', regex=False)
+                  .str.replace('ç', 'c', regex=False)
+                  .str.replace('ô', 'o', regex=False)
+                  .str.replace('í', 'i', regex=False))
+    df_regioes['municipio_normalizado'] = normalizar_nomes(df_regioes['municipio'])
+    return df_regioes, linhas
+
+
+def processar_populacao(diretorio_dados):
+    """Lê e padroniza a base populacional por município."""
+    df_populacao = ler_fonte(diretorio_dados, 'base_populacao.xlsx')
+    linhas = {'base_populacao.xlsx': len(df_populacao)}
+    df_populacao.columns = (df_populacao.columns.str.strip().str.lower()
+                  .str.replace(' ', '_', regex=False)
+                  .str.replace('ã', 'a', regex=False)
+                  .str.replace('ç', 'c', regex=False)
+                  .str.replace('ô', 'o', regex=False)
+                  .str.replace('í', 'i', regex=False))
+    df_populacao['municipio_normalizado'] = normalizar_nomes(df_populacao['municipio'])
+    return df_populacao, linhas
+
+
+def processar_calendario(diretorio_dados):
+    """Lê a base de calendário e feriados."""
+    df_calendario = ler_fonte(diretorio_dados, 'base_calendario_feriados.xlsx')
+    linhas = {'base_calendario_feriados.xlsx': len(df_calendario)}
+    df_calendario['data'] = pd.to_datetime(df_calendario['data'])
+    return df_calendario, linhas
+
+
+def processar_feminicidio(diretorio_dados, df_regioes):
+    """Lê e limpa a base de feminicídios, enriquecendo-a com as regiões."""
+    df_feminicidio = ler_fonte(diretorio_dados, 'base_feminicidio.xlsx')
+    linhas = {'base_feminicidio.xlsx': len(df_feminicidio)}
+    return padronizar_feminicidio(df_feminicidio, df_regioes), linhas
+
+
+def padronizar_feminicidio(df_feminicidio, df_regioes):
+    """Aplica as regras de limpeza da base de feminicídios e associa as regiões."""
+    # Renomeação baseada na nova imagem enviada
+    df_feminicidio.rename(columns={
+        'FATO': 'fato_comunicado',
+        'DATA': 'data_fato',
+        'HORA': 'hora_fato',
+        'MUNICÍPIO': 'municipio',
+        'LOCALIDADE': 'localidade',
+        'PASSAGEM POR VIOLÊNCIA DOMÉSTICA': 'passagem_por_violencia_domestica',
+        'RELAÇÃO COM O AUTOR': 'relacao_autor',
+        'BO DE VD CONTRA O AUTOR': 'bo_de_vd_contra_o_autor',
+        'IDADE AUTOR': 'idade_autor',
+        'ETNIA/RAÇA AUTOR': 'etnia_autor',
+        'PASSAGEM POLICIAL': 'passagem_policial',
+        'PRISÃO': 'autor_preso',
+        'IDADE VITIMA': 'idade_vitima',
+        'ETNIA/RAÇA VITIMA': 'etnia_vitima',
+        'MEIO': 'meio_crime'
+    }, inplace=True)
+
+    # Limpeza padrão dos nomes das colunas
+    df_feminicidio.columns = (df_feminicidio.columns.str.strip().str.lower()
+                  .str.replace(' ', '_', regex=False)
+                  .str.replace('ã', 'a', regex=False)
+                  .str.replace('ç', 'c', regex=False)
+                  .str.replace('ú', 'u', regex=False)
+                  .str.replace('ô', 'o', regex=False)
+                  .str.replace('ê', 'e', regex=False)
+                  .str.replace('á', 'a', regex=False))
+
+    # --- CORREÇÃO DO ERRO DE DATETIME ---
+    # Força colunas que podem ter sido lidas erradas pelo Excel para texto (string)
+    colunas_texto = [
+        'autor_preso',
+        'bo_de_vd_contra_o_autor',
+        'passagem_policial',
+        'passagem_por_violencia_domestica',
+        'etnia_autor',
+        'etnia_vitima',
+        'hora_fato', # Hora muitas vezes vem como objeto datetime, melhor garantir como string
+        'localidade'
+    ]
+
+    for col in colunas_texto:
+        if col in df_feminicidio.columns:
+            df_feminicidio[col] = df_feminicidio[col].astype(str).replace('nan', 'Não informado')
+
+    # Conversão de tipos numéricos e data
+    df_feminicidio['data_fato'] = pd.to_datetime(df_feminicidio['data_fato'], errors='coerce')
+    df_feminicidio['idade_vitima'] = pd.to_numeric(df_feminicidio['idade_vitima'], errors='coerce')
+    df_feminicidio['idade_autor'] = pd.to_numeric(df_feminicidio['idade_autor'], errors='coerce')
+
+    # Normalização de município e merge com regiões
+    df_feminicidio['municipio_normalizado'] = normalizar_nomes(df_feminicidio['municipio'])
+    df_feminicidio = pd.merge(df_feminicidio, df_regioes[['municipio_normalizado', 'mesoregiao', 'associacao']], on='municipio_normalizado',
+                  how='left')
+    df_feminicidio['mesoregiao'] = df_feminicidio['mesoregiao'].fillna('Não informado')
+    df_feminicidio['associacao'] = df_feminicidio['associacao'].fillna('Não informado')
+    df_feminicidio['ano'] = df_feminicidio['data_fato'].dt.year
+
+    # Remove linhas onde a data do fato ficou NaT (erro de conversão ou linha vazia no excel)
+    df_feminicidio = df_feminicidio.dropna(subset=['data_fato'])
+
+    return df_feminicidio
+
+
+def padronizar_ocorrencias_gerais(df_geral):
+    """
+    Aplica as regras de limpeza da base geral (nomes de colunas, correção de
+    fatos, tipos e município normalizado) e calcula o id de cada registro.
+    Usada tanto na base completa quanto nos extratos anexados.
+    """
+    df_geral.columns = (df_geral.columns.str.strip().str.lower()
+                        .str.replace(' ', '_', regex=False).str.replace('ã', 'a', regex=False)
+                        .str.replace('ç', 'c', regex=False).str.replace('ú', 'u', regex=False))
+    df_geral.rename(columns={
+        'data_do_fato': 'data_fato', 'município': 'municipio',
+        'fato_comunicado': 'fato_comunicado', 'idade': 'idade_vitima'
+    }, inplace=True)
+
+    # --- INÍCIO DO ETL: PADRONIZAÇÃO DE FATOS ---
+    correcoes_fatos = {
+        "Lesão Corporal Dolosa": "Lesão corporal grave ou gravíssima - Dolosa",
+        "Estupro coletivo": "Estupro"
+    }
+    if 'fato_comunicado' in df_geral.columns:
+        # O replace procura o valor exato da chave e substitui pelo valor
+        df_geral['fato_comunicado'] = df_geral['fato_comunicado'].replace(correcoes_fatos)
+        print("ETL de 'Fato Comunicado' aplicado com sucesso na base geral.")
+    # --- FIM DO ETL ---
+
+    df_geral['data_fato'] = pd.to_datetime(df_geral['data_fato'])
+    df_geral['idade_vitima'] = pd.to_numeric(df_geral['idade_vitima'], errors='coerce')
+    df_geral['municipio_normalizado'] = normalizar_nomes(df_geral['municipio'])
+    df_geral['id_registro'] = calcular_id_registro(df_geral)
+    return df_geral
+
+
+def associar_regioes(df_geral, df_regioes):
+    """Acrescenta mesorregião e associação de cada ocorrência."""
+    df_geral = pd.merge(df_geral, df_regioes[['municipio_normalizado', 'mesoregiao', 'associacao']],
+                        on='municipio_normalizado', how='left')
+    df_geral['mesoregiao'] = df_geral['mesoregiao'].fillna('Não informado')
+    df_geral['associacao'] = df_geral['associacao'].fillna('Não informado')
+    return df_geral
+
+
+def processar_ocorrencias_gerais(diretorio_dados, df_regioes, df_anexos=None):
+    """
+    Lê e limpa a base geral de ocorrências, enriquecendo-a com as regiões.
+    Os registros de extratos anexados ('df_anexos') que ainda não constam da
+    base são incluídos, para que uma reconstrução não os perca.
+    """
+    df_geral = padronizar_ocorrencias_gerais(ler_fonte(diretorio_dados, 'base_geral.xlsx'))
+    linhas = {'base_geral.xlsx': len(df_geral)}
+    if df_anexos is not None and not df_anexos.empty:
+        df_anexos = df_anexos[~df_anexos['id_registro'].isin(df_geral['id_registro'])]
+        df_geral = pd.concat([df_geral, df_anexos], ignore_index=True)
+    return associar_regioes(df_geral, df_regioes), linhas
+
+
+def adicionar_periodo(df):
+    """Acrescenta as colunas de ano e nome do mês a partir da data do fato."""
+    df['ano'] = df['data_fato'].dt.year
+    df['mes'] = df['data_fato'].dt.month_name()
+    return df
+
+
+def processar_geral(df_geral, df_feminicidio):
+    """Une as ocorrências gerais aos feminicídios já processados."""
+    # Preparação para união com a base geral (se necessário)
+    df_feminicidio_para_geral = df_feminicidio.copy()
+    # Garante que a coluna de fato comunicado seja padronizada para 'Feminicídio'
+    df_feminicidio_para_geral['fato_comunicado'] = 'Feminicídio'
+    df_feminicidio_para_geral['id_registro'] = calcular_id_registro(df_feminicidio_para_geral)
+
+    df_final = pd.concat([df_geral, df_feminicidio_para_geral], ignore_index=True)
+    return adicionar_periodo(df_final), {}
+
+
+def processar_geojson(diretorio_dados):
+    """Lê a malha municipal de SC e adiciona o nome normalizado a cada feição."""
+    with open(os.path.join(diretorio_dados, 'municipios_sc.json'), 'r', encoding='utf-8') as f:
+        geojson_data = json.load(f)
+    for feature in geojson_data['features']:
+        nome_original = feature['properties'].get('NM_MUN')
+        if nome_original:
+            feature['properties']['NM_MUN_NORMALIZADO'] = normalizar_nome(nome_original)
+    linhas = {'municipios_sc.json': len(geojson_data['features'])}
+    return geojson_data, linhas
+
+
+def executar_etapa(nome, diretorio_dados, dependencias):
+    """
+    Executa a etapa 'nome' recebendo os resultados das etapas das quais ela
+    depende. Retorna o resultado e a contagem de linhas lidas por fonte.
+    """
+    if nome == 'regioes':
+        return processar_regioes(diretorio_dados)
+    if nome == 'populacao':
+        return processar_populacao(diretorio_dados)
+    if nome == 'calendario':
+        return processar_calendario(diretorio_dados)
+    if nome == 'feminicidio':
+        return processar_feminicidio(diretorio_dados, dependencias['regioes'])
+    if nome == 'ocorrencias_gerais':
+        return processar_ocorrencias_gerais(diretorio_dados, dependencias['regioes'], dependencias.get('anexos'))
+    if nome == 'geral':
+        return processar_geral(dependencias['ocorrencias_gerais'], dependencias['feminicidio'])
+    if nome == 'cubo_ocorrencias':
+        return construir_cubo(dependencias['geral']), {}
+    if nome == 'geojson_sc':
+        return processar_geojson(diretorio_dados)
+    if nome == 'vizinhos':
+        return construir_vizinhanca(dependencias['geojson_sc']), {}
+    raise ValueError(f"Etapa desconhecida: '{nome}'")
+
+
+def executar_grafo(etapas, diretorio_dados='data', diretorio='data/processed', jobs=1):
+    """
+    Executa as etapas informadas respeitando as dependências do grafo.
+    Dependências que não estão em 'etapas' são lidas das saídas já gravadas.
+    Com jobs > 1, etapas independentes rodam em paralelo em um pool de
+    processos, e cada etapa é submetida assim que suas dependências terminam.
+    Retorna os resultados por etapa e a contagem de linhas lidas por fonte.
+    """
+    pendentes = [nome for nome in ETAPAS if nome in set(etapas)]
+    resultados = {}
+    linhas_lidas = {}
+
+    def dependencias_de(nome):
+        dependencias = {}
+        for dep in ETAPAS[nome]['dependencias']:
+            if dep not in resultados:
+                resultados[dep] = carregar_saida_existente(dep, diretorio)
+            dependencias[dep] = resultados[dep]
+        if ETAPAS[nome].get('anexos'):
+            dependencias['anexos'] = carregar_anexos(diretorio)
+        return dependencias
+
+    if jobs <= 1:
+        for nome in pendentes:
+            resultados[nome], linhas = executar_etapa(nome, diretorio_dados, dependencias_de(nome))
+            linhas_lidas.update(linhas)
+        return resultados, linhas_lidas
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        em_execucao = {}
+        while pendentes or em_execucao:
+            # Submete toda etapa cujas dependências já estão disponíveis
+            for nome in list(pendentes):
+                if all(dep in resultados or dep not in etapas for dep in ETAPAS[nome]['dependencias']):
+                    pendentes.remove(nome)
+                    futuro = executor.submit(executar_etapa, nome, diretorio_dados, dependencias_de(nome))
+                    em_execucao[futuro] = nome
+
+            concluidos, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                nome = em_execucao.pop(futuro)
+                resultados[nome], linhas = futuro.result()
+                linhas_lidas.update(linhas)
+                print(f"Etapa '{nome}' concluída.")
+
+    return resultados, linhas_lidas
+
+
+def carregar_e_processar_dados(diretorio_dados='data', jobs=1):
     """
     Carrega todos os dados brutos, processa-os e retorna dicionários
     de dataframes e outros dados.
@@ -15,144 +362,14 @@ def carregar_e_processar_dados():
 
     # Carregar e processar cada conjunto de dados
     try:
-        df_regioes = pd.read_excel('data/base_regioes_associacoes.xlsx')
-        df_regioes.columns = (df_regioes.columns.str.strip().str.lower()
-                      .str.replace(' ', '_', regex=False)
-                      .str.replace('ã', 'a', regex=False)
-                      .str.replace('ç', 'c', regex=False)
-                      .str.replace('ô', 'o', regex=False)
-                      .str.replace('í', 'i', regex=False))
-        df_regioes['municipio_normalizado'] = df_regioes['municipio'].apply(normalizar_nome)
-        dfs['regioes'] = df_regioes
-
-        df_populacao = pd.read_excel('data/base_populacao.xlsx')
-        df_populacao.columns = (df_populacao.columns.str.strip().str.lower()
-                      .str.replace(' ', '_', regex=False)
-                      .str.replace('ã', 'a', regex=False)
-                      .str.replace('ç', 'c', regex=False)
-                      .str.replace('ô', 'o', regex=False)
-                      .str.replace('í', 'i', regex=False))
-        df_populacao['municipio_normalizado'] = df_populacao['municipio'].apply(normalizar_nome)
-        dfs['populacao'] = df_populacao
-
-        df_calendario = pd.read_excel('data/base_calendario_feriados.xlsx')
-        df_calendario['data'] = pd.to_datetime(df_calendario['data'])
-        dfs['calendario'] = df_calendario
-
-        # --- PROCESSAMENTO DA BASE GERAL ---
-        df_geral = pd.read_excel('data/base_geral.xlsx')
-        df_geral.columns = (df_geral.columns.str.strip().str.lower()
-                            .str.replace(' ', '_', regex=False).str.replace('ã', 'a', regex=False)
-                            .str.replace('ç', 'c', regex=False).str.replace('ú', 'u', regex=False))
-        df_geral.rename(columns={
-            'data_do_fato': 'data_fato', 'município': 'municipio',
-            'fato_comunicado': 'fato_comunicado', 'idade': 'idade_vitima'
-        }, inplace=True)
-
-        # --- INÍCIO DO ETL: PADRONIZAÇÃO DE FATOS ---
-        correcoes_fatos = {
-            "Lesão Corporal Dolosa": "Lesão corporal grave ou gravíssima - Dolosa",
-            "Estupro coletivo": "Estupro"
-        }
-        if 'fato_comunicado' in df_geral.columns:
-            # O replace procura o valor exato da chave e substitui pelo valor
-            df_geral['fato_comunicado'] = df_geral['fato_comunicado'].replace(correcoes_fatos)
-            print("ETL de 'Fato Comunicado' aplicado com sucesso na base geral.")
-        # --- FIM DO ETL ---
-
-        df_geral['data_fato'] = pd.to_datetime(df_geral['data_fato'])
-        df_geral['idade_vitima'] = pd.to_numeric(df_geral['idade_vitima'], errors='coerce')
-        df_geral['municipio_normalizado'] = df_geral['municipio'].apply(normalizar_nome)
-        df_geral = pd.merge(df_geral, df_regioes[['municipio_normalizado', 'mesoregiao', 'associacao']],
-                            on='municipio_normalizado', how='left')
-        df_geral['mesoregiao'] = df_geral['mesoregiao'].fillna('Não informado')
-        df_geral['associacao'] = df_geral['associacao'].fillna('Não informado')
-        # --------------------------
-
-        # --- ATUALIZAÇÃO AQUI (BASE FEMINICÍDIO) ---
-        df_feminicidio = pd.read_excel('data/base_feminicidio.xlsx')
-        
-        # Renomeação baseada na nova imagem enviada
-        df_feminicidio.rename(columns={
-            'FATO': 'fato_comunicado',          
-            'DATA': 'data_fato',
-            'HORA': 'hora_fato',                
-            'MUNICÍPIO': 'municipio',
-            'LOCALIDADE': 'localidade',         
-            'PASSAGEM POR VIOLÊNCIA DOMÉSTICA': 'passagem_por_violencia_domestica',
-            'RELAÇÃO COM O AUTOR': 'relacao_autor',
-            'BO DE VD CONTRA O AUTOR': 'bo_de_vd_contra_o_autor',
-            'IDADE AUTOR': 'idade_autor',
-            'ETNIA/RAÇA AUTOR': 'etnia_autor',  
-            'PASSAGEM POLICIAL': 'passagem_policial',
-            'PRISÃO': 'autor_preso',
-            'IDADE VITIMA': 'idade_vitima',
-            'ETNIA/RAÇA VITIMA': 'etnia_vitima', 
-            'MEIO': 'meio_crime'
-        }, inplace=True)
-
-        # Limpeza padrão dos nomes das colunas
-        df_feminicidio.columns = (df_feminicidio.columns.str.strip().str.lower()
-                      .str.replace(' ', '_', regex=False)
-                      .str.replace('ã', 'a', regex=False)
-                      .str.replace('ç', 'c', regex=False)
-                      .str.replace('ú', 'u', regex=False)
-                      .str.replace('ô', 'o', regex=False)
-                      .str.replace('ê', 'e', regex=False)
-                      .str.replace('á', 'a', regex=False))
-
-        # --- CORREÇÃO DO ERRO DE DATETIME ---
-        # Força colunas que podem ter sido lidas erradas pelo Excel para texto (string)
-        colunas_texto = [
-            'autor_preso', 
-            'bo_de_vd_contra_o_autor', 
-            'passagem_policial', 
-            'passagem_por_violencia_domestica', 
-            'etnia_autor', 
-            'etnia_vitima',
-            'hora_fato', # Hora muitas vezes vem como objeto datetime, melhor garantir como string
-            'localidade'
-        ]
-        
-        for col in colunas_texto:
-            if col in df_feminicidio.columns:
-                df_feminicidio[col] = df_feminicidio[col].astype(str).replace('nan', 'Não informado')
-
-        # Conversão de tipos numéricos e data
-        df_feminicidio['data_fato'] = pd.to_datetime(df_feminicidio['data_fato'], errors='coerce')
-        df_feminicidio['idade_vitima'] = pd.to_numeric(df_feminicidio['idade_vitima'], errors='coerce')
-        df_feminicidio['idade_autor'] = pd.to_numeric(df_feminicidio['idade_autor'], errors='coerce')
-        
-        # Normalização de município e merge com regiões
-        df_feminicidio['municipio_normalizado'] = df_feminicidio['municipio'].apply(normalizar_nome)
-        df_feminicidio = pd.merge(df_feminicidio, df_regioes[['municipio_normalizado', 'mesoregiao', 'associacao']], on='municipio_normalizado',
-                      how='left')
-        df_feminicidio['mesoregiao'] = df_feminicidio['mesoregiao'].fillna('Não informado')
-        df_feminicidio['associacao'] = df_feminicidio['associacao'].fillna('Não informado')
-        df_feminicidio['ano'] = df_feminicidio['data_fato'].dt.year
-        
-        # Remove linhas onde a data do fato ficou NaT (erro de conversão ou linha vazia no excel)
-        df_feminicidio = df_feminicidio.dropna(subset=['data_fato'])
-
-        dfs['feminicidio'] = df_feminicidio
-
-        # Preparação para união com a base geral (se necessário)
-        df_feminicidio_para_geral = df_feminicidio.copy()
-        # Garante que a coluna de fato comunicado seja padronizada para 'Feminicídio'
-        df_feminicidio_para_geral['fato_comunicado'] = 'Feminicídio'
-
-        df_final = pd.concat([df_geral, df_feminicidio_para_geral], ignore_index=True)
-        df_final['ano'] = df_final['data_fato'].dt.year
-        df_final['mes'] = df_final['data_fato'].dt.month_name()
-        dfs['geral'] = df_final
-
-        with open('data/municipios_sc.json', 'r', encoding='utf-8') as f:
-            geojson_data = json.load(f)
-        for feature in geojson_data['features']:
-            nome_original = feature['properties'].get('NM_MUN')
-            if nome_original:
-                feature['properties']['NM_MUN_NORMALIZADO'] = normalizar_nome(nome_original)
-        outros_dados['geojson_sc'] = geojson_data
+        resultados, _ = executar_grafo(list(ETAPAS), diretorio_dados, jobs=jobs)
+        for nome, resultado in resultados.items():
+            if ETAPAS[nome].get('intermediaria'):
+                continue
+            if nome in SAIDAS_JSON:
+                outros_dados[nome] = resultado
+            else:
+                dfs[nome] = resultado
 
     except FileNotFoundError as e:
         print(f"Erro: Arquivo não encontrado - {e}")
@@ -165,14 +382,23 @@ def carregar_e_processar_dados():
 
 def salvar_dados_processados(dfs, outros_dados, diretorio='data/processed'):
     """
-    Salva cada dataframe como um arquivo Parquet e outros dados como JSON.
+    Salva cada dataframe como um arquivo Parquet, com o esquema declarado em
+    esquemas.py, e outros dados como JSON. Os conjuntos de PARTICOES viram
+    datasets particionados por ano. Retorna True se todos os arquivos foram gravados.
     """
     try:
         os.makedirs(diretorio, exist_ok=True)
-        
+
         for key, df in dfs.items():
-            caminho_arquivo = os.path.join(diretorio, f"{key}.parquet")
-            df.to_parquet(caminho_arquivo)
+            if key in PARTICOES:
+                caminho_arquivo = os.path.join(diretorio, key)
+                salvar_dataset_particionado(df, key, caminho_arquivo)
+                # Remove o arquivo único gravado por versões anteriores do ETL
+                if os.path.exists(caminho_arquivo + '.parquet'):
+                    os.remove(caminho_arquivo + '.parquet')
+            else:
+                caminho_arquivo = os.path.join(diretorio, f"{key}.parquet")
+                salvar_parquet(df, key, caminho_arquivo)
             print(f"DataFrame '{key}' salvo em '{caminho_arquivo}'")
 
         for key, data in outros_dados.items():
@@ -183,11 +409,338 @@ def salvar_dados_processados(dfs, outros_dados, diretorio='data/processed'):
 
     except Exception as e:
         print(f"Erro ao salvar os arquivos processados: {e}")
+        return False
+
+    return True
+
+
+# --- MANIFESTO DE EXECUÇÃO INCREMENTAL ---
+
+def carregar_manifesto(diretorio='data/processed'):
+    """Lê o manifesto da última execução. Retorna um manifesto vazio se não existir."""
+    caminho = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'versao_etl': VERSAO_ETL, 'fontes': {}, 'saidas': {}}
+
+
+def salvar_manifesto(manifesto, diretorio='data/processed'):
+    """Grava o manifesto de forma atômica (arquivo temporário + rename)."""
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    caminho_tmp = caminho + '.tmp'
+    with open(caminho_tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2)
+    os.replace(caminho_tmp, caminho)
+
+
+def inspecionar_fontes(diretorio_dados, manifesto_anterior):
+    """
+    Levanta hash, mtime e tamanho de cada arquivo bruto. Quando mtime e
+    tamanho coincidem com o manifesto anterior, o hash é reaproveitado sem
+    reler o arquivo.
+    """
+    fontes = {}
+    anteriores = manifesto_anterior.get('fontes', {})
+    for etapa in ETAPAS.values():
+        for fonte in etapa['fontes']:
+            if fonte in fontes:
+                continue
+            caminho = os.path.join(diretorio_dados, fonte)
+            stat = os.stat(caminho)
+            anterior = anteriores.get(fonte, {})
+            if anterior.get('mtime_ns') == stat.st_mtime_ns and anterior.get('tamanho') == stat.st_size:
+                sha256 = anterior['sha256']
+            else:
+                sha256 = calcular_hash_arquivo(caminho)
+            fontes[fonte] = {
+                'sha256': sha256,
+                'mtime': datetime.fromtimestamp(stat.st_mtime).isoformat(timespec='seconds'),
+                'mtime_ns': stat.st_mtime_ns,
+                'tamanho': stat.st_size,
+                'linhas': anterior.get('linhas') if anterior.get('sha256') == sha256 else None,
+            }
+    return fontes
+
+
+def calcular_assinaturas(fontes):
+    """
+    Calcula a assinatura de cada etapa a partir do hash de suas fontes, das
+    assinaturas de suas dependências e da versão do ETL. Uma mudança em
+    qualquer entrada se propaga a todas as etapas dependentes.
+    """
+    assinaturas = {}
+    for nome, etapa in ETAPAS.items():
+        conteudo = {
+            'versao_etl': VERSAO_ETL,
+            'fontes': {fonte: fontes[fonte]['sha256'] for fonte in etapa['fontes']},
+            'dependencias': {dep: assinaturas[dep] for dep in etapa['dependencias']},
+        }
+        assinaturas[nome] = hashlib.sha256(json.dumps(conteudo, sort_keys=True).encode('utf-8')).hexdigest()
+    return assinaturas
+
+
+def arquivo_saida(nome):
+    """Nome do arquivo (ou diretório, para datasets particionados) gerado pela etapa 'nome'."""
+    if nome in SAIDAS_JSON:
+        return f"{nome}.json"
+    if nome in PARTICOES:
+        return nome
+    return f"{nome}.parquet"
+
+
+def contar_linhas(nome, resultado):
+    """Número de registros de uma saída: feições, municípios ou linhas do DataFrame."""
+    if nome == 'geojson_sc':
+        return len(resultado['features'])
+    if nome == 'vizinhos':
+        return len(resultado['municipios'])
+    return len(resultado)
+
+
+def etapas_desatualizadas(manifesto_anterior, assinaturas, diretorio='data/processed'):
+    """
+    Retorna, em ordem topológica, as etapas que precisam ser executadas: as
+    saídas desatualizadas e as etapas intermediárias de que elas dependem.
+    """
+    saidas = manifesto_anterior.get('saidas', {})
+    desatualizadas = set()
+    for nome, etapa in ETAPAS.items():
+        if etapa.get('intermediaria'):
+            continue
+        saida = saidas.get(nome, {})
+        if (saida.get('assinatura') != assinaturas[nome]
+                or not os.path.exists(os.path.join(diretorio, arquivo_saida(nome)))):
+            desatualizadas.add(nome)
+
+    # Etapas intermediárias não são gravadas, então precisam rodar sempre que
+    # alguma etapa pendente depender delas
+    for nome in reversed(list(ETAPAS)):
+        if nome in desatualizadas:
+            for dep in ETAPAS[nome]['dependencias']:
+                if ETAPAS[dep].get('intermediaria'):
+                    desatualizadas.add(dep)
+    return [nome for nome in ETAPAS if nome in desatualizadas]
+
+
+def carregar_saida_existente(nome, diretorio='data/processed'):
+    """Lê uma saída já processada, usada como dependência de etapas reconstruídas."""
+    caminho = os.path.join(diretorio, arquivo_saida(nome))
+    if nome in SAIDAS_JSON:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return ler_conjunto(caminho, categorias=False)
+
+
+def carregar_anexos(diretorio='data/processed'):
+    """Lê os registros de todos os extratos anexados. Retorna None se não houver nenhum."""
+    caminho = os.path.join(diretorio, DIRETORIO_ANEXOS)
+    if not os.path.isdir(caminho) or not any(a.endswith('.parquet') for a in os.listdir(caminho)):
+        return None
+    df_anexos = ler_conjunto(caminho, categorias=False)
+    df_anexos['idade_vitima'] = df_anexos['idade_vitima'].astype('float64')
+    return df_anexos
+
+
+def executar_pipeline(diretorio_dados='data', diretorio='data/processed', forcar=False, jobs=1,
+                      manter=VERSOES_MANTIDAS):
+    """
+    Executa o ETL de forma incremental: apenas as etapas cujas fontes ou
+    dependências mudaram desde o último manifesto são reprocessadas. Com
+    jobs > 1, as etapas independentes rodam em paralelo.
+
+    O resultado é gravado numa versão nova de 'diretorio' (ver versoes.py),
+    que recebe as saídas inalteradas da versão atual como hard links e só é
+    publicada depois que todas as saídas e o manifesto foram gravados; em
+    caso de erro, a versão atual continua valendo. Retorna a lista de etapas
+    reconstruídas, ou None em caso de erro.
+    """
+    anterior = diretorio_atual(diretorio)
+    manifesto_anterior = carregar_manifesto(anterior)
+    if forcar or manifesto_anterior.get('versao_etl') != VERSAO_ETL:
+        manifesto_anterior = {'versao_etl': VERSAO_ETL, 'fontes': manifesto_anterior.get('fontes', {}), 'saidas': {},
+                              'anexos': manifesto_anterior.get('anexos', [])}
+
+    try:
+        fontes = inspecionar_fontes(diretorio_dados, manifesto_anterior)
+    except FileNotFoundError as e:
+        print(f"Erro: Arquivo não encontrado - {e}")
+        return None
+
+    assinaturas = calcular_assinaturas(fontes)
+    pendentes = etapas_desatualizadas(manifesto_anterior, assinaturas, anterior)
+    if not pendentes:
+        print("Nenhuma fonte foi alterada desde a última execução. Nada a fazer.")
+        return []
+    print(f"Etapas a executar: {', '.join(pendentes)}")
+
+    # A versão nova parte das saídas que não serão reconstruídas
+    versao, destino = criar_versao(diretorio)
+    inalteradas = [arquivo_saida(nome) for nome, etapa in ETAPAS.items()
+                   if nome not in pendentes and not etapa.get('intermediaria')]
+    copiar_arquivos(anterior, destino, inalteradas + [DIRETORIO_ANEXOS])
+
+    dfs = {}
+    outros_dados = {}
+    try:
+        resultados, linhas_lidas = executar_grafo(pendentes, diretorio_dados, destino, jobs)
+        for fonte, n in linhas_lidas.items():
+            fontes[fonte]['linhas'] = n
+        for nome in pendentes:
+            if ETAPAS[nome].get('intermediaria'):
+                continue
+            if nome in SAIDAS_JSON:
+                outros_dados[nome] = resultados[nome]
+            else:
+                dfs[nome] = resultados[nome]
+
+    except FileNotFoundError as e:
+        print(f"Erro: Arquivo não encontrado - {e}")
+        descartar_versao(destino)
+        return None
+    except Exception as e:
+        print(f"Ocorreu um erro inesperado: {e}")
+        descartar_versao(destino)
+        return None
+
+    if not salvar_dados_processados(dfs, outros_dados, destino):
+        descartar_versao(destino)
+        return None
+
+    # Atualiza o manifesto apenas depois que todas as saídas foram gravadas
+    saidas = dict(manifesto_anterior.get('saidas', {}))
+    gerado_em = datetime.now().isoformat(timespec='seconds')
+    for nome in pendentes:
+        if ETAPAS[nome].get('intermediaria'):
+            continue
+        resultado = resultados[nome]
+        saidas[nome] = {
+            'arquivos': [arquivo_saida(nome)],
+            'assinatura': assinaturas[nome],
+            'fontes': {fonte: fontes[fonte]['sha256'] for fonte in ETAPAS[nome]['fontes']},
+            'dependencias': list(ETAPAS[nome]['dependencias']),
+            'linhas': contar_linhas(nome, resultado),
+            'gerado_em': gerado_em,
+        }
+    salvar_manifesto({'versao_etl': VERSAO_ETL, 'fontes': fontes, 'saidas': saidas,
+                      'anexos': manifesto_anterior.get('anexos', [])}, destino)
+    publicar(versao, diretorio, manter)
+    return pendentes
+
+
+def publicar(versao, diretorio='data/processed', manter=VERSOES_MANTIDAS):
+    """Publica a versão gravada e remove as versões antigas além das 'manter' mais recentes."""
+    publicar_versao(versao, diretorio)
+    print(f"Versão '{versao}' publicada em '{diretorio}'.")
+    for removida in remover_versoes_antigas(diretorio, manter):
+        print(f"Versão antiga '{removida}' removida.")
+
+
+def anexar_extrato(caminho_extrato, diretorio='data/processed', manter=VERSOES_MANTIDAS):
+    """
+    Anexa um extrato mensal da base geral às saídas já processadas, sem
+    reprocessar o histórico. O extrato passa pelas mesmas regras da base
+    geral e os registros cujo id já existe nos anos cobertos são descartados.
+    Os novos registros entram no dataset 'geral' (só as partições dos anos
+    afetados são regravadas) e suas contagens são somadas ao cubo. Como no
+    pré-processamento completo, o resultado é publicado como uma versão nova.
+    Retorna o número de registros anexados, ou None em caso de erro.
+    """
+    anterior = diretorio_atual(diretorio)
+    manifesto = carregar_manifesto(anterior)
+    saidas = manifesto.get('saidas', {})
+    if (manifesto.get('versao_etl') != VERSAO_ETL or 'geral' not in saidas
+            or not os.path.isdir(os.path.join(anterior, arquivo_saida('geral')))):
+        print("Erro: a base geral processada não existe ou está desatualizada. "
+              "Execute o pré-processamento completo antes de anexar extratos.")
+        return None
+
+    versao, destino = criar_versao(diretorio)
+    copiar_arquivos(anterior, destino, [arquivo_saida(nome) for nome, etapa in ETAPAS.items()
+                                        if not etapa.get('intermediaria')] + [DIRETORIO_ANEXOS])
+    caminho_geral = os.path.join(destino, arquivo_saida('geral'))
+    try:
+        sha256 = calcular_hash_arquivo(caminho_extrato)
+        df_extrato = padronizar_ocorrencias_gerais(
+            ler_planilha(caminho_extrato, colunas=COLUNAS_UTILIZADAS['base_geral.xlsx'], diretorio_cache=None))
+        linhas_lidas = len(df_extrato)
+
+        # Deduplicação: só os ids do período coberto pelo extrato são lidos
+        datas = df_extrato['data_fato'].dropna()
+        filtro = filtro_periodo(datas.min(), datas.max()) if not datas.empty else None
+        ids_existentes = ler_conjunto(caminho_geral, colunas=['id_registro'], filtro=filtro)['id_registro']
+        df_novos = df_extrato[~df_extrato['id_registro'].isin(ids_existentes)].reset_index(drop=True)
+        print(f"Extrato '{caminho_extrato}': {linhas_lidas} registros lidos, {len(df_novos)} novos.")
+
+        segmento = f"anexo-{sha256[:16]}"
+        if not df_novos.empty:
+            df_regioes = carregar_saida_existente('regioes', destino)
+            df_geral_novos = adicionar_periodo(associar_regioes(df_novos, df_regioes))
+
+            # Os registros padronizados são gravados primeiro: se a gravação for
+            # interrompida, a próxima reconstrução da base geral ainda os inclui
+            os.makedirs(os.path.join(destino, DIRETORIO_ANEXOS), exist_ok=True)
+            salvar_parquet(df_novos, 'geral', os.path.join(destino, DIRETORIO_ANEXOS, f"{segmento}.parquet"))
+            anexar_segmento(df_geral_novos, 'geral', caminho_geral, segmento)
+
+            caminho_cubo = os.path.join(destino, arquivo_saida('cubo_ocorrencias'))
+            if 'cubo_ocorrencias' in saidas and os.path.exists(caminho_cubo):
+                cubo = somar_cubos(ler_conjunto(caminho_cubo, categorias=False), construir_cubo(df_geral_novos))
+                # O cubo da versão anterior é um hard link: desfaz o link antes de regravar
+                os.remove(caminho_cubo)
+                salvar_parquet(cubo, 'cubo_ocorrencias', caminho_cubo)
+                saidas['cubo_ocorrencias']['linhas'] = len(cubo)
+
+    except FileNotFoundError as e:
+        print(f"Erro: Arquivo não encontrado - {e}")
+        descartar_versao(destino)
+        return None
+    except Exception as e:
+        print(f"Ocorreu um erro inesperado: {e}")
+        descartar_versao(destino)
+        return None
+
+    gerado_em = datetime.now().isoformat(timespec='seconds')
+    saidas['geral']['linhas'] = saidas['geral'].get('linhas', 0) + len(df_novos)
+    saidas['geral']['gerado_em'] = gerado_em
+    manifesto.setdefault('anexos', []).append({
+        'arquivo': os.path.basename(caminho_extrato),
+        'sha256': sha256,
+        'segmento': segmento if not df_novos.empty else None,
+        'linhas_lidas': linhas_lidas,
+        'linhas_novas': len(df_novos),
+        'gerado_em': gerado_em,
+    })
+    salvar_manifesto(manifesto, destino)
+    publicar(versao, diretorio, manter)
+    return len(df_novos)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pré-processamento das bases do Observatório.")
+    parser.add_argument('--dados', default='data', help="Diretório com os arquivos brutos.")
+    parser.add_argument('--saida', default='data/processed', help="Diretório dos arquivos processados.")
+    parser.add_argument('--forcar', action='store_true',
+                        help="Reprocessa todas as bases, ignorando o manifesto.")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="Número de processos para executar etapas independentes em paralelo.")
+    parser.add_argument('--anexar', metavar='ARQUIVO',
+                        help="Anexa um extrato mensal da base geral às saídas existentes, sem reprocessar o histórico.")
+    parser.add_argument('--manter', type=int, default=VERSOES_MANTIDAS,
+                        help="Número de versões publicadas mantidas em disco, incluindo a atual.")
+    args = parser.parse_args()
+
+    if args.anexar:
+        print(f"Anexando o extrato '{args.anexar}'...")
+        anexado = anexar_extrato(args.anexar, args.saida, args.manter) is not None
+        if anexado:
+            print("Extrato anexado.")
+        raise SystemExit(0 if anexado else 1)
+
     print("Iniciando o pré-processamento dos dados...")
-    dataframes, outros_dados_dict = carregar_e_processar_dados()
-    if dataframes is not None:
-        salvar_dados_processados(dataframes, outros_dados_dict)
-        print("Pré-processamento concluído.")
\ No newline at end of file
+    reconstruidas = executar_pipeline(args.dados, args.saida, forcar=args.forcar, jobs=args.jobs,
+                                    manter=args.manter)
+    if reconstruidas is not None:
+        print("Pré-processamento concluído.")
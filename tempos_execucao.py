@@ -0,0 +1,61 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# --- TEMPOS DE EXECUÇÃO DO PAINEL ---
+# Tempo de servidor de cada execução do script (ou só de um fragmento),
+# agrupado pelo tipo de interação que a causou. Os tempos de todas as
+# sessões vão para um registro do processo, mostrado no diagnóstico do painel
+# e lido por benchmarks/benchmark_interacoes.py.
+
+# Últimas execuções guardadas de cada tipo de interação
+AMOSTRAS_POR_TIPO = 500
+
+
+@st.cache_resource
+def _registro_tempos():
+    return {'trava': threading.Lock(), 'tempos': {}}
+
+
+def reexecucao_de_fragmento():
+    """Se a execução atual é a reexecução de um fragmento, e não do script inteiro."""
+    contexto = get_script_run_ctx()
+    return contexto is not None and bool(contexto.fragment_ids_this_run)
+
+
+def registrar(tipo, segundos):
+    """Registra uma execução do tipo de interação 'tipo' que levou 'segundos'."""
+    registro = _registro_tempos()
+    with registro['trava']:
+        registro['tempos'].setdefault(tipo, deque(maxlen=AMOSTRAS_POR_TIPO)).append(segundos)
+
+
+def limpar():
+    registro = _registro_tempos()
+    with registro['trava']:
+        registro['tempos'].clear()
+
+
+def resumo():
+    """Execuções, mediana, p95 e máximo (em ms) de cada tipo de interação."""
+    registro = _registro_tempos()
+    with registro['trava']:
+        tempos = {tipo: np.array(amostras) * 1000 for tipo, amostras in registro['tempos'].items()}
+    linhas = [{'interacao': tipo, 'execucoes': len(ms), 'p50_ms': np.percentile(ms, 50),
+               'p95_ms': np.percentile(ms, 95), 'max_ms': ms.max()} for tipo, ms in tempos.items()]
+    return pd.DataFrame(linhas, columns=['interacao', 'execucoes', 'p50_ms', 'p95_ms', 'max_ms'])
+
+
+class Cronometro:
+    """Mede o tempo desde a criação; registrar() grava a medição com o tipo de interação informado."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+
+    def registrar(self, tipo):
+        registrar(tipo, time.perf_counter() - self.inicio)
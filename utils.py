@@ -1,3 +1,4 @@
+import hashlib
 import io
 import re
 import unicodedata
@@ -6,6 +7,22 @@ import numpy as np
 import pandas as pd
 
 
+# Mapa de exceções aplicado antes da normalização
+_MAPA_EXCECOES = {
+    'herval': 'herval d oeste'
+    # (Mantemos a correção para o arquivo Geo)
+}
+
+# Padrões pré-compilados usados na normalização
+_PADRAO_PONTUACAO = re.compile(r'[^a-z0-9\s]')
+_PADRAO_ARTIGOS = re.compile(r'\b(de|do|da|d)\b')
+_PADRAO_ESPACOS = re.compile(r'\s+')
+
+# Memo compartilhado pelo processo: há poucas centenas de nomes distintos de
+# municípios, então cada um é normalizado uma única vez
+_nomes_normalizados = {}
+
+
 def normalizar_nome(texto):
     """
     Limpa e padroniza uma string de texto para ser usada como
@@ -14,34 +31,62 @@ def normalizar_nome(texto):
     if not isinstance(texto, str):
         return ""
 
-    texto = texto.lower()
+    resultado = _nomes_normalizados.get(texto)
+    if resultado is not None:
+        return resultado
+
+    normalizado = texto.lower()
 
     # --- 1. Mapa de Exceções (Hard-coded) ---
-    mapa_excecoes = {
-        'herval': 'herval d oeste'
-        # (Mantemos a correção para o arquivo Geo)
-    }
-    if texto in mapa_excecoes:
-        texto = mapa_excecoes[texto]
+    if normalizado in _MAPA_EXCECOES:
+        normalizado = _MAPA_EXCECOES[normalizado]
 
     # --- 2. Normalização de Acentos ---
-    texto = ''.join(c for c in unicodedata.normalize('NFD', texto)
-                    if unicodedata.category(c) != 'Mn')
+    normalizado = ''.join(c for c in unicodedata.normalize('NFD', normalizado)
+                          if unicodedata.category(c) != 'Mn')
 
     # --- 3. Normalização de Pontuação ---
     # Substitui qualquer coisa que NÃO seja (^) letra (a-z),
     # número (0-9) ou espaço (\s) por um espaço.
-    texto = re.sub(r'[^a-z0-9\s]', ' ', texto)
+    normalizado = _PADRAO_PONTUACAO.sub(' ', normalizado)
 
     # --- 4. Normalização de Palavras ---
     # Remove artigos/preposições (agora cercados por espaços)
-    texto = re.sub(r'\b(de|do|da|d)\b', ' ', texto)
+    normalizado = _PADRAO_ARTIGOS.sub(' ', normalizado)
 
     # --- 5. Limpeza Final ---
     # Remove espaços múltiplos (criados pelas substituições)
-    texto = re.sub(r'\s+', ' ', texto).strip()
+    normalizado = _PADRAO_ESPACOS.sub(' ', normalizado).strip()
+
+    resultado = normalizado.upper()
+    _nomes_normalizados[texto] = resultado
+    return resultado
+
+
+def normalizar_nomes(serie):
+    """
+    Versão vetorizada de normalizar_nome para uma Series inteira.
+    Normaliza apenas os valores distintos (ou as categorias, se a Series for
+    categórica) e devolve o resultado mapeado de volta para cada linha.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos = serie.cat.codes.to_numpy()
+        unicos = serie.cat.categories
+    else:
+        codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+
+    # O código -1 (valor ausente) aponta para a última posição: string vazia
+    normalizados = np.array([normalizar_nome(valor) for valor in unicos] + [""], dtype=object)
+    return pd.Series(normalizados[codigos], index=serie.index, name=serie.name)
+
 
-    return texto.upper()
+def calcular_hash_arquivo(caminho, tamanho_bloco=1024 * 1024):
+    """Calcula o SHA-256 do conteúdo de um arquivo, lendo-o em blocos."""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            h.update(bloco)
+    return h.hexdigest()
 
 
 def to_excel(df):
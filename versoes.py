@@ -0,0 +1,106 @@
+import os
+import shutil
+from datetime import datetime
+
+# --- VERSÕES PUBLICADAS DOS DADOS PROCESSADOS ---
+# Cada execução do pré-processamento grava um diretório novo em
+# <raiz>/versoes/<versao> e, só depois que tudo foi gravado, troca de forma
+# atômica o ponteiro <raiz>/current, um arquivo de texto com o nome da versão
+# publicada. Quem lê os dados resolve o ponteiro uma vez e passa a usar apenas
+# o diretório daquela versão, que nunca é alterado depois de publicado.
+# Os arquivos que não mudaram entre versões são hard links: o espaço em disco
+# só cresce com as saídas reconstruídas.
+
+ARQUIVO_ATUAL = 'current'
+DIRETORIO_VERSOES = 'versoes'
+
+# Versões publicadas mantidas, incluindo a atual. As anteriores à atual
+# continuam disponíveis para as sessões que ainda as estão lendo.
+VERSOES_MANTIDAS = 3
+
+
+def versao_atual(raiz='data/processed'):
+    """Nome da versão publicada em 'raiz', ou None se o diretório não tiver versões."""
+    try:
+        with open(os.path.join(raiz, ARQUIVO_ATUAL), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def caminho_versao(raiz, versao):
+    """Diretório da versão 'versao'."""
+    return os.path.join(raiz, DIRETORIO_VERSOES, versao)
+
+
+def diretorio_atual(raiz='data/processed'):
+    """
+    Diretório com os dados da versão publicada. Se 'raiz' não tiver o
+    ponteiro (dados gravados diretamente, como nas versões anteriores do ETL,
+    ou 'raiz' já é o diretório de uma versão), retorna a própria 'raiz'.
+    """
+    versao = versao_atual(raiz)
+    return raiz if versao is None else caminho_versao(raiz, versao)
+
+
+def criar_versao(raiz='data/processed'):
+    """Cria o diretório de uma versão nova, ainda não publicada. Retorna (versao, caminho)."""
+    os.makedirs(os.path.join(raiz, DIRETORIO_VERSOES), exist_ok=True)
+    versao = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+    caminho = caminho_versao(raiz, versao)
+    os.makedirs(caminho)
+    return versao, caminho
+
+
+def copiar_arquivos(origem, destino, nomes):
+    """
+    Reproduz em 'destino' os arquivos e diretórios 'nomes' de 'origem' como
+    hard links (cópias, se o sistema de arquivos não os suportar). Nomes
+    inexistentes na origem são ignorados. Os arquivos ligados são
+    compartilhados entre as versões e não podem ser regravados no lugar.
+    """
+    def ligar(arquivo_origem, arquivo_destino):
+        try:
+            os.link(arquivo_origem, arquivo_destino)
+        except OSError:
+            shutil.copy2(arquivo_origem, arquivo_destino)
+
+    for nome in nomes:
+        caminho = os.path.join(origem, nome)
+        if os.path.isdir(caminho):
+            shutil.copytree(caminho, os.path.join(destino, nome), copy_function=ligar)
+        elif os.path.isfile(caminho):
+            ligar(caminho, os.path.join(destino, nome))
+
+
+def publicar_versao(versao, raiz='data/processed'):
+    """Aponta 'current' para 'versao' de forma atômica (arquivo temporário + rename)."""
+    caminho = os.path.join(raiz, ARQUIVO_ATUAL)
+    caminho_tmp = caminho + '.tmp'
+    with open(caminho_tmp, 'w', encoding='utf-8') as f:
+        f.write(versao)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(caminho_tmp, caminho)
+
+
+def descartar_versao(caminho):
+    """Remove o diretório de uma versão que não chegou a ser publicada."""
+    shutil.rmtree(caminho, ignore_errors=True)
+
+
+def remover_versoes_antigas(raiz='data/processed', manter=VERSOES_MANTIDAS):
+    """
+    Remove as versões anteriores à atual, mantendo as 'manter' mais recentes
+    (contando a atual). Versões posteriores à atual, de uma execução ainda em
+    andamento, não são tocadas. Retorna as versões removidas.
+    """
+    atual = versao_atual(raiz)
+    diretorio = os.path.join(raiz, DIRETORIO_VERSOES)
+    if atual is None or not os.path.isdir(diretorio):
+        return []
+    anteriores = sorted(v for v in os.listdir(diretorio) if v < atual)
+    removidas = anteriores[:max(len(anteriores) - (manter - 1), 0)]
+    for versao in removidas:
+        shutil.rmtree(caminho_versao(raiz, versao), ignore_errors=True)
+    return removidas
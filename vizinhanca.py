@@ -0,0 +1,115 @@
+import numpy as np
+import shapely
+from shapely.geometry import shape
+
+# --- VIZINHANÇA ENTRE MUNICÍPIOS ---
+# Calculada no pré-processamento e gravada em data/processed/vizinhos.json.
+# As relações ficam em formato CSR (compressed sparse row): os vizinhos do
+# município i são municipios[indices[indptr[i]:indptr[i + 1]]].
+
+# Critérios de contiguidade: 'rainha' considera vizinhos os municípios que
+# compartilham ao menos um ponto da divisa; 'torre' exige um trecho de divisa
+# com comprimento positivo (exclui os que só se tocam num vértice).
+CRITERIOS = ('rainha', 'torre')
+
+# Quilômetros por grau de latitude, usado na projeção local para distâncias
+KM_POR_GRAU = 111.32
+
+
+def _geometrias(geojson_data):
+    """Nomes normalizados e geometrias shapely das feições com geometria."""
+    nomes, geometrias = [], []
+    for feature in geojson_data['features']:
+        if feature.get('geometry'):
+            nomes.append(feature['properties']['NM_MUN_NORMALIZADO'])
+            geometrias.append(shape(feature['geometry']))
+    return nomes, np.array(geometrias, dtype=object)
+
+
+def _projetar_km(geometrias):
+    """Projeção equirretangular em km centrada na latitude média (suficiente na escala de SC)."""
+    _, ymin, _, ymax = shapely.total_bounds(geometrias)
+    fator_x = KM_POR_GRAU * np.cos(np.radians((ymin + ymax) / 2))
+    return shapely.transform(geometrias, lambda coords: coords * [fator_x, KM_POR_GRAU])
+
+
+def _para_csr(total, origem, destino):
+    """Converte pares (origem, destino) em listas CSR ordenadas."""
+    ordem = np.lexsort((destino, origem))
+    origem, destino = origem[ordem], destino[ordem]
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(origem, minlength=total))])
+    return {'indptr': indptr.tolist(), 'indices': destino.tolist()}
+
+
+def _pares_contiguos(geometrias):
+    """
+    Pares (i, j), i < j, de geometrias que se tocam, e se a divisa comum tem
+    comprimento. A STRtree seleciona os candidatos pela sobreposição das
+    caixas envolventes e só eles passam pela relação exata (DE-9IM), calculada
+    uma única vez por par para os dois critérios.
+    """
+    arvore = shapely.STRtree(geometrias)
+    origem, destino = arvore.query(geometrias)
+    metade = origem < destino
+    origem, destino = origem[metade], destino[metade]
+    matrizes = shapely.relate(geometrias[origem], geometrias[destino])
+    # DE-9IM: [0] interior x interior, [1] interior x borda, [3] borda x interior, [4] borda x borda
+    tocam = np.array([m[0] == 'F' and (m[1] != 'F' or m[3] != 'F' or m[4] != 'F') for m in matrizes], dtype=bool)
+    trecho = np.array([m[4] == '1' for m in matrizes], dtype=bool)
+    return origem[tocam], destino[tocam], trecho[tocam]
+
+
+def calcular_contiguidade(geometrias, criterio='rainha'):
+    """Vizinhança por contiguidade ('rainha' ou 'torre') em formato CSR."""
+    if criterio not in CRITERIOS:
+        raise ValueError(f"Critério de contiguidade desconhecido: '{criterio}'")
+    origem, destino, trecho = _pares_contiguos(geometrias)
+    if criterio == 'torre':
+        origem, destino = origem[trecho], destino[trecho]
+    # A relação é simétrica: cada par entra nos dois sentidos
+    return _para_csr(len(geometrias), np.concatenate([origem, destino]), np.concatenate([destino, origem]))
+
+
+def calcular_distancia(centroides_km, distancia_km):
+    """Vizinhança por banda de distância: centroides a até 'distancia_km' quilômetros."""
+    pontos = shapely.points(np.asarray(centroides_km, dtype='float64'))
+    arvore = shapely.STRtree(pontos)
+    origem, destino = arvore.query(pontos, predicate='dwithin', distance=distancia_km)
+    diferentes = origem != destino
+    return _para_csr(len(pontos), origem[diferentes], destino[diferentes])
+
+
+def construir_vizinhanca(geojson_data):
+    """
+    Monta o artefato de vizinhança a partir do GeoJSON processado (com
+    NM_MUN_NORMALIZADO): nomes dos municípios, centroides projetados em km e
+    as listas CSR de contiguidade 'rainha' e 'torre'.
+    """
+    nomes, geometrias = _geometrias(geojson_data)
+    centroides = shapely.get_coordinates(shapely.centroid(_projetar_km(geometrias)))
+    artefato = {
+        'municipios': nomes,
+        'centroides_km': np.round(centroides, 3).tolist(),
+    }
+    origem, destino, trecho = _pares_contiguos(geometrias)
+    for criterio, selecao in (('rainha', slice(None)), ('torre', trecho)):
+        i, j = origem[selecao], destino[selecao]
+        artefato[criterio] = _para_csr(len(geometrias), np.concatenate([i, j]), np.concatenate([j, i]))
+    return artefato
+
+
+def mapa_vizinhos(artefato, criterio='rainha', distancia_km=None):
+    """
+    Dicionário {município: [vizinhos]} a partir do artefato. Com
+    'distancia_km', usa a banda de distância entre centroides em vez da
+    contiguidade.
+    """
+    if distancia_km is not None:
+        csr = calcular_distancia(artefato['centroides_km'], distancia_km)
+    elif criterio in CRITERIOS:
+        csr = artefato[criterio]
+    else:
+        raise ValueError(f"Critério de contiguidade desconhecido: '{criterio}'")
+    nomes = artefato['municipios']
+    indptr, indices = csr['indptr'], csr['indices']
+    return {nome: [nomes[j] for j in indices[indptr[i]:indptr[i + 1]]] for i, nome in enumerate(nomes)}